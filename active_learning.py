@@ -0,0 +1,271 @@
+# 🧠 Active Learning - StudXchange Custom Model
+## Rank unlabeled photos and plan collection by expected mAP gain
+
+"""
+`DatasetValidator.generate_collection_plan` chases 100 samples for every
+dish. This stage spends the labeling budget where the current model is
+weakest instead:
+
+1. batch inference over the unlabeled pool (data/raw_collection), each
+   image together with its horizontal flip
+2. uncertainty per image from three signals:
+   - entropy      mean binary entropy of box confidences (no boxes at all
+                  counts as fully uncertain: the pool is all food photos)
+   - margin       overlapping boxes of *different* dishes with close
+                  confidences (dal_tadka vs dal_fry on one bowl)
+   - disagreement 1 - box agreement between the image and its flip
+3. diversity: backbone embeddings clustered with k-means; each pick from a
+   cluster discounts the rest of that cluster, and near-copies of an
+   already-picked photo are skipped
+4. outputs: labeling_queue.jsonl (ranked) and collection_plan.json, which
+   splits a new-photo budget across dishes by (1 - AP) / sqrt(count + 1)
+   using the per-dish AP from `evaluation.py report --json`
+
+Usage:
+    python active_learning.py --pool data/raw_collection --dataset data/labeled_dataset --budget 300
+    python active_learning.py --eval-report eval_report.json --collect 500
+"""
+
+import argparse
+import heapq
+import json
+import math
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from batch_scoring import batched, discover_images, prefetch_decoded
+from image_embeddings import Embedder, compute_embeddings, kmeans
+from model_registry import detection_agreement
+from geometry import box_iou
+
+WEIGHTS = {'entropy': 0.4, 'margin': 0.3, 'disagreement': 0.3}
+REPORT_CONFIDENCE = 0.25  # boxes counted as "predicted" for agreement and dish tallies
+NEAR_DUPLICATE = 0.97     # cosine similarity above which a candidate is a copy of a pick
+
+# ====================================================================
+# UNCERTAINTY SCORING
+# ====================================================================
+
+def _boxes(r, flip_width=None):
+    boxes = r.boxes
+    if boxes is None or len(boxes) == 0:
+        return np.zeros((0, 4), np.float32), np.zeros(0, int), np.zeros(0, np.float32)
+    xyxy = boxes.xyxy.cpu().numpy()
+    if flip_width is not None:
+        xyxy = np.stack([flip_width - xyxy[:, 2], xyxy[:, 1], flip_width - xyxy[:, 0], xyxy[:, 3]], axis=1)
+    return xyxy, boxes.cls.cpu().numpy().astype(int), boxes.conf.cpu().numpy()
+
+
+def uncertainty(boxes, class_ids, confidences, flip_boxes, flip_class_ids, flip_confidences):
+    """Per-signal uncertainties in [0, 1] for one image"""
+    if len(confidences) == 0:
+        entropy = 1.0
+    else:
+        p = np.clip(confidences, 1e-6, 1 - 1e-6)
+        entropy = float(np.mean(-(p * np.log2(p) + (1 - p) * np.log2(1 - p))))
+
+    margin = 0.0
+    if len(boxes) > 1:
+        overlap = box_iou(boxes, boxes) > 0.5
+        rivals = overlap & (class_ids[:, None] != class_ids[None, :])
+        if rivals.any():
+            gaps = np.abs(confidences[:, None] - confidences[None, :])[rivals]
+            margin = float(1 - gaps.min())
+
+    def as_detections(b, c, conf):
+        keep = conf >= REPORT_CONFIDENCE
+        return [{'bbox': box, 'dish_name': int(cls)} for box, cls in zip(b[keep], c[keep])]
+
+    disagreement = 1 - detection_agreement(as_detections(boxes, class_ids, confidences),
+                                           as_detections(flip_boxes, flip_class_ids, flip_confidences))
+    return {'entropy': round(entropy, 4), 'margin': round(margin, 4), 'disagreement': round(disagreement, 4)}
+
+
+def score_pool(detector, decoded, batch_size=8, confidence_threshold=0.05, imgsz=640):
+    """Generator of one uncertainty record per decoded image"""
+    for batch in batched(decoded, batch_size):
+        ready = [(path, image) for path, image, error in batch if image is not None]
+        if not ready:
+            continue
+
+        images = [image for _, image in ready]
+        results = list(detector.model(images + [cv2.flip(image, 1) for image in images],
+                                      conf=confidence_threshold, imgsz=imgsz, stream=True, verbose=False,
+                                      **detector.inference_options()))
+
+        for i, (path, image) in enumerate(ready):
+            boxes, class_ids, confidences = _boxes(results[i])
+            flipped = _boxes(results[len(ready) + i], flip_width=image.shape[1])
+            components = uncertainty(boxes, class_ids, confidences, *flipped)
+            predicted = sorted({int(c) for c in class_ids[confidences >= REPORT_CONFIDENCE]})
+            yield {
+                'path': path,
+                'uncertainty': round(sum(WEIGHTS[k] * v for k, v in components.items()), 4),
+                **components,
+                'predicted': predicted
+            }
+
+# ====================================================================
+# DIVERSE SELECTION
+# ====================================================================
+
+def select_diverse(records, vectors, budget, clusters=None):
+    """Greedy uncertainty order, discounting clusters already picked from
+
+    A candidate's score is uncertainty / (1 + picks from its cluster); photos
+    nearly identical to an earlier pick are dropped.
+    """
+    if not records:
+        return []
+    clusters = clusters or max(1, min(len(records) // 10, 256))
+    _, labels = kmeans(vectors, clusters)
+
+    picks_per_cluster = np.zeros(labels.max() + 1, dtype=int)
+    picked_vectors = {}
+    heap = [(-r['uncertainty'], 0, i) for i, r in enumerate(records)]
+    heapq.heapify(heap)
+    queue = []
+
+    while heap and len(queue) < budget:
+        negative_score, seen, i = heapq.heappop(heap)
+        cluster = labels[i]
+        if seen != picks_per_cluster[cluster]:
+            # Cluster gained picks since this score was computed: re-queue at the discounted score
+            score = records[i]['uncertainty'] / (1 + picks_per_cluster[cluster])
+            heapq.heappush(heap, (-score, picks_per_cluster[cluster], i))
+            continue
+        previous = picked_vectors.get(cluster)
+        if previous is not None and float(np.max(previous @ vectors[i])) > NEAR_DUPLICATE:
+            continue
+
+        queue.append({**records[i], 'rank': len(queue) + 1, 'cluster': int(cluster),
+                      'priority': round(-negative_score, 4)})
+        picks_per_cluster[cluster] += 1
+        picked_vectors[cluster] = vectors[i][None] if previous is None else np.vstack([previous, vectors[i]])
+    return queue
+
+# ====================================================================
+# COLLECTION PLAN
+# ====================================================================
+
+def train_class_counts(dataset_path):
+    """Box count per class id in labels/train"""
+    counts = {}
+    for label_file in (Path(dataset_path) / 'labels' / 'train').glob('*.txt'):
+        with open(label_file, 'r') as f:
+            for line in f:
+                if line.strip():
+                    class_id = int(float(line.split()[0]))
+                    counts[class_id] = counts.get(class_id, 0) + 1
+    return counts
+
+
+def collection_plan(class_names, counts, per_class_ap, queue, collect_budget):
+    """New photos per dish, weighted by (1 - AP) / sqrt(current + 1)
+
+    `per_class_ap` maps dish name to AP50-95; dishes the evaluation has not
+    seen get 0.5 so they are neither ignored nor favoured.
+    """
+    in_queue = {}
+    for item in queue:
+        for class_id in item['predicted']:
+            in_queue[class_id] = in_queue.get(class_id, 0) + 1
+
+    weights = {}
+    for class_id, name in class_names.items():
+        ap = per_class_ap.get(name, 0.5)
+        weights[class_id] = (1 - ap) / math.sqrt(counts.get(class_id, 0) + 1)
+    total = sum(weights.values()) or 1.0
+    ranked = sorted(weights, key=weights.get, reverse=True)
+
+    plan = {}
+    for position, class_id in enumerate(ranked):
+        name = class_names[class_id]
+        plan[name] = {
+            'current': counts.get(class_id, 0),
+            'AP50_95': per_class_ap.get(name),
+            'in_labeling_queue': in_queue.get(class_id, 0),
+            'needed': int(round(collect_budget * weights[class_id] / total)),
+            'priority': 'HIGH' if position < len(ranked) / 3 else 'MEDIUM' if position < 2 * len(ranked) / 3 else 'LOW'
+        }
+    return plan
+
+
+def load_per_class_ap(eval_report):
+    """{dish name: AP50-95} from an evaluation.py --json report"""
+    if not eval_report:
+        return {}
+    with open(eval_report, 'r') as f:
+        report = json.load(f)
+    return {row['name']: row['AP50_95'] for row in report['summary']['per_class']}
+
+# ====================================================================
+# PIPELINE
+# ====================================================================
+
+def run_active_learning(detector, pool_dir, dataset_path, output_dir, budget=300, collect_budget=500,
+                        eval_report=None, embedder=None, batch_size=8, workers=8, clusters=None):
+    """Score the pool, pick a diverse labeling queue and write the collection plan"""
+    paths = list(discover_images(pool_dir))
+    print(f"🔍 Scoring {len(paths)} unlabeled images for uncertainty...")
+    decoded = prefetch_decoded(paths, workers=workers, prefetch=4 * batch_size)
+    records = {r['path']: r for r in score_pool(detector, decoded, batch_size)}
+
+    print("🧬 Embedding pool for diversity...")
+    embedder = embedder or Embedder(detector.model_path)
+    embedded, vectors = compute_embeddings(list(records), embedder, Path(output_dir) / 'pool_embeddings.npz',
+                                           workers=workers)
+    queue = select_diverse([records[p] for p in embedded], vectors, budget, clusters)
+    plan = collection_plan(detector.class_names, train_class_counts(dataset_path), load_per_class_ap(eval_report),
+                           queue, collect_budget)
+    for item in queue:
+        item['predicted'] = [detector.class_names.get(c, f"dish_{c}") for c in item['predicted']]
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(output_dir / 'labeling_queue.jsonl', 'w') as f:
+        for item in queue:
+            f.write(json.dumps(item) + '\n')
+    with open(output_dir / 'collection_plan.json', 'w') as f:
+        json.dump(plan, f, indent=2)
+
+    print(f"🏷️  Labeling queue: {len(queue)} images → {output_dir / 'labeling_queue.jsonl'}")
+    for item in queue[:10]:
+        print(f"   #{item['rank']:<3} {item['uncertainty']:.3f}  {item['path']}  {', '.join(item['predicted'])}")
+    print(f"📋 Collection plan → {output_dir / 'collection_plan.json'}")
+    for name, info in list(plan.items())[:10]:
+        print(f"   {info['priority']:<6} {name:<24} have {info['current']:<4} collect {info['needed']}")
+    return queue, plan
+
+# ====================================================================
+# COMMAND LINE
+# ====================================================================
+
+def main():
+    """Build the labeling queue and collection plan"""
+    parser = argparse.ArgumentParser(description="StudXchange active-learning sample selector")
+    parser.add_argument("--pool", default="data/raw_collection", help="Unlabeled images")
+    parser.add_argument("--dataset", default="data/labeled_dataset", help="Labeled YOLO dataset")
+    parser.add_argument("--output", default="data/active_learning")
+    parser.add_argument("--model", default="studxchange_model.pt")
+    parser.add_argument("--budget", type=int, default=300, help="Images to queue for labeling")
+    parser.add_argument("--collect", type=int, default=500, help="New photos to plan across dishes")
+    parser.add_argument("--eval-report", help="evaluation.py report --json output, for per-dish AP")
+    parser.add_argument("--clusters", type=int, help="k-means clusters (default ~N/10, max 256)")
+    parser.add_argument("--embedding-backend", choices=["yolo", "thumb"], default="yolo")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    from food_detector import StudXchangeFoodDetector
+
+    detector = StudXchangeFoodDetector(args.model)
+    run_active_learning(detector, args.pool, args.dataset, args.output, args.budget, args.collect,
+                        args.eval_report, Embedder(args.model, args.embedding_backend),
+                        args.batch_size, args.workers, args.clusters)
+
+
+if __name__ == "__main__":
+    main()
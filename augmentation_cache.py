@@ -0,0 +1,347 @@
+# 🎨 Augmentation Cache - StudXchange Custom Model
+## Offline, deterministic pre-augmented training variants
+
+"""
+With mosaic, mixup, HSV and affine augmentation on, Colab's 2 dataloader
+workers cannot keep the GPU busy. This module precomputes K augmented
+variants of every training image once, in a multi-process CPU pool, so
+training only has to decode a JPEG and collate.
+
+- the same augmentations the training config asks for (hsv_h/s/v, degrees,
+  translate, scale, fliplr, mosaic, mixup) with their configured strengths;
+  copy_paste needs segmentation masks and is left to online training
+- variant k of image i always comes from the RNG seeded with (seed, i, k),
+  so a rebuilt cache is byte-for-byte the same set of samples
+- storage is sharded: shard-NNNNN.bin holds the JPEG bytes back to back and
+  shard-NNNNN.json their offsets and YOLO labels; each worker writes whole
+  shards, the .json last, so an interrupted build resumes at the first
+  missing shard
+- `materialize()` writes the variants out as a YOLO train split plus a data
+  yaml; `cached_train_overrides()` turns the online augmentation off and
+  divides the epoch count by K (one pass over the cache covers K epochs)
+
+Usage:
+    python augmentation_cache.py build data.yaml --variants 8 --platform colab
+    python augmentation_cache.py materialize .aug_cache data.yaml --output aug_dataset
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import shutil
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+from dataset_layout import label_path, read_labels, split_images
+from training_config import PLATFORM_CONFIGS
+
+AUG_CACHE_DIR = ".aug_cache"
+AUGMENT_KEYS = ('hsv_h', 'hsv_s', 'hsv_v', 'degrees', 'translate', 'scale', 'fliplr', 'mosaic', 'mixup')
+FILL = (114, 114, 114)
+
+# ====================================================================
+# AUGMENTATIONS
+# ====================================================================
+
+def load_resized(path, size):
+    """Image with its long side resized to `size` and its labels as xyxy pixels"""
+    image = cv2.imread(path)
+    if image is None:
+        raise ValueError(f"unreadable image: {path}")
+    scale = size / max(image.shape[:2])
+    if scale != 1:
+        image = cv2.resize(image, (max(1, round(image.shape[1] * scale)), max(1, round(image.shape[0] * scale))),
+                           interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+    class_ids, boxes = read_labels(path, image.shape[1], image.shape[0])
+    return image, class_ids, boxes
+
+
+def hsv_jitter(image, hgain, sgain, vgain, rng):
+    """Random hue/saturation/value gains through lookup tables"""
+    gains = rng.uniform(-1, 1, 3) * [hgain, sgain, vgain] + 1
+    hue, sat, val = cv2.split(cv2.cvtColor(image, cv2.COLOR_BGR2HSV))
+    x = np.arange(256, dtype=np.float32)
+    lut_hue = ((x * gains[0]) % 180).astype(np.uint8)
+    lut_sat = np.clip(x * gains[1], 0, 255).astype(np.uint8)
+    lut_val = np.clip(x * gains[2], 0, 255).astype(np.uint8)
+    hsv = cv2.merge((cv2.LUT(hue, lut_hue), cv2.LUT(sat, lut_sat), cv2.LUT(val, lut_val)))
+    return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+
+
+def random_affine(image, class_ids, boxes, size, degrees, translate, scale, rng):
+    """Rotate/scale/translate about the image centre into a size x size output"""
+    h, w = image.shape[:2]
+    centre = np.array([[1, 0, -w / 2], [0, 1, -h / 2], [0, 0, 1]])
+    rotation = np.eye(3)
+    gain = rng.uniform(1 - scale, 1 + scale)
+    rotation[:2] = cv2.getRotationMatrix2D((0, 0), rng.uniform(-degrees, degrees), gain)
+    shift = np.eye(3)
+    shift[0, 2] = rng.uniform(0.5 - translate, 0.5 + translate) * size
+    shift[1, 2] = rng.uniform(0.5 - translate, 0.5 + translate) * size
+    matrix = shift @ rotation @ centre
+    out = cv2.warpAffine(image, matrix[:2], (size, size), borderValue=FILL)
+
+    if len(boxes) == 0:
+        return out, class_ids, boxes
+    corners = boxes[:, [0, 1, 2, 1, 2, 3, 0, 3]].reshape(-1, 2)
+    corners = np.hstack([corners, np.ones((len(corners), 1))]) @ matrix[:2].T
+    corners = corners.reshape(-1, 8)
+    moved = np.stack([corners[:, 0::2].min(1), corners[:, 1::2].min(1),
+                      corners[:, 0::2].max(1), corners[:, 1::2].max(1)], axis=1).clip(0, size)
+
+    # Drop boxes that left the frame or were mostly cropped away
+    area_before = np.prod(boxes[:, 2:] - boxes[:, :2], axis=1) * gain ** 2
+    width, height = moved[:, 2] - moved[:, 0], moved[:, 3] - moved[:, 1]
+    keep = (width > 2) & (height > 2) & (width * height > 0.1 * area_before)
+    return out, class_ids[keep], moved[keep].astype(np.float32)
+
+
+def mosaic(tiles, size, rng):
+    """Four (image, class_ids, boxes) tiles around a random centre on a 2*size canvas"""
+    canvas = np.full((2 * size, 2 * size, 3), FILL, dtype=np.uint8)
+    xc, yc = (int(rng.uniform(size / 2, 3 * size / 2)) for _ in range(2))
+    all_ids, all_boxes = [], []
+    for position, (image, class_ids, boxes) in enumerate(tiles):
+        h, w = image.shape[:2]
+        if position == 0:
+            x1, y1, x2, y2 = max(xc - w, 0), max(yc - h, 0), xc, yc
+            sx1, sy1 = w - (x2 - x1), h - (y2 - y1)
+        elif position == 1:
+            x1, y1, x2, y2 = xc, max(yc - h, 0), min(xc + w, 2 * size), yc
+            sx1, sy1 = 0, h - (y2 - y1)
+        elif position == 2:
+            x1, y1, x2, y2 = max(xc - w, 0), yc, xc, min(2 * size, yc + h)
+            sx1, sy1 = w - (x2 - x1), 0
+        else:
+            x1, y1, x2, y2 = xc, yc, min(xc + w, 2 * size), min(2 * size, yc + h)
+            sx1, sy1 = 0, 0
+        canvas[y1:y2, x1:x2] = image[sy1:sy1 + (y2 - y1), sx1:sx1 + (x2 - x1)]
+        offset = np.array([x1 - sx1, y1 - sy1] * 2, dtype=np.float32)
+        all_ids.append(class_ids)
+        all_boxes.append(boxes + offset)
+
+    boxes = np.concatenate(all_boxes).clip(0, 2 * size)
+    class_ids = np.concatenate(all_ids)
+    keep = (boxes[:, 2] - boxes[:, 0] > 2) & (boxes[:, 3] - boxes[:, 1] > 2)
+    return canvas, class_ids[keep], boxes[keep]
+
+
+def augment(index, variant, paths, size, config, seed):
+    """Variant `variant` of image `index`: (BGR image, class_ids, xyxy boxes)"""
+    rng = np.random.default_rng([seed, index, variant])
+
+    def sample(i):
+        image, class_ids, boxes = load_resized(paths[i], size)
+        if rng.random() < config.get('mosaic', 0):
+            partners = [load_resized(paths[j], size) for j in rng.integers(0, len(paths), 3)]
+            image, class_ids, boxes = mosaic([(image, class_ids, boxes)] + partners, size, rng)
+        return random_affine(image, class_ids, boxes, size, config.get('degrees', 0),
+                             config.get('translate', 0), config.get('scale', 0), rng)
+
+    image, class_ids, boxes = sample(index)
+    if rng.random() < config.get('mixup', 0):
+        other, other_ids, other_boxes = sample(int(rng.integers(0, len(paths))))
+        ratio = rng.beta(32.0, 32.0)
+        image = (image * ratio + other * (1 - ratio)).astype(np.uint8)
+        class_ids, boxes = np.concatenate([class_ids, other_ids]), np.concatenate([boxes, other_boxes])
+
+    image = hsv_jitter(image, config.get('hsv_h', 0), config.get('hsv_s', 0), config.get('hsv_v', 0), rng)
+    if rng.random() < config.get('fliplr', 0):
+        image = np.ascontiguousarray(image[:, ::-1])
+        boxes = np.stack([size - boxes[:, 2], boxes[:, 1], size - boxes[:, 0], boxes[:, 3]], axis=1) \
+            if len(boxes) else boxes
+    return image, class_ids, boxes
+
+# ====================================================================
+# SHARDED CACHE
+# ====================================================================
+
+def _stat(path):
+    """'size:mtime_ns' of a file, or '-' when it does not exist"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return '-'
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def cache_key(paths, variants, size, config, seed):
+    settings = {'variants': variants, 'size': size, 'seed': seed,
+                'augment': {k: config.get(k, 0) for k in AUGMENT_KEYS}}
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode())
+    for path in paths:
+        # Edited images or relabelled boxes must invalidate the cache, not just renames
+        try:
+            labels = _stat(label_path(path))
+        except ValueError:
+            labels = '-'
+        digest.update(f"{path}\t{_stat(path)}\t{labels}\n".encode())
+    return digest.hexdigest()[:16], settings
+
+
+def _build_shard(args):
+    shard, indices, paths, variants, size, config, seed, cache_dir, quality = args
+    cache_dir = Path(cache_dir)
+    items, offset = [], 0
+    tmp = cache_dir / f"shard-{shard:05d}.bin.tmp"
+    with open(tmp, 'wb') as f:
+        for index in indices:
+            for variant in range(variants):
+                try:
+                    image, class_ids, boxes = augment(index, variant, paths, size, config, seed)
+                except ValueError as e:
+                    print(f"⚠️  {e}")
+                    break
+                encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+                f.write(encoded)
+                h, w = image.shape[:2]
+                xywh = np.stack([(boxes[:, 0] + boxes[:, 2]) / 2 / w, (boxes[:, 1] + boxes[:, 3]) / 2 / h,
+                                 (boxes[:, 2] - boxes[:, 0]) / w, (boxes[:, 3] - boxes[:, 1]) / h], axis=1) \
+                    if len(boxes) else np.zeros((0, 4))
+                items.append({'source': paths[index], 'variant': variant, 'offset': offset, 'length': len(encoded),
+                              'labels': [[int(c), *np.round(b.astype(float), 6).tolist()] for c, b in zip(class_ids, xywh)]})
+                offset += len(encoded)
+    os.replace(tmp, cache_dir / f"shard-{shard:05d}.bin")
+    # The index is written last: its presence marks the shard complete
+    with open(cache_dir / f"shard-{shard:05d}.json.tmp", 'w') as f:
+        json.dump({'items': items}, f)
+    os.replace(cache_dir / f"shard-{shard:05d}.json.tmp", cache_dir / f"shard-{shard:05d}.json")
+    return shard, len(items)
+
+
+def build_augmentation_cache(paths, cache_dir=AUG_CACHE_DIR, variants=8, config=None, size=640,
+                             workers=None, seed=0, images_per_shard=256, quality=90):
+    """Precompute `variants` augmented copies of every image; resumes unfinished shards"""
+    config = config or {}
+    paths = list(paths)
+    cache_dir = Path(cache_dir)
+    key, settings = cache_key(paths, variants, size, config, seed)
+
+    manifest_path = cache_dir / 'manifest.json'
+    if manifest_path.exists():
+        with open(manifest_path) as f:
+            if json.load(f).get('key') != key:
+                print("♻️  Augmentation settings or images changed, rebuilding cache")
+                shutil.rmtree(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    with open(manifest_path, 'w') as f:
+        json.dump({'key': key, 'images': len(paths), 'shards': math.ceil(len(paths) / images_per_shard),
+                   **settings}, f, indent=2)
+
+    jobs = []
+    for shard, start in enumerate(range(0, len(paths), images_per_shard)):
+        if not (cache_dir / f"shard-{shard:05d}.json").exists():
+            indices = list(range(start, min(start + images_per_shard, len(paths))))
+            jobs.append((shard, indices, paths, variants, size, config, seed, str(cache_dir), quality))
+
+    if not jobs:
+        print(f"⏭️  Augmentation cache up to date: {cache_dir}")
+        return cache_dir
+
+    workers = workers or max(1, (os.cpu_count() or 2))
+    print(f"🎨 Augmenting {len(paths)} images x {variants} variants in {len(jobs)} shards ({workers} processes)...")
+    with multiprocessing.get_context('spawn').Pool(workers) as pool:
+        for done, (shard, count) in enumerate(pool.imap_unordered(_build_shard, jobs), 1):
+            print(f"   shard {shard}: {count} samples ({done}/{len(jobs)})")
+    print(f"✅ Augmentation cache ready: {cache_dir}")
+    return cache_dir
+
+
+def iter_cache(cache_dir):
+    """Yield (item, jpeg bytes) for every cached sample in shard order"""
+    for index_path in sorted(Path(cache_dir).glob('shard-*.json')):
+        with open(index_path) as f:
+            items = json.load(f)['items']
+        with open(index_path.with_suffix('.bin'), 'rb') as f:
+            data = f.read()
+        for item in items:
+            yield item, data[item['offset']:item['offset'] + item['length']]
+
+# ====================================================================
+# TRAINING INTEGRATION
+# ====================================================================
+
+def materialize(cache_dir, data_yaml, output_dir):
+    """Write the cached variants as a YOLO train split; returns the new data yaml path"""
+    output_dir = Path(output_dir).resolve()
+    image_dir, label_dir = output_dir / 'images' / 'train', output_dir / 'labels' / 'train'
+    # Start from an empty split so variants from an older cache never linger
+    shutil.rmtree(image_dir, ignore_errors=True)
+    shutil.rmtree(label_dir, ignore_errors=True)
+    image_dir.mkdir(parents=True, exist_ok=True)
+    label_dir.mkdir(parents=True, exist_ok=True)
+
+    count = 0
+    for item, jpeg in iter_cache(cache_dir):
+        stem = f"{Path(item['source']).stem}_{hashlib.md5(item['source'].encode()).hexdigest()[:6]}_a{item['variant']}"
+        (image_dir / f"{stem}.jpg").write_bytes(jpeg)
+        with open(label_dir / f"{stem}.txt", 'w') as f:
+            f.write(''.join(f"{c} {x:.6f} {y:.6f} {w:.6f} {h:.6f}\n" for c, x, y, w, h in item['labels']))
+        count += 1
+
+    with open(data_yaml, 'r') as f:
+        data = yaml.safe_load(f)
+    for split in ('val', 'test'):
+        if data.get(split):
+            # Keep evaluating on the original images, listed by absolute path
+            with open(output_dir / f"{split}.txt", 'w') as f:
+                f.write(''.join(f"{Path(p).resolve()}\n" for p in split_images(data_yaml, split)[0]))
+            data[split] = str(output_dir / f"{split}.txt")
+    data['path'] = str(output_dir)
+    data['train'] = str(image_dir)
+
+    target = output_dir / 'data.yaml'
+    with open(target, 'w') as f:
+        yaml.safe_dump(data, f, sort_keys=False)
+    print(f"📁 {count} pre-augmented samples in {image_dir}")
+    return str(target)
+
+
+def cached_train_overrides(config, variants):
+    """train() arguments for a pre-augmented split: no online augmentation, epochs / K"""
+    return {
+        'hsv_h': 0.0, 'hsv_s': 0.0, 'hsv_v': 0.0, 'degrees': 0.0, 'translate': 0.0, 'scale': 0.0,
+        'fliplr': 0.0, 'mosaic': 0.0, 'mixup': 0.0, 'close_mosaic': 0,
+        'epochs': max(1, math.ceil(config['epochs'] / variants)),
+        'patience': max(1, math.ceil(config['patience'] / variants))
+    }
+
+# ====================================================================
+# COMMAND LINE
+# ====================================================================
+
+def main():
+    """Build or materialize the offline augmentation cache"""
+    parser = argparse.ArgumentParser(description="StudXchange offline augmentation cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Precompute augmented variants of the train split")
+    build.add_argument("data", nargs="?", default="data.yaml")
+    build.add_argument("--cache-dir", default=AUG_CACHE_DIR)
+    build.add_argument("--variants", type=int, default=8)
+    build.add_argument("--platform", choices=sorted(PLATFORM_CONFIGS), default="colab",
+                       help="Augmentation strengths from this training config")
+    build.add_argument("--imgsz", type=int, default=640)
+    build.add_argument("--workers", type=int, help="Processes (default: all CPUs)")
+    build.add_argument("--seed", type=int, default=0)
+    export = sub.add_parser("materialize", help="Write the cache as a YOLO train split")
+    export.add_argument("cache_dir")
+    export.add_argument("data", nargs="?", default="data.yaml")
+    export.add_argument("--output", default="aug_dataset")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        paths, _ = split_images(args.data, 'train')
+        build_augmentation_cache(paths, args.cache_dir, args.variants, PLATFORM_CONFIGS[args.platform],
+                                 args.imgsz, args.workers, args.seed)
+    else:
+        materialize(args.cache_dir, args.data, args.output)
+
+
+if __name__ == "__main__":
+    main()
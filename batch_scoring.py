@@ -0,0 +1,332 @@
+# 📦 Batch Offline Scoring - StudXchange Custom Model
+## Re-score whole image archives with resumable streaming output
+
+"""
+Walks a directory (or reads a file list), decodes images in a thread pool
+ahead of the model, runs batched streaming inference through
+StudXchangeFoodDetector and appends detections to JSONL or Parquet as each
+batch finishes. The output doubles as the checkpoint: re-running the same
+command skips every image the same model (--model-tag, default the weights
+file name) already scored, so an interrupted re-score of the 100k-photo
+archive picks up where it stopped, while a new model re-scores everything
+into the same output.
+
+Records carry the same merged taxonomy dishes as the API; --raw-ids keeps
+the model's own class ids instead (evaluation scores raw ids this way).
+
+Usage:
+    python batch_scoring.py data/archive --output scores.jsonl
+    python batch_scoring.py --file-list todo.txt --output scores_parquet --format parquet
+    python batch_scoring.py data/archive --output raw_scores.jsonl --raw-ids
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from dataset_layout import IMAGE_EXTENSIONS
+from taxonomy import merge_predictions
+
+# One fixed schema for every part file: inferring it per part turns empty
+# lists into list<null> and an all-None error column into null, and parts
+# with different schemas don't read back as one dataset
+DETECTION_SCHEMA = pa.schema([
+    ('path', pa.string()),
+    ('model', pa.string()),
+    ('width', pa.int32()),
+    ('height', pa.int32()),
+    ('num_detections', pa.int32()),
+    ('class_ids', pa.list_(pa.int32())),
+    ('dish_names', pa.list_(pa.string())),
+    ('confidences', pa.list_(pa.float32())),
+    ('boxes', pa.list_(pa.list_(pa.float32()))),
+    ('error', pa.string())
+]) if pa is not None else None
+
+# ====================================================================
+# IMAGE DISCOVERY AND PREFETCH
+# ====================================================================
+
+def discover_images(root=None, file_list=None):
+    """Yield image paths from a directory tree and/or a newline-separated file list"""
+    if file_list:
+        with open(file_list, 'r') as f:
+            for line in f:
+                path = line.strip()
+                if path and not path.startswith('#'):
+                    yield path
+
+    if root:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(dirpath, filename)
+
+
+def _decode(path):
+    image = cv2.imread(path)  # BGR, as ultralytics expects for arrays
+    if image is None:
+        return path, None, "unreadable image"
+    return path, image, None
+
+
+def prefetch_decoded(paths, workers=8, prefetch=64):
+    """Decode images in a thread pool, keeping at most `prefetch` decodes in flight"""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for path in paths:
+            pending.append(pool.submit(_decode, path))
+            if len(pending) >= prefetch:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def batched(items, batch_size):
+    """Group an iterator into lists of `batch_size`"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# ====================================================================
+# OUTPUT WRITERS (ALSO THE CHECKPOINT)
+# ====================================================================
+
+class JsonlDetectionWriter:
+    """Append-only JSONL output; its contents are the resume checkpoint"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._repair_tail()
+        self.file = open(self.path, 'a')
+
+    def _repair_tail(self):
+        """Drop a half-written last line left behind by a crash"""
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            return
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            if not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+
+    def done_paths(self, model_tag):
+        """Paths this model already scored in previous runs"""
+        done = set()
+        if self.path.exists():
+            with open(self.path, 'r') as f:
+                for line in f:
+                    record = json.loads(line)
+                    if record["model"] == model_tag:
+                        done.add(record["path"])
+        return done
+
+    def write(self, records):
+        for record in records:
+            self.file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetDetectionWriter:
+    """Parquet output written as atomically-renamed part files
+
+    Parts are kept small so a crash loses at most rows_per_part scored
+    images; read the directory back with pyarrow.dataset / pandas.
+    """
+
+    def __init__(self, directory, rows_per_part=256):
+        if pq is None:
+            raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.rows_per_part = rows_per_part
+        self.buffer = []
+        self.next_part = len(list(self.directory.glob('part-*.parquet')))
+
+    def done_paths(self, model_tag):
+        done = set()
+        for part in sorted(self.directory.glob('part-*.parquet')):
+            table = pq.read_table(part, columns=['path', 'model'])
+            done.update(path for path, model in zip(table.column('path').to_pylist(),
+                                                    table.column('model').to_pylist()) if model == model_tag)
+        return done
+
+    def write(self, records):
+        self.buffer.extend(records)
+        if len(self.buffer) >= self.rows_per_part:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        part = self.directory / f"part-{self.next_part:05d}.parquet"
+        tmp = part.with_suffix('.tmp')
+        pq.write_table(pa.Table.from_pylist(self.buffer, schema=DETECTION_SCHEMA), tmp)
+        os.replace(tmp, part)
+        self.next_part += 1
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+
+# ====================================================================
+# BATCHED STREAMING INFERENCE
+# ====================================================================
+
+def error_record(path, model_tag, error):
+    """Record for an image that could not be scored, with every column present"""
+    return {"path": path, "model": model_tag, "width": None, "height": None, "num_detections": 0,
+            "class_ids": [], "dish_names": [], "confidences": [], "boxes": [], "error": error}
+
+
+def score_images(detector, decoded, batch_size=16, confidence_threshold=0.25, imgsz=640, model_tag=None,
+                 merged=True):
+    """Generator of one detection record per decoded image
+
+    merged=True reports taxonomy dishes like the API (sibling boxes merged,
+    title-cased names); merged=False keeps the model's raw class ids.
+    """
+    model_tag = model_tag or os.path.basename(detector.model_path)
+
+    for batch in batched(decoded, batch_size):
+        failed = [(path, error) for path, image, error in batch if image is None]
+        ready = [(path, image) for path, image, error in batch if image is not None]
+
+        for path, error in failed:
+            yield error_record(path, model_tag, error)
+
+        if not ready:
+            continue
+
+        results = detector.model([image for _, image in ready], conf=confidence_threshold,
+                                 imgsz=imgsz, stream=True, verbose=False,
+                                 **detector.inference_options())
+
+        for (path, image), r in zip(ready, results):
+            if r.boxes is None:
+                xyxy, confidences, class_ids = np.zeros((0, 4)), np.zeros(0), np.zeros(0, int)
+            else:
+                xyxy, confidences, class_ids = (r.boxes.xyxy.cpu().numpy(), r.boxes.conf.cpu().numpy(),
+                                                r.boxes.cls.cpu().numpy().astype(int))
+            if merged:
+                xyxy, confidences, class_ids = merge_predictions(xyxy, confidences, class_ids, detector.class_map)
+                names = [detector.dish_names.get(c, f"dish_{c}").replace('_', ' ').title()
+                         for c in class_ids.tolist()]
+            else:
+                names = [detector.class_names.get(c, f"dish_{c}") for c in class_ids.tolist()]
+            yield {
+                "path": path,
+                "model": model_tag,
+                "width": int(image.shape[1]),
+                "height": int(image.shape[0]),
+                "num_detections": len(class_ids),
+                "class_ids": [int(c) for c in class_ids],
+                "dish_names": names,
+                "confidences": confidences.astype(float).round(4).tolist(),
+                "boxes": xyxy.astype(float).round(1).tolist(),
+                "error": None
+            }
+
+
+def run_batch_scoring(detector, paths, writer, batch_size=16, workers=8, prefetch=64,
+                      confidence_threshold=0.25, imgsz=640, model_tag=None, log_every=500, merged=True):
+    """Score every path this model has not already written to the writer's output"""
+    model_tag = model_tag or os.path.basename(detector.model_path)
+    done = writer.done_paths(model_tag)
+    if done:
+        print(f"♻️  Resuming: {len(done)} images already scored by {model_tag}")
+
+    todo = (p for p in paths if p not in done)
+    decoded = prefetch_decoded(todo, workers=workers, prefetch=max(prefetch, batch_size))
+
+    start_time = time.perf_counter()
+    scored = errors = 0
+    pending = []
+
+    try:
+        for record in score_images(detector, decoded, batch_size, confidence_threshold, imgsz, model_tag,
+                                   merged):
+            pending.append(record)
+            scored += 1
+            errors += record["error"] is not None
+
+            if len(pending) >= batch_size:
+                writer.write(pending)
+                pending = []
+
+            if scored % log_every == 0:
+                rate = scored / (time.perf_counter() - start_time)
+                print(f"📊 {scored} images scored ({rate:.1f} img/s, {errors} errors)")
+    finally:
+        writer.write(pending)
+        writer.close()
+
+    elapsed = time.perf_counter() - start_time
+    print(f"✅ Scored {scored} images in {elapsed:.1f}s ({errors} errors)")
+    return {"scored": scored, "errors": errors, "skipped": len(done), "seconds": round(elapsed, 2)}
+
+# ====================================================================
+# COMMAND LINE
+# ====================================================================
+
+def main():
+    """Batch score an image archive"""
+    parser = argparse.ArgumentParser(description="StudXchange batch offline scoring")
+    parser.add_argument("root", nargs="?", help="Directory to walk for images")
+    parser.add_argument("--file-list", help="Text file with one image path per line")
+    parser.add_argument("--output", required=True, help="JSONL file or Parquet directory")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    parser.add_argument("--model", default="studxchange_model.pt")
+    parser.add_argument("--model-tag", help="Version label stored with every record")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=8, help="Decode threads")
+    parser.add_argument("--prefetch", type=int, default=64, help="Max decoded images in flight")
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--raw-ids", action="store_true",
+                        help="Store the model's raw class ids instead of merged taxonomy dishes")
+    args = parser.parse_args()
+
+    if not args.root and not args.file_list:
+        parser.error("Provide a directory or --file-list")
+
+    from food_detector import StudXchangeFoodDetector
+
+    detector = StudXchangeFoodDetector(args.model)
+    if args.format == "parquet":
+        writer = ParquetDetectionWriter(args.output)
+    else:
+        writer = JsonlDetectionWriter(args.output)
+
+    print("🚀 Starting batch scoring")
+    run_batch_scoring(detector, discover_images(args.root, args.file_list), writer,
+                      batch_size=args.batch_size, workers=args.workers, prefetch=args.prefetch,
+                      confidence_threshold=args.conf, imgsz=args.imgsz, model_tag=args.model_tag,
+                      merged=not args.raw_ids)
+
+
+if __name__ == "__main__":
+    main()
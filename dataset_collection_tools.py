@@ -14,6 +14,9 @@ import urllib.parse
 from PIL import Image, ImageDraw, ImageFont
 import roboflow
 
+from label_lint import clean_boxes
+from taxonomy import LEGACY_CLASSES, TAXONOMY
+
 class ImageCollector:
     """Automated image collection for Indian food dataset"""
     
@@ -37,8 +40,12 @@ class ImageCollector:
         print(f"📁 Created collection directories in {base_dir}")
         return base_dir
     
-    def collect_from_camera(self, dish_name, target_count=20):
-        """Collect images using webcam with guided capture"""
+    def collect_from_camera(self, dish_name, target_count=20, streamer=None):
+        """Collect images using webcam with guided capture
+        
+        Pass a streaming_detection.StreamingFoodDetector as `streamer` to see
+        live detections while framing each shot.
+        """
         print(f"📷 Starting camera collection for: {dish_name}")
         print("Instructions:")
         print("- Press SPACE to capture image")
@@ -61,6 +68,9 @@ class ImageCollector:
             
             # Add overlay with instructions
             overlay = frame.copy()
+            if streamer is not None:
+                from streaming_detection import draw_tracks
+                draw_tracks(overlay, streamer.process_frame(frame))
             cv2.putText(overlay, f"Dish: {dish_name}", (10, 30), 
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
             cv2.putText(overlay, f"Captured: {captured_count}/{target_count}", (10, 70), 
@@ -166,13 +176,7 @@ class LabelingAssistant:
     """AI-powered labeling assistance and validation"""
     
     def __init__(self):
-        self.dish_categories = {
-            'breakfast': ['aloo_paratha', 'plain_paratha', 'poha', 'upma', 'idli', 'dosa', 'bread_butter', 'tea'],
-            'lunch_dinner': ['dal_tadka', 'dal_fry', 'rajma', 'chole', 'rice', 'roti', 'chapati', 'aloo_sabzi', 'bhindi_sabzi', 'paneer_butter_masala'],
-            'sides': ['curd', 'pickle', 'papad', 'raita', 'salad'],
-            'beverages': ['tea', 'coffee'],
-            'snacks': ['samosa', 'pakora']
-        }
+        self.dish_categories = TAXONOMY.by_category()
         
         # Color ranges for Indian dishes (HSV)
         self.food_colors = {
@@ -212,7 +216,9 @@ class LabelingAssistant:
     def auto_suggest_bounding_boxes(self, image_path):
         """Automatically suggest bounding box locations"""
         img = cv2.imread(image_path)
-        original_img = img.copy()
+        if img is None:
+            print(f"❌ Could not read {image_path}")
+            return []
         
         # Convert to different color spaces for better detection
         hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
@@ -257,6 +263,13 @@ class LabelingAssistant:
                         'visual_coords': [x, y, w, h]  # For visualization
                     })
         
+        # Same checks as label_lint: clip to the frame, drop slivers and near-identical boxes
+        if suggested_boxes:
+            suggested_boxes.sort(key=lambda box: box['confidence'], reverse=True)
+            clipped, keep = clean_boxes([box['bbox'] for box in suggested_boxes])
+            suggested_boxes = [dict(box, bbox=[round(float(v), 6) for v in xywh])
+                               for box, xywh, kept in zip(suggested_boxes, clipped, keep) if kept]
+        
         return suggested_boxes
     
     def create_labeling_preview(self, image_path, suggested_boxes, dish_suggestions):
@@ -301,13 +314,7 @@ class DatasetValidator:
     
     def __init__(self, dataset_path):
         self.dataset_path = Path(dataset_path)
-        self.essential_dishes = [
-            'aloo_paratha', 'plain_paratha', 'poha', 'upma', 'idli', 'dosa', 
-            'bread_butter', 'tea', 'dal_tadka', 'dal_fry', 'rajma', 'chole',
-            'rice', 'roti', 'chapati', 'aloo_sabzi', 'bhindi_sabzi', 
-            'paneer_butter_masala', 'curd', 'pickle', 'coffee', 'samosa', 
-            'papad', 'raita', 'salad'
-        ]
+        self.essential_dishes = list(TAXONOMY.dishes)
     
     def validate_dataset_structure(self):
         """Validate YOLO dataset structure"""
@@ -340,14 +347,31 @@ class DatasetValidator:
         if not train_labels_dir.exists():
             return class_counts
         
+        # Ids follow the dataset's own class list; counts are per canonical dish
+        class_names = LEGACY_CLASSES
+        data_yaml = self.dataset_path / 'data.yaml'
+        if data_yaml.exists():
+            import yaml
+            with open(data_yaml, 'r') as f:
+                names = yaml.safe_load(f).get('names') or class_names
+            class_names = [names[i] for i in sorted(names)] if isinstance(names, dict) else names
+        
+        malformed = 0
         for label_file in train_labels_dir.glob('*.txt'):
             with open(label_file, 'r') as f:
                 for line in f:
                     if line.strip():
-                        class_id = int(line.strip().split()[0])
-                        dish_name = self.essential_dishes[class_id] if class_id < len(self.essential_dishes) else f'class_{class_id}'
+                        try:
+                            class_id = int(float(line.split()[0]))
+                        except (ValueError, OverflowError):
+                            malformed += 1
+                            continue
+                        name = class_names[class_id] if 0 <= class_id < len(class_names) else f'class_{class_id}'
+                        dish_name = TAXONOMY.canonical(name) or name
                         class_counts[dish_name] = class_counts.get(dish_name, 0) + 1
         
+        if malformed:
+            print(f"⚠️  Skipped {malformed} malformed label lines; run label_lint.py on {self.dataset_path}")
         return class_counts
     
     def generate_collection_plan(self):
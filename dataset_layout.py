@@ -0,0 +1,75 @@
+# 🗂️ Dataset Layout - StudXchange Custom Model
+## Image extensions and data.yaml split resolution shared by the tools
+
+"""
+Helpers for locating dataset files and reading YOLO labels, kept apart
+(NumPy and PyYAML only) so the training entry points, augmentation and
+label tools can use them without pulling in OpenCV, the detector or the
+evaluation engine.
+
+Usage:
+    from dataset_layout import IMAGE_EXTENSIONS, resolve_split_dir, split_images
+    train_dir = resolve_split_dir(dataset_location, data_config, 'train')
+    paths, names = split_images('data.yaml', 'val')
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def resolve_split_dir(dataset_location, data_config, split):
+    """Directory of a split from data.yaml, resolved like ultralytics does"""
+    split_path = data_config.get(split)
+    if split_path is None:
+        return None
+    root = Path(data_config.get('path') or dataset_location)
+    if not root.is_absolute():
+        root = Path(dataset_location) / root
+    candidate = (root / split_path).resolve()
+    if not candidate.exists() and split_path.startswith('../'):
+        # Roboflow exports use ../train/images style paths
+        candidate = (root / split_path[3:]).resolve()
+    return candidate
+
+
+def split_images(data_yaml, split="val"):
+    """(image paths, class names dict) for one split of a YOLO data.yaml"""
+    with open(data_yaml, 'r') as f:
+        data = yaml.safe_load(f)
+    root = Path(data.get('path') or Path(data_yaml).parent)
+    names = data.get('names', {})
+    names = dict(enumerate(names)) if isinstance(names, list) else {int(k): v for k, v in names.items()}
+
+    entries = data[split] if isinstance(data[split], list) else [data[split]]
+    paths = []
+    for entry in entries:
+        entry = Path(entry) if Path(entry).is_absolute() else root / entry
+        if entry.is_dir():
+            paths += sorted(str(p) for p in entry.rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS)
+        else:
+            with open(entry, 'r') as f:
+                paths += [str(root / line.strip()) for line in f if line.strip()]
+    return paths, names
+
+
+def label_path(image_path):
+    """YOLO convention: .../images/<split>/x.jpg -> .../labels/<split>/x.txt"""
+    parts = Path(image_path).with_suffix('.txt').parts
+    index = len(parts) - 1 - parts[::-1].index('images')
+    return str(Path(*parts[:index], 'labels', *parts[index + 1:]))
+
+
+def read_labels(image_path, width, height):
+    """(class ids, xyxy pixel boxes) from the image's YOLO label file"""
+    path = label_path(image_path)
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return np.zeros(0, np.int16), np.zeros((0, 4), np.float32)
+    rows = np.loadtxt(path, ndmin=2, dtype=np.float32)[:, :5]
+    cx, cy, w, h = rows[:, 1] * width, rows[:, 2] * height, rows[:, 3] * width, rows[:, 4] * height
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    return rows[:, 0].astype(np.int16), boxes.astype(np.float32)
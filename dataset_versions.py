@@ -0,0 +1,341 @@
+# 🗃️ Dataset Versions - StudXchange Custom Model
+## Content-addressed, deduplicated snapshots of YOLO datasets
+
+"""
+Roboflow downloads and zip files carry no history, and every new export
+recopies every image. This store keeps each distinct file once, under its
+SHA-256, and a version is only a manifest mapping relative paths to hashes:
+
+    datasets/
+      objects/ab/cdef...      file contents, stored once, read-only
+      versions/<name>.json    {"parent", "created", "note", "files": {relpath: sha256}}
+      stat_cache.json         (size, mtime) -> hash per source file, so
+                              re-committing a big folder only hashes changes
+
+A relabelling pass therefore adds a few KB of label blobs and a manifest,
+not another copy of the images. `diff` reports added / removed / moved /
+relabelled / image-changed samples per split, and `checkout` rebuilds any
+version in seconds: images are hardlinked from the store (blobs are
+read-only, so in-place edits can't corrupt them) and label files are copied
+so they can be edited freely.
+
+The training pipeline accepts a version as its dataset source
+(`--source version --dataset-version v3`), so a run records exactly which
+data it saw.
+
+Usage:
+    python dataset_versions.py commit data/labeled_dataset --name v3 --note "fixed dal labels"
+    python dataset_versions.py list
+    python dataset_versions.py diff v2 v3
+    python dataset_versions.py checkout v3 working/dataset_v3
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import yaml
+
+from dataset_layout import IMAGE_EXTENSIONS
+
+DATASET_STORE = os.environ.get("DATASET_STORE", "datasets")
+LABEL_EXTENSIONS = ('.txt',)
+METADATA_FILES = ('data.yaml',)
+
+# ====================================================================
+# OBJECT STORE
+# ====================================================================
+
+def hash_file(path, chunk_size=1 << 20):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class DatasetStore:
+    """Content-addressed blobs plus named version manifests"""
+
+    def __init__(self, root=DATASET_STORE):
+        self.root = Path(root)
+        self.objects = self.root / 'objects'
+        self.versions_dir = self.root / 'versions'
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.versions_dir.mkdir(parents=True, exist_ok=True)
+
+    def object_path(self, digest):
+        return self.objects / digest[:2] / digest[2:]
+
+    def put(self, path, digest):
+        """Copy a file into the store unless its content is already there; returns True if new"""
+        target = self.object_path(digest)
+        if target.exists():
+            return False
+        target.parent.mkdir(exist_ok=True)
+        tmp = target.with_name(f"{target.name}.tmp{os.getpid()}")
+        shutil.copyfile(path, tmp)
+        os.chmod(tmp, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        os.replace(tmp, target)
+        return True
+
+    def versions(self):
+        """Manifests (without file lists) sorted by creation time"""
+        summaries = []
+        for path in self.versions_dir.glob('*.json'):
+            manifest = self.read(path.stem)
+            summaries.append({**{k: v for k, v in manifest.items() if k != 'files'}, 'files': len(manifest['files'])})
+        return sorted(summaries, key=lambda m: m['created'])
+
+    def read(self, name):
+        path = self.versions_dir / f"{name}.json"
+        if not path.exists():
+            raise KeyError(f"Unknown dataset version: {name}")
+        with open(path) as f:
+            return json.load(f)
+
+    def latest(self):
+        versions = self.versions()
+        return versions[-1]['name'] if versions else None
+
+    def _stat_cache(self):
+        path = self.root / 'stat_cache.json'
+        if path.exists():
+            with open(path) as f:
+                return json.load(f)
+        return {}
+
+    def _hash_all(self, files, workers=8):
+        """{abs path: sha256}, reusing hashes of files whose size and mtime are unchanged"""
+        cache = self._stat_cache()
+        digests, todo = {}, []
+        for path in files:
+            st = os.stat(path)
+            entry = cache.get(path)
+            if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+                digests[path] = entry[2]
+            else:
+                todo.append((path, st))
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for (path, st), digest in zip(todo, pool.map(lambda item: hash_file(item[0]), todo)):
+                digests[path] = digest
+                cache[path] = [st.st_size, st.st_mtime_ns, digest]
+
+        tmp = self.root / 'stat_cache.json.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp, self.root / 'stat_cache.json')
+        return digests, len(todo)
+
+    def commit(self, dataset_dir, name=None, note="", parent=None, workers=8):
+        """Snapshot a YOLO dataset folder as a new version; returns the manifest"""
+        dataset_dir = Path(dataset_dir).resolve()
+        tracked = IMAGE_EXTENSIONS + LABEL_EXTENSIONS
+        files = []
+        for root, dirs, filenames in os.walk(dataset_dir):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            for filename in sorted(filenames):
+                if filename.lower().endswith(tracked) or filename in METADATA_FILES:
+                    files.append(os.path.join(root, filename))
+
+        digests, hashed = self._hash_all(files, workers)
+        added = sum(self.put(path, digest) for path, digest in digests.items())
+
+        name = name or f"v{len(list(self.versions_dir.glob('*.json'))) + 1}"
+        if (self.versions_dir / f"{name}.json").exists():
+            raise ValueError(f"Dataset version {name} already exists")
+        manifest = {
+            'name': name,
+            'parent': parent if parent is not None else self.latest(),
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'note': note,
+            'source': str(dataset_dir),
+            'files': {os.path.relpath(path, dataset_dir).replace(os.sep, '/'): digest
+                      for path, digest in sorted(digests.items())}
+        }
+        tmp = self.versions_dir / f"{name}.json.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp, self.versions_dir / f"{name}.json")
+
+        print(f"🗃️  {name}: {len(files)} files ({hashed} hashed, {added} new blobs stored)")
+        return manifest
+
+    def checkout(self, name, target):
+        """Rebuild a version: images hardlinked from the store, labels and data.yaml copied"""
+        manifest = self.read(name)
+        target = Path(target).resolve()
+        linked = copied = 0
+
+        wanted = set(manifest['files'])
+        tracked = IMAGE_EXTENSIONS + LABEL_EXTENSIONS
+        if target.exists():
+            # Remove dataset files that are not part of this version; anything commit
+            # would not have picked up (weights, notes, hidden dirs) is left alone
+            for root, dirs, filenames in os.walk(target):
+                dirs[:] = [d for d in dirs if not d.startswith('.')]
+                for filename in filenames:
+                    if not (filename.lower().endswith(tracked) or filename in METADATA_FILES):
+                        continue
+                    rel = os.path.relpath(os.path.join(root, filename), target).replace(os.sep, '/')
+                    if rel not in wanted:
+                        os.remove(os.path.join(root, filename))
+
+        for rel, digest in manifest['files'].items():
+            source, destination = self.object_path(digest), target / rel
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            if rel.lower().endswith(IMAGE_EXTENSIONS):
+                if destination.exists() and os.path.samefile(source, destination):
+                    continue
+                if destination.exists():
+                    destination.unlink()
+                try:
+                    os.link(source, destination)
+                except OSError:
+                    shutil.copyfile(source, destination)  # different filesystem
+                linked += 1
+            else:
+                if destination.exists():
+                    destination.unlink()
+                shutil.copyfile(source, destination)
+                os.chmod(destination, stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
+                copied += 1
+
+        data_yaml = target / 'data.yaml'
+        if data_yaml.exists():
+            with open(data_yaml) as f:
+                data = yaml.safe_load(f)
+            data['path'] = str(target)
+            with open(data_yaml, 'w') as f:
+                yaml.safe_dump(data, f, sort_keys=False)
+
+        print(f"📂 {name} checked out to {target} ({linked} images linked, {copied} labels/metadata copied)")
+        return str(target)
+
+    def gc(self):
+        """Delete blobs no version references; returns the number removed"""
+        referenced = set()
+        for path in self.versions_dir.glob('*.json'):
+            with open(path) as f:
+                referenced.update(json.load(f)['files'].values())
+        removed = 0
+        for blob in self.objects.glob('*/*'):
+            if blob.parent.name + blob.name not in referenced and '.tmp' not in blob.name:
+                blob.unlink()
+                removed += 1
+        return removed
+
+# ====================================================================
+# DIFF
+# ====================================================================
+
+def _samples(files):
+    """{image relpath: (image sha, label sha or None)} pairing images/x.jpg with labels/x.txt"""
+    samples = {}
+    for rel, digest in files.items():
+        if not rel.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        parts = rel.split('/')
+        if 'images' in parts:
+            index = len(parts) - 1 - parts[::-1].index('images')
+            parts[index] = 'labels'
+        label = '/'.join(parts).rsplit('.', 1)[0] + '.txt'
+        samples[rel] = (digest, files.get(label))
+    return samples
+
+
+def _split_of(rel):
+    parts = rel.split('/')
+    for split in ('train', 'valid', 'val', 'test'):
+        if split in parts:
+            return split
+    return parts[0] if len(parts) > 1 else '.'
+
+
+def diff_versions(store, old_name, new_name):
+    """Per-split added / removed / moved / relabelled / image-changed samples"""
+    old, new = _samples(store.read(old_name)['files']), _samples(store.read(new_name)['files'])
+    old_by_image = {}
+    for rel, (image, _) in old.items():
+        old_by_image.setdefault(image, rel)
+
+    changes = {kind: [] for kind in ('added', 'removed', 'moved', 'relabelled', 'image_changed')}
+    matched_old = set()
+    for rel, (image, label) in new.items():
+        if rel in old:
+            matched_old.add(rel)
+            old_image, old_label = old[rel]
+            if old_image != image:
+                changes['image_changed'].append(rel)
+            elif old_label != label:
+                changes['relabelled'].append(rel)
+        elif image in old_by_image and old_by_image[image] not in new:
+            source = old_by_image[image]
+            matched_old.add(source)
+            changes['moved'].append(f"{source} -> {rel}")
+            if old[source][1] != label:
+                changes['relabelled'].append(rel)
+        else:
+            changes['added'].append(rel)
+    changes['removed'] = sorted(set(old) - matched_old)
+
+    summary = {}
+    for kind, items in changes.items():
+        for item in items:
+            split = _split_of(item.split(' -> ')[-1])
+            summary.setdefault(split, {k: 0 for k in changes})[kind] += 1
+    return {'old': old_name, 'new': new_name, 'summary': summary, 'changes': changes}
+
+# ====================================================================
+# COMMAND LINE
+# ====================================================================
+
+def main():
+    """Commit, list, diff and check out dataset versions"""
+    parser = argparse.ArgumentParser(description="StudXchange dataset version store")
+    parser.add_argument("--store", default=DATASET_STORE)
+    sub = parser.add_subparsers(dest="command", required=True)
+    commit = sub.add_parser("commit", help="Snapshot a YOLO dataset folder")
+    commit.add_argument("dataset")
+    commit.add_argument("--name")
+    commit.add_argument("--note", default="")
+    sub.add_parser("list", help="List versions")
+    diff = sub.add_parser("diff", help="Compare two versions")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    diff.add_argument("--show", type=int, default=10, help="Example paths per change kind")
+    checkout = sub.add_parser("checkout", help="Materialize a version")
+    checkout.add_argument("name")
+    checkout.add_argument("target")
+    sub.add_parser("gc", help="Delete unreferenced blobs")
+    args = parser.parse_args()
+
+    store = DatasetStore(args.store)
+    if args.command == "commit":
+        store.commit(args.dataset, args.name, args.note)
+    elif args.command == "list":
+        for v in store.versions():
+            print(f"{v['name']:<16} {v['created']}  {v['files']:>7} files  parent={v['parent']}  {v['note']}")
+    elif args.command == "diff":
+        result = diff_versions(store, args.old, args.new)
+        print(f"\n🔍 {args.old} → {args.new}")
+        for split, counts in sorted(result['summary'].items()):
+            print(f"   {split:<8} " + "  ".join(f"{k}={v}" for k, v in counts.items()))
+        for kind, items in result['changes'].items():
+            for item in items[:args.show]:
+                print(f"   {kind:<14} {item}")
+    elif args.command == "checkout":
+        store.checkout(args.name, args.target)
+    else:
+        print(f"🧹 Removed {store.gc()} unreferenced blobs")
+
+
+if __name__ == "__main__":
+    main()
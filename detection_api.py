@@ -0,0 +1,401 @@
+# 🔌 Detection HTTP API - StudXchange Custom Model
+## Stand-in for the Space's detect_food API, runnable locally
+
+"""
+A small stdlib HTTP server exposing the same response shape as the Gradio
+app's `api_detect_food`, so load tests and integrations can run against a
+local instance without Gradio in the loop.
+
+Endpoints:
+    POST /api/detect_food?conf=0.5         body: raw image bytes (JPEG/PNG)
+    POST /api/detect_food/batch?conf=0.5   body: multipart/form-data, one file part per image
+                                           (&menu=same_meal|separate adds a consolidated menu)
+    GET  /health                           status, model and process RSS
+
+Requests go through an InferenceScheduler (one worker owns the model, the
+ultralytics predictor is not thread-safe). Headers:
+    X-Request-Class: interactive | batch   (default interactive)
+    X-API-Key: <key>                        rate-limit bucket (else client IP)
+Over-limit callers get 429, a full queue 503, both with Retry-After.
+
+Successful responses are JSON unless the Accept header asks for one of the
+compact encodings in response_codec.py (msgpack or a raw columnar buffer).
+
+The batch endpoint takes up to 32 images (one menu photo session) in one
+request and streams NDJSON back (chunked), one line per image as soon as it
+finishes, then a summary line:
+
+    {"index": 2, "filename": "thali.jpg", "code": 200, "status": "success", "detections": [...], ...}
+    {"index": 0, "filename": "blurry.jpg", "code": 400, "status": "error", "message": "..."}
+    {"event": "done", "count": 3, "errors": 1}
+
+With `menu=same_meal` (photos of one meal, dishes counted once) or
+`menu=separate` (different plates, portions summed) the done line also
+carries the consolidated menu from menu_aggregation.py and its rendered
+`menu_items` (menu_rendering.py), so a backend no longer has to merge
+per-image boxes itself.
+
+Images run through the detector as batched forward passes in chunks of
+BATCH_CHUNK, each chunk a separate scheduler item so interactive requests
+still get in between; a bad image only fails its own line. The whole batch
+is charged to the rate limit up front (one token per image); a batch larger
+than the key's burst could never be admitted and gets 400 instead of 429.
+
+Usage:
+    python detection_api.py --model studxchange_model.pt --port 8000
+    curl --data-binary @plate.jpg "http://localhost:8000/api/detect_food?conf=0.4"
+    curl -N -F image_file=@a.jpg -F image_file=@b.jpg "http://localhost:8000/api/detect_food/batch?menu=same_meal"
+"""
+
+import argparse
+import email.policy
+import io
+import json
+import queue
+import threading
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from PIL import Image
+
+from detector_metrics import RequestTrace
+from hardware_profile import probe_process_rss
+from inference_scheduler import INTERACTIVE, InferenceScheduler, QueueFull, RateLimited, RateLimiter
+from menu_aggregation import aggregate_menu
+from menu_rendering import COMPACT, render_menu
+from request_coalescing import SingleFlight, content_key
+from response_codec import class_table, encode_response, negotiate, table_id
+
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+MAX_BATCH_IMAGES = 32
+MAX_BATCH_BYTES = 100 * 1024 * 1024
+BATCH_CHUNK = 4  # images per forward pass / scheduler item
+
+
+def parse_confidence(params, default=0.5):
+    """?conf= as a float in [0, 1]; ValueError (-> 400) otherwise"""
+    raw = params.get('conf', [default])[0]
+    try:
+        confidence = float(raw)
+    except (TypeError, ValueError):
+        raise ValueError(f"conf must be a number between 0 and 1, got {raw!r}")
+    if not 0.0 <= confidence <= 1.0:
+        raise ValueError(f"conf must be between 0 and 1, got {confidence}")
+    return confidence
+
+
+def parse_multipart(body, content_type):
+    """[(filename, bytes)] for every file part of a multipart/form-data body"""
+    if not content_type.lower().startswith('multipart/form-data'):
+        raise ValueError("batch body must be multipart/form-data")
+    message = BytesParser(policy=email.policy.HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode('latin-1') + b"\r\n\r\n" + body)
+
+    uploads = []
+    for part in message.iter_parts():
+        filename = part.get_filename()
+        if filename is None:
+            continue  # plain form fields
+        uploads.append((filename, part.get_payload(decode=True) or b''))
+    return uploads
+
+# ====================================================================
+# REQUEST HANDLING
+# ====================================================================
+
+class DetectionAPIHandler(BaseHTTPRequestHandler):
+    """Routes requests to the detector attached to the server"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if urlparse(self.path).path != '/health':
+            self._send_json(404, {"status": "error", "message": "not found"})
+            return
+        self._send_json(200, {
+            "status": "ok",
+            "model": self.server.detector.model_path,
+            "rss_bytes": probe_process_rss()
+        })
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == '/api/detect_food/batch':
+            self._detect_batch(url)
+            return
+        if url.path != '/api/detect_food':
+            self._send_json(404, {"status": "error", "message": "not found"})
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        if length <= 0 or length > MAX_UPLOAD_BYTES:
+            self._send_json(413 if length > 0 else 400,
+                            {"status": "error", "message": f"image body must be 1..{MAX_UPLOAD_BYTES} bytes"})
+            return
+        body = self.rfile.read(length)
+
+        params = parse_qs(url.query)
+        lane = self.headers.get('X-Request-Class', INTERACTIVE).lower()
+        key = self.headers.get('X-API-Key') or self.client_address[0]
+        try:
+            confidence_threshold = parse_confidence(params)
+            status, payload = self.server.detect(body, confidence_threshold, lane, key)
+        except RateLimited as e:
+            self._send_json(429, {"status": "error", "message": str(e)},
+                            {"Retry-After": str(max(1, round(e.retry_after)))})
+            return
+        except QueueFull as e:
+            self._send_json(503, {"status": "error", "message": str(e)}, {"Retry-After": "1"})
+            return
+        except ValueError as e:
+            self._send_json(400, {"status": "error", "message": str(e)})
+            return
+
+        if status != 200:
+            self._send_json(status, payload)
+            return
+        table, current_table_id = self.server.class_table()
+        body, content_type = encode_response(payload, negotiate(self.headers.get('Accept')), table,
+                                             self.headers.get('X-Class-Table'))
+        self._send_body(200, body, content_type, {"X-Class-Table": current_table_id, "Vary": "Accept"})
+
+    def _detect_batch(self, url):
+        length = int(self.headers.get('Content-Length', 0))
+        if length <= 0 or length > MAX_BATCH_BYTES:
+            self._send_json(413 if length > 0 else 400,
+                            {"status": "error", "message": f"batch body must be 1..{MAX_BATCH_BYTES} bytes"})
+            return
+        body = self.rfile.read(length)
+
+        params = parse_qs(url.query)
+        menu = params.get('menu', [None])[0]
+        lane = self.headers.get('X-Request-Class', INTERACTIVE).lower()
+        key = self.headers.get('X-API-Key') or self.client_address[0]
+        try:
+            confidence_threshold = parse_confidence(params)
+            if menu not in (None, 'same_meal', 'separate'):
+                raise ValueError("menu must be same_meal or separate")
+            uploads = parse_multipart(body, self.headers.get('Content-Type', ''))
+            if not uploads or len(uploads) > MAX_BATCH_IMAGES:
+                raise ValueError(f"batch must contain 1..{MAX_BATCH_IMAGES} image files")
+            lines = self.server.detect_batch(uploads, confidence_threshold, lane, key)
+        except RateLimited as e:
+            self._send_json(429, {"status": "error", "message": str(e)},
+                            {"Retry-After": str(max(1, round(e.retry_after)))})
+            return
+        except QueueFull as e:
+            self._send_json(503, {"status": "error", "message": str(e)}, {"Retry-After": "1"})
+            return
+        except ValueError as e:
+            self._send_json(400, {"status": "error", "message": str(e)})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        errors = 0
+        succeeded = [None] * len(uploads)
+        try:
+            for line in lines:
+                errors += line["code"] != 200
+                if line["code"] == 200:
+                    succeeded[line["index"]] = line
+                self._write_chunk(json.dumps(line).encode() + b"\n")
+            done = json.dumps({"event": "done", "count": len(uploads), "errors": errors})
+            if menu:
+                consolidated = aggregate_menu([line for line in succeeded if line], same_meal=menu == 'same_meal')
+                # menu_items is already compact JSON text; splice it in rather than re-encoding
+                done = (f'{done[:-1]}, "menu": {json.dumps(consolidated)}, '
+                        f'"menu_items": {render_menu(consolidated, COMPACT)}}}')
+            self._write_chunk(done.encode() + b"\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # client went away; queued chunks still finish
+
+    def _write_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _send_json(self, status, payload, headers=None):
+        self._send_body(status, json.dumps(payload).encode(), "application/json", headers)
+
+    def _send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # per-request logging goes through RequestTrace
+
+
+class DetectionAPIServer(ThreadingHTTPServer):
+    """Threaded HTTP server owning one detector (or a ModelRegistry)"""
+
+    daemon_threads = True
+
+    def __init__(self, detector, host="0.0.0.0", port=8000, limiter=None):
+        super().__init__((host, port), DetectionAPIHandler)
+        self.detector = detector
+        self.scheduler = InferenceScheduler(detector, limiter or RateLimiter.from_env())
+        self.coalescer = SingleFlight(linger_if=lambda result: result["success"], retry_on=(QueueFull,))
+        self.table_cache = (None, None, None)
+
+    def class_table(self):
+        """(class table, table id) of the active model, rebuilt after a hot-swap"""
+        active = self.detector.active_detector() if hasattr(self.detector, 'active_detector') else self.detector
+        if self.table_cache[0] is not active:
+            table = class_table(active)
+            self.table_cache = (active, table, table_id(table))
+        return self.table_cache[1], self.table_cache[2]
+
+    def detect(self, image_bytes, confidence_threshold, lane=INTERACTIVE, key=None):
+        """Decode, detect and shape the API response; returns (http_status, payload)
+
+        Raises RateLimited / QueueFull when the scheduler refuses the request.
+        """
+        trace = RequestTrace("api", upload_bytes=len(image_bytes))
+        try:
+            # Header only; pixels are decoded inside the memory ceiling (possibly at reduced scale)
+            image = Image.open(io.BytesIO(image_bytes))
+        except Exception as e:
+            trace.fail("decode", e)
+            trace.finish()
+            return 400, {"status": "error", "message": f"could not decode image: {e}"}
+
+        try:
+            # Every request pays its own rate limit, coalesced or not
+            self.scheduler.admit(lane, key)
+            try:
+                # Identical uploads in flight together share one scheduled inference
+                result = self.coalescer.run(content_key(image_bytes, confidence_threshold, lane),
+                                            self.scheduler.detect_food, image, confidence_threshold, trace, lane)
+            except QueueFull:
+                self.scheduler.refund(key)
+                raise
+        except (RateLimited, QueueFull, ValueError) as e:
+            trace.fail("schedule", e)
+            trace.finish()
+            raise
+        trace.finish([d["dish_name"] for d in result["detections"]])
+        return self._response(result)
+
+    def detect_batch(self, uploads, confidence_threshold, lane=INTERACTIVE, key=None):
+        """Queue a list of (filename, image bytes); returns an iterator of per-image response lines
+
+        Lines come in completion order, each tagged with its upload index.
+        Raises RateLimited / QueueFull (before anything is queued) when the
+        scheduler refuses the batch; a queue filling up part-way through only
+        fails the images that did not fit. Raises ValueError for a batch
+        larger than the key's burst, which no amount of waiting would admit.
+        """
+        largest = self.scheduler.max_cost(key)
+        if len(uploads) > largest:
+            raise ValueError(f"batch of {len(uploads)} images exceeds the rate limit burst for this key; "
+                             f"send at most {int(largest)} images per batch")
+        finished = queue.Queue()
+        images, traces, indices = [], [], []
+        for index, (filename, data) in enumerate(uploads):
+            trace = RequestTrace("api_batch", upload_bytes=len(data), batch_index=index)
+            try:
+                images.append(Image.open(io.BytesIO(data)))
+            except Exception as e:
+                trace.fail("decode", e)
+                finished.put((index, trace, 400, {"status": "error", "message": f"could not decode image: {e}"}))
+                continue
+            traces.append(trace)
+            indices.append(index)
+
+        cost = len(images)
+        for start in range(0, len(images), BATCH_CHUNK):
+            chunk = slice(start, start + BATCH_CHUNK)
+            task = self._batch_task(images[chunk], traces[chunk], indices[chunk], confidence_threshold, finished)
+            try:
+                self.scheduler.submit_call(task, lane, key, cost=cost, traces=traces[chunk])
+            except (RateLimited, QueueFull) as e:
+                if start == 0:
+                    for trace in traces:
+                        trace.fail("schedule", e)
+                        trace.finish()
+                    raise
+                for index, trace in zip(indices[chunk], traces[chunk]):
+                    trace.fail("schedule", e)
+                    finished.put((index, trace, 503, {"status": "error", "message": str(e)}))
+            cost = 0  # charged once for the whole batch
+
+        def lines():
+            for _ in uploads:
+                index, trace, status, payload = finished.get()
+                trace.finish([d["dish_name"] for d in payload.get("detections", [])])
+                yield {"index": index, "filename": uploads[index][0], "code": status, **payload}
+
+        return lines()
+
+    def _batch_task(self, images, traces, indices, confidence_threshold, finished):
+        """Scheduler callable running one chunk as a batched forward pass"""
+        def run(detector):
+            reported = set()
+            try:
+                for i, result in detector.detect_food_batch(images, confidence_threshold, traces=traces):
+                    reported.add(i)
+                    finished.put((indices[i], traces[i], *self._response(result)))
+            except Exception as e:
+                for i in range(len(images)):
+                    if i not in reported:
+                        traces[i].fail("detect", e)
+                        finished.put((indices[i], traces[i], 500, {"status": "error", "message": str(e)}))
+        return run
+
+    def _response(self, result):
+        """(http_status, payload) for one detect_food result"""
+        if not result["success"]:
+            status = 413 if result.get("error_type") == "ImageTooLarge" else 500
+            return status, {"status": "error", "message": result.get("error", "Detection failed")}
+
+        return 200, {
+            "status": "success",
+            "detections": result["detections"],
+            "total_dishes": result["total_dishes"],
+            "inference_time": result["inference_time"],
+            "model": "StudXchange Custom YOLOv8"
+        }
+
+
+def serve_in_background(detector, host="127.0.0.1", port=8000):
+    """Start the API on a daemon thread (for local load tests)"""
+    server = DetectionAPIServer(detector, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True, name="detection-api").start()
+    return server
+
+# ====================================================================
+# COMMAND LINE
+# ====================================================================
+
+def main():
+    """Serve the detection API"""
+    parser = argparse.ArgumentParser(description="StudXchange detection HTTP API")
+    parser.add_argument("--model", default="studxchange_model.pt", help="Used when the registry is empty")
+    parser.add_argument("--registry", default="models", help="Model registry directory")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    from model_registry import ModelRegistry
+
+    registry = ModelRegistry(args.registry, default_model_path=args.model)
+    registry.watch()
+    server = DetectionAPIServer(registry, args.host, args.port)
+    print(f"🔌 Detection API at: http://{args.host}:{args.port}/api/detect_food")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+# 📈 Detector Metrics - StudXchange Custom Model
+## Prometheus-style counters, latency histograms and structured request logs
+
+"""
+Dependency-free instrumentation for the inference service.
+
+- `stage_timer(trace, "forward")` times one stage with the monotonic
+  perf_counter clock and records it both in the request trace and in the
+  `studx_stage_seconds{stage=...}` histogram
+- counters for requests, detections per dish, errors and cache hits, and
+  a process RSS gauge
+- `render_metrics()` produces the Prometheus text exposition format and
+  `start_metrics_server(port)` serves it on /metrics
+- every finished request is written as one JSON line to the
+  `studxchange.requests` logger
+
+Enable the endpoint with METRICS_PORT=9100 when starting the app.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+request_logger = logging.getLogger("studxchange.requests")
+
+# Latency buckets in seconds (5 ms ... 20 s)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+
+# ====================================================================
+# METRIC TYPES
+# ====================================================================
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.values.get(tuple(labels.get(n, '') for n in self.labelnames), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Gauge:
+    """Point-in-time value with optional labels"""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def set(self, value, **labels):
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        with self.lock:
+            self.values[key] = value
+
+    def value(self, **labels):
+        return self.values.get(tuple(labels.get(n, '') for n in self.labelnames), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        with self.lock:
+            counts, total = self.series.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self.series[key] = (counts, total + value)
+
+    def count(self, **labels):
+        counts, _ = self.series.get(tuple(labels.get(n, '') for n in self.labelnames), ([0], 0.0))
+        return sum(counts)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, (counts, total) in sorted(self.series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + (le,))} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total:.6f}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+# ====================================================================
+# REGISTRY
+# ====================================================================
+
+class MetricsRegistry:
+    """Holds every metric exposed on /metrics"""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def counter(self, name, help_text, labelnames=()):
+        return self.metrics.setdefault(name, Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self.metrics.setdefault(name, Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.metrics.setdefault(name, Histogram(name, help_text, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "studx_stage_seconds", "Time spent in each detection stage", ("stage",))
+REQUEST_SECONDS = REGISTRY.histogram(
+    "studx_request_seconds", "End-to-end detection request latency", ("endpoint",))
+REQUESTS_TOTAL = REGISTRY.counter(
+    "studx_requests_total", "Detection requests by endpoint and status", ("endpoint", "status"))
+DETECTIONS_TOTAL = REGISTRY.counter(
+    "studx_detections_total", "Detections returned per dish", ("dish",))
+ERRORS_TOTAL = REGISTRY.counter(
+    "studx_errors_total", "Errors by stage and exception type", ("stage", "error"))
+CACHE_HITS_TOTAL = REGISTRY.counter(
+    "studx_cache_hits_total", "Requests served without running the model", ("cache",))
+PROCESS_RSS_BYTES = REGISTRY.gauge(
+    "studx_process_rss_bytes", "Resident memory of the serving process")
+
+
+def render_metrics():
+    """Prometheus text exposition of every registered metric"""
+    return REGISTRY.render()
+
+# ====================================================================
+# REQUEST TRACING
+# ====================================================================
+
+class RequestTrace:
+    """Per-request stage timings, written as one structured log line when finished"""
+
+    def __init__(self, endpoint="detect_food", **fields):
+        self.request_id = uuid.uuid4().hex[:12]
+        self.endpoint = endpoint
+        self.fields = dict(fields)
+        self.stages = {}
+        self.started_at = time.perf_counter()
+        self.status = "success"
+
+    def record(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        STAGE_SECONDS.observe(seconds, stage=stage)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started_at
+
+    def fail(self, stage, error):
+        self.status = "error"
+        self.fields["error"] = str(error)
+        ERRORS_TOTAL.inc(stage=stage, error=type(error).__name__)
+
+    def finish(self, detections=()):
+        """Update request counters and emit the structured log line"""
+        total = self.elapsed
+        REQUEST_SECONDS.observe(total, endpoint=self.endpoint)
+        REQUESTS_TOTAL.inc(endpoint=self.endpoint, status=self.status)
+        for dish_name in detections:
+            DETECTIONS_TOTAL.inc(dish=dish_name)
+
+        request_logger.info(json.dumps({
+            "event": "detect",
+            "request_id": self.request_id,
+            "endpoint": self.endpoint,
+            "status": self.status,
+            "total_seconds": round(total, 6),
+            "stages": {k: round(v, 6) for k, v in self.stages.items()},
+            "detections": len(detections),
+            **self.fields
+        }))
+        return total
+
+
+@contextmanager
+def stage_timer(trace, stage):
+    """Time a block with the monotonic clock; errors are counted against the stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        if trace is not None:
+            trace.fail(stage, e)
+        raise
+    finally:
+        if trace is not None:
+            trace.record(stage, time.perf_counter() - start)
+
+# ====================================================================
+# /metrics ENDPOINT
+# ====================================================================
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_metrics().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # keep scrapes out of the app log
+
+
+def start_metrics_server(port=9100, host="0.0.0.0"):
+    """Serve /metrics from a daemon thread"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-server").start()
+    print(f"📈 Metrics available at: http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,477 @@
+# 🎯 Evaluation Engine - StudXchange Custom Model
+## Cached predictions, per-dish AP, confusion and error slices
+
+"""
+`best_model.val()` reruns the model for every question and only reports
+averages, so per-dish failures (dal_tadka vs dal_fry, roti vs chapati) stay
+invisible. This module runs the model over a split once at a low confidence
+threshold and caches every prediction, ground-truth box and image-quality
+stat in one .npz. Everything else is NumPy over the cached arrays:
+
+- per-class AP at IoU 0.50:0.95 (COCO 101-point interpolation)
+- precision / recall and a confusion matrix at any confidence threshold,
+  with the most frequent dish-vs-dish confusions listed
+- IoU-threshold sweeps
+- slices by image size, blur, brightness and box count
+
+Matching is done once per IoU threshold set and reused, so changing the
+confidence threshold or slicing re-analyzes in well under a second.
+
+Usage:
+    python evaluation.py cache studxchange_model.pt data.yaml --split val
+    python evaluation.py report .eval_cache/studxchange_model_val_<hash>.npz --conf 0.25 --slices
+    python evaluation.py report <cache>.npz --iou-sweep 0.3 0.5 0.7 0.9 --json eval_report.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from batch_scoring import prefetch_decoded, score_images
+from dataset_layout import label_path, read_labels, split_images
+from shared_weights import checkpoint_hash
+from geometry import box_iou
+
+EVAL_CACHE_DIR = ".eval_cache"
+IOU_THRESHOLDS = tuple(np.round(np.linspace(0.5, 0.95, 10), 2))
+RECALL_POINTS = np.linspace(0, 1, 101)
+
+# Same thresholds as ImageCollector.validate_image_quality
+BLUR_THRESHOLD = 100
+DARK_THRESHOLD = 50
+BRIGHT_THRESHOLD = 200
+
+# ====================================================================
+# SPLIT LOADING
+# ====================================================================
+
+def image_quality(image):
+    """(blur score, mean brightness) of a BGR image, on a downscaled gray copy"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    scale = 640 / max(gray.shape)
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var()), float(gray.mean())
+
+# ====================================================================
+# PREDICTION CACHE
+# ====================================================================
+
+class Predictions:
+    """Flat arrays of every prediction and ground-truth box in a split
+
+    Boxes of image i are the rows where `pred_image == i` / `gt_image == i`;
+    rows are stored grouped by image.
+    """
+
+    ARRAYS = ('paths', 'widths', 'heights', 'blur', 'brightness',
+              'pred_image', 'pred_boxes', 'pred_cls', 'pred_conf',
+              'gt_image', 'gt_boxes', 'gt_cls')
+
+    def __init__(self, names, **arrays):
+        self.names = names
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @property
+    def num_images(self):
+        return len(self.paths)
+
+    @property
+    def num_classes(self):
+        return max(max(self.names, default=-1) + 1,
+                   int(self.gt_cls.max(initial=-1)) + 1, int(self.pred_cls.max(initial=-1)) + 1)
+
+    def save(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(path, names=json.dumps(self.names), **{n: getattr(self, n) for n in self.ARRAYS})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            names = {int(k): v for k, v in json.loads(str(data['names'])).items()}
+            return cls(names, **{n: data[n] for n in cls.ARRAYS})
+
+
+def _label_stat(image_path):
+    """'size:mtime_ns' of an image's label file, or '-' without one"""
+    try:
+        stat = os.stat(label_path(image_path))
+    except (OSError, ValueError):
+        return '-'
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def cache_path(model_path, paths, split, imgsz, cache_dir=EVAL_CACHE_DIR, names=None):
+    """Cache file keyed by model weights, inference size, class names, images and their label files"""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(checkpoint_hash(model_path).encode())
+    digest.update(f"{imgsz}\n".encode())
+    # Ground truth is cached too: a remap or label fix must not reuse it
+    digest.update(json.dumps(names or {}, sort_keys=True).encode())
+    for path in paths:
+        digest.update(f"{path}\t{_label_stat(path)}\n".encode())
+    return Path(cache_dir) / f"{Path(model_path).stem}_{split}_{digest.hexdigest()}.npz"
+
+
+def build_predictions(detector, paths, names, batch_size=16, workers=8, imgsz=640, confidence_threshold=0.001):
+    """Run the detector over `paths` once and collect predictions, labels and quality stats"""
+    quality = {}
+
+    def with_quality(decoded):
+        for path, image, error in decoded:
+            if image is not None:
+                quality[path] = image_quality(image)
+            yield path, image, error
+
+    decoded = with_quality(prefetch_decoded(paths, workers=workers, prefetch=4 * batch_size))
+    columns = {n: [] for n in Predictions.ARRAYS}
+    skipped = 0
+    for record in score_images(detector, decoded, batch_size, confidence_threshold, imgsz,
+                               merged=False):
+        if record["error"] is not None:
+            skipped += 1
+            continue
+        index = len(columns['paths'])
+        gt_cls, gt_boxes = read_labels(record["path"], record["width"], record["height"])
+        blur, brightness = quality.pop(record["path"])
+
+        columns['paths'].append(record["path"])
+        columns['widths'].append(record["width"])
+        columns['heights'].append(record["height"])
+        columns['blur'].append(blur)
+        columns['brightness'].append(brightness)
+        columns['pred_image'].append(np.full(record["num_detections"], index, np.int32))
+        columns['pred_boxes'].append(np.array(record["boxes"], np.float32).reshape(-1, 4))
+        columns['pred_cls'].append(np.array(record["class_ids"], np.int16))
+        columns['pred_conf'].append(np.array(record["confidences"], np.float32))
+        columns['gt_image'].append(np.full(len(gt_cls), index, np.int32))
+        columns['gt_boxes'].append(gt_boxes)
+        columns['gt_cls'].append(gt_cls)
+
+        if (index + 1) % 500 == 0:
+            print(f"📊 {index + 1} images predicted")
+
+    if skipped:
+        print(f"⚠️  Skipped {skipped} unreadable images")
+
+    arrays = {
+        'paths': np.array(columns['paths']),
+        'widths': np.array(columns['widths'], np.int32),
+        'heights': np.array(columns['heights'], np.int32),
+        'blur': np.array(columns['blur'], np.float32),
+        'brightness': np.array(columns['brightness'], np.float32),
+        'pred_image': np.concatenate(columns['pred_image'] or [np.zeros(0, np.int32)]),
+        'pred_boxes': np.concatenate(columns['pred_boxes'] or [np.zeros((0, 4), np.float32)]),
+        'pred_cls': np.concatenate(columns['pred_cls'] or [np.zeros(0, np.int16)]),
+        'pred_conf': np.concatenate(columns['pred_conf'] or [np.zeros(0, np.float32)]),
+        'gt_image': np.concatenate(columns['gt_image'] or [np.zeros(0, np.int32)]),
+        'gt_boxes': np.concatenate(columns['gt_boxes'] or [np.zeros((0, 4), np.float32)]),
+        'gt_cls': np.concatenate(columns['gt_cls'] or [np.zeros(0, np.int16)])
+    }
+    return Predictions(names, **arrays)
+
+
+def cache_predictions(model_path, data_yaml, split="val", batch_size=16, imgsz=640, cache_dir=EVAL_CACHE_DIR):
+    """Predictions for a split, from the cache when model, images, labels and names are unchanged"""
+    paths, names = split_images(data_yaml, split)
+    target = cache_path(model_path, paths, split, imgsz, cache_dir, names)
+    if target.exists():
+        print(f"♻️  Using cached predictions: {target}")
+        return Predictions.load(target), target
+
+    from food_detector import StudXchangeFoodDetector
+
+    print(f"🔮 Predicting {len(paths)} {split} images once...")
+    detector = StudXchangeFoodDetector(model_path, data_yaml)
+    predictions = build_predictions(detector, paths, names, batch_size=batch_size, imgsz=imgsz)
+    predictions.save(target)
+    print(f"💾 Cached predictions: {target}")
+    return predictions, target
+
+# ====================================================================
+# MATCHING AND METRICS
+# ====================================================================
+
+def _image_bounds(image_index, num_images):
+    """Row ranges per image for arrays grouped by image"""
+    return np.searchsorted(image_index, np.arange(num_images + 1))
+
+
+def _greedy_pairs(iou, threshold):
+    """One-to-one (gt, pred) pairs above threshold, highest IoU first"""
+    g, p = np.nonzero(iou >= threshold)
+    if len(g) == 0:
+        return g, p
+    # Sequential on purpose: deduplicating by pred and then by gt drops
+    # pairs whose pred lost to a gt that was itself taken elsewhere
+    used_g, used_p = np.zeros(iou.shape[0], bool), np.zeros(iou.shape[1], bool)
+    keep = []
+    for k in np.argsort(-iou[g, p], kind='stable'):
+        if not used_g[g[k]] and not used_p[p[k]]:
+            used_g[g[k]] = used_p[p[k]] = True
+            keep.append(k)
+    keep = np.array(keep, dtype=np.int64)
+    return g[keep], p[keep]
+
+
+def average_precision(tp, conf, pred_cls, gt_counts):
+    """(C, T) AP per class and IoU threshold from (N, T) true-positive flags"""
+    num_classes, num_thresholds = len(gt_counts), tp.shape[1]
+    order = np.lexsort((-conf, pred_cls))
+    tp, pred_cls = tp[order], pred_cls[order]
+    bounds = np.searchsorted(pred_cls, np.arange(num_classes + 1))
+
+    ap = np.zeros((num_classes, num_thresholds))
+    for c in range(num_classes):
+        start, end = bounds[c], bounds[c + 1]
+        if gt_counts[c] == 0 or start == end:
+            continue
+        tp_cum = np.cumsum(tp[start:end], axis=0)
+        recall = tp_cum / gt_counts[c]
+        precision = tp_cum / np.arange(1, end - start + 1)[:, None]
+        envelope = np.flip(np.maximum.accumulate(np.flip(precision, 0), axis=0), 0)
+        for t in range(num_thresholds):
+            index = np.searchsorted(recall[:, t], RECALL_POINTS, side='left')
+            ap[c, t] = envelope[index[index < len(recall)], t].sum() / len(RECALL_POINTS)
+    return ap
+
+
+class Evaluation:
+    """Metrics over a Predictions cache; matching is computed once per IoU threshold set"""
+
+    def __init__(self, predictions):
+        self.p = predictions
+        self.num_classes = predictions.num_classes
+        self.pred_bounds = _image_bounds(predictions.pred_image, predictions.num_images)
+        self.gt_bounds = _image_bounds(predictions.gt_image, predictions.num_images)
+        self.matches = {}
+
+    def true_positives(self, iou_thresholds=IOU_THRESHOLDS):
+        """(N, T) flags: prediction matched a same-class ground truth at each IoU threshold"""
+        key = tuple(float(t) for t in iou_thresholds)
+        if key in self.matches:
+            return self.matches[key]
+
+        p = self.p
+        tp = np.zeros((len(p.pred_cls), len(key)), dtype=bool)
+        for i in range(p.num_images):
+            ps, pe = self.pred_bounds[i], self.pred_bounds[i + 1]
+            gs, ge = self.gt_bounds[i], self.gt_bounds[i + 1]
+            if ps == pe or gs == ge:
+                continue
+            iou = box_iou(p.gt_boxes[gs:ge], p.pred_boxes[ps:pe])
+            iou = np.where(p.gt_cls[gs:ge, None] == p.pred_cls[None, ps:pe], iou, 0)
+            for t, threshold in enumerate(key):
+                _, matched = _greedy_pairs(iou, threshold)
+                tp[ps + matched, t] = True
+        self.matches[key] = tp
+        return tp
+
+    def _masks(self, image_mask):
+        if image_mask is None:
+            return np.ones(len(self.p.pred_cls), bool), np.ones(len(self.p.gt_cls), bool)
+        return image_mask[self.p.pred_image], image_mask[self.p.gt_image]
+
+    def per_class_ap(self, iou_thresholds=IOU_THRESHOLDS, image_mask=None):
+        """((C, T) AP, (C,) ground-truth counts) over the selected images"""
+        pred_mask, gt_mask = self._masks(image_mask)
+        gt_counts = np.bincount(self.p.gt_cls[gt_mask], minlength=self.num_classes)
+        tp = self.true_positives(iou_thresholds)[pred_mask]
+        ap = average_precision(tp, self.p.pred_conf[pred_mask], self.p.pred_cls[pred_mask], gt_counts)
+        return ap, gt_counts
+
+    def precision_recall(self, conf_threshold=0.25, iou_threshold=0.5, image_mask=None):
+        """Per-class (precision, recall) at one operating point"""
+        pred_mask, gt_mask = self._masks(image_mask)
+        keep = pred_mask & (self.p.pred_conf >= conf_threshold)
+        tp = self.true_positives((iou_threshold,))[keep, 0]
+        cls = self.p.pred_cls[keep]
+        predicted = np.bincount(cls, minlength=self.num_classes)
+        correct = np.bincount(cls, weights=tp, minlength=self.num_classes)
+        gt_counts = np.bincount(self.p.gt_cls[gt_mask], minlength=self.num_classes)
+        precision = np.divide(correct, predicted, out=np.zeros(self.num_classes), where=predicted > 0)
+        recall = np.divide(correct, gt_counts, out=np.zeros(self.num_classes), where=gt_counts > 0)
+        return precision, recall
+
+    def confusion_matrix(self, conf_threshold=0.25, iou_threshold=0.5, image_mask=None):
+        """(C+1, C+1) counts, rows = true class, columns = predicted; last index is background"""
+        p, background = self.p, self.num_classes
+        rows, cols = [], []
+        images = range(p.num_images) if image_mask is None else np.flatnonzero(image_mask)
+        for i in images:
+            ps, pe = self.pred_bounds[i], self.pred_bounds[i + 1]
+            gs, ge = self.gt_bounds[i], self.gt_bounds[i + 1]
+            keep = p.pred_conf[ps:pe] >= conf_threshold
+            pred_cls, gt_cls = p.pred_cls[ps:pe][keep], p.gt_cls[gs:ge]
+            g, m = _greedy_pairs(box_iou(p.gt_boxes[gs:ge], p.pred_boxes[ps:pe][keep]), iou_threshold)
+            missed = np.setdiff1d(np.arange(len(gt_cls)), g)
+            extra = np.setdiff1d(np.arange(len(pred_cls)), m)
+            rows += [gt_cls[g], gt_cls[missed], np.full(len(extra), background)]
+            cols += [pred_cls[m], np.full(len(missed), background), pred_cls[extra]]
+
+        matrix = np.zeros((self.num_classes + 1, self.num_classes + 1), dtype=np.int64)
+        if rows:
+            np.add.at(matrix, (np.concatenate(rows).astype(int), np.concatenate(cols).astype(int)), 1)
+        return matrix
+
+    def top_confusions(self, matrix, k=10):
+        """Most frequent (true dish, predicted dish, count) mix-ups, background excluded"""
+        dishes = matrix[:-1, :-1].copy()
+        np.fill_diagonal(dishes, 0)
+        flat = np.argsort(-dishes, axis=None)[:k]
+        pairs = []
+        for true_cls, pred_cls in zip(*np.unravel_index(flat, dishes.shape)):
+            if dishes[true_cls, pred_cls] == 0:
+                break
+            pairs.append({'true': self.name(true_cls), 'predicted': self.name(pred_cls),
+                          'count': int(dishes[true_cls, pred_cls])})
+        return pairs
+
+    def name(self, class_id):
+        return self.p.names.get(int(class_id), f"dish_{class_id}")
+
+    def summary(self, conf_threshold=0.25, image_mask=None):
+        """Headline metrics plus per-class rows and top confusions"""
+        ap, gt_counts = self.per_class_ap(image_mask=image_mask)
+        precision, recall = self.precision_recall(conf_threshold, image_mask=image_mask)
+        present = gt_counts > 0
+        matrix = self.confusion_matrix(conf_threshold, image_mask=image_mask)
+        images = self.p.num_images if image_mask is None else int(image_mask.sum())
+
+        per_class = [{
+            'class_id': int(c), 'name': self.name(c), 'instances': int(gt_counts[c]),
+            'AP50': round(float(ap[c, 0]), 4), 'AP50_95': round(float(ap[c].mean()), 4),
+            'precision': round(float(precision[c]), 4), 'recall': round(float(recall[c]), 4)
+        } for c in np.flatnonzero(present)]
+
+        return {
+            'images': images,
+            'instances': int(gt_counts.sum()),
+            'conf_threshold': conf_threshold,
+            'mAP50': round(float(ap[present, 0].mean()), 4) if present.any() else 0.0,
+            'mAP50_95': round(float(ap[present].mean()), 4) if present.any() else 0.0,
+            'precision': round(float(precision[present].mean()), 4) if present.any() else 0.0,
+            'recall': round(float(recall[present].mean()), 4) if present.any() else 0.0,
+            'per_class': sorted(per_class, key=lambda row: row['AP50_95']),
+            'top_confusions': self.top_confusions(matrix),
+            'missed_by_background': int(matrix[:-1, -1].sum()),
+            'false_positives_on_background': int(matrix[-1, :-1].sum())
+        }
+
+    def iou_sweep(self, iou_thresholds=IOU_THRESHOLDS, image_mask=None):
+        """mAP at each IoU threshold"""
+        ap, gt_counts = self.per_class_ap(iou_thresholds, image_mask)
+        present = gt_counts > 0
+        return {float(t): round(float(ap[present, i].mean()), 4) if present.any() else 0.0
+                for i, t in enumerate(iou_thresholds)}
+
+    def slices(self):
+        """Named boolean image masks: size, blur, brightness and box count"""
+        p = self.p
+        short_side = np.minimum(p.widths, p.heights)
+        boxes = np.diff(self.gt_bounds)
+        return {
+            'size:small(<480px)': short_side < 480,
+            'size:medium': (short_side >= 480) & (short_side < 1080),
+            'size:large(>=1080px)': short_side >= 1080,
+            'quality:blurry': p.blur < BLUR_THRESHOLD,
+            'quality:sharp': p.blur >= BLUR_THRESHOLD,
+            'quality:dark': p.brightness < DARK_THRESHOLD,
+            'quality:bright': p.brightness > BRIGHT_THRESHOLD,
+            'boxes:1': boxes == 1,
+            'boxes:2-3': (boxes >= 2) & (boxes <= 3),
+            'boxes:4+': boxes >= 4
+        }
+
+    def slice_report(self, conf_threshold=0.25):
+        """Headline metrics for every non-empty slice"""
+        rows = []
+        for name, mask in self.slices().items():
+            if not mask.any():
+                continue
+            result = self.summary(conf_threshold, image_mask=mask)
+            rows.append({'slice': name, **{k: result[k] for k in
+                                           ('images', 'instances', 'mAP50', 'mAP50_95', 'precision', 'recall')}})
+        return rows
+
+# ====================================================================
+# REPORTING
+# ====================================================================
+
+def print_report(summary, sweep=None, slices=None, worst=10):
+    """Human-readable evaluation report"""
+    print(f"\n🎯 {summary['images']} images, {summary['instances']} boxes (conf ≥ {summary['conf_threshold']})")
+    print(f"   mAP50: {summary['mAP50']:.4f}  mAP50-95: {summary['mAP50_95']:.4f}  "
+          f"P: {summary['precision']:.4f}  R: {summary['recall']:.4f}")
+
+    print(f"\n📉 Weakest {worst} dishes (by AP50-95):")
+    for row in summary['per_class'][:worst]:
+        print(f"   {row['name']:<24} n={row['instances']:<5} AP50={row['AP50']:.3f} "
+              f"AP50-95={row['AP50_95']:.3f} P={row['precision']:.3f} R={row['recall']:.3f}")
+
+    if summary['top_confusions']:
+        print("\n🔀 Most frequent confusions (true → predicted):")
+        for pair in summary['top_confusions']:
+            print(f"   {pair['true']:<24} → {pair['predicted']:<24} {pair['count']}")
+    print(f"   missed entirely: {summary['missed_by_background']}, "
+          f"false positives on background: {summary['false_positives_on_background']}")
+
+    if sweep:
+        print("\n📐 IoU sweep:")
+        for threshold, value in sweep.items():
+            print(f"   IoU {threshold:.2f}: mAP {value:.4f}")
+
+    if slices:
+        print("\n🔪 Slices:")
+        for row in slices:
+            print(f"   {row['slice']:<22} images={row['images']:<5} mAP50={row['mAP50']:.4f} "
+                  f"mAP50-95={row['mAP50_95']:.4f} R={row['recall']:.4f}")
+
+# ====================================================================
+# COMMAND LINE
+# ====================================================================
+
+def main():
+    """Cache predictions for a split or report on a cache"""
+    parser = argparse.ArgumentParser(description="StudXchange evaluation engine")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cache = sub.add_parser("cache", help="Run the model over a split once and cache predictions")
+    cache.add_argument("model", nargs="?", default="studxchange_model.pt")
+    cache.add_argument("data", nargs="?", default="data.yaml")
+    cache.add_argument("--split", default="val")
+    cache.add_argument("--batch-size", type=int, default=16)
+    cache.add_argument("--imgsz", type=int, default=640)
+    report = sub.add_parser("report", help="Analyze cached predictions")
+    report.add_argument("cache_file")
+    report.add_argument("--conf", type=float, default=0.25, help="Operating point for P/R and confusion")
+    report.add_argument("--iou-sweep", type=float, nargs="*", help="IoU thresholds (default 0.50:0.95)")
+    report.add_argument("--slices", action="store_true", help="Break metrics down by image slices")
+    report.add_argument("--json", help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    if args.command == "cache":
+        cache_predictions(args.model, args.data, args.split, args.batch_size, args.imgsz)
+        return
+
+    evaluation = Evaluation(Predictions.load(args.cache_file))
+    summary = evaluation.summary(args.conf)
+    sweep = None
+    if args.iou_sweep is not None:
+        sweep = evaluation.iou_sweep(args.iou_sweep or IOU_THRESHOLDS)
+    slices = evaluation.slice_report(args.conf) if args.slices else None
+    print_report(summary, sweep, slices)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'summary': summary, 'iou_sweep': sweep, 'slices': slices}, f, indent=2)
+        print(f"\n📄 Report saved: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+# 🤖 StudXchange Food Detector - Shared Inference Wrapper
+## Used by the Gradio app, streaming detection and batch scoring
+
+try:
+    import torch
+    from ultralytics import YOLO
+except ImportError as e:
+    print(f"Missing required packages: {e}")
+    print("Please install with: pip install torch ultralytics")
+    torch = None
+    YOLO = None
+import numpy as np
+from PIL import Image
+import os
+from detector_metrics import RequestTrace, stage_timer
+from hardware_profile import serving_settings
+from memory_guard import BufferPool, MemoryCeiling, MemoryMonitor
+from shared_weights import ensure_shared_weights, load_shared_model
+from taxonomy import LEGACY_CLASSES, TAXONOMY, merge_predictions
+
+# ====================================================================
+# MODEL CONFIGURATION
+# ====================================================================
+
+class StudXchangeFoodDetector:
+    """StudXchange Indian Food Detection Model"""
+    
+    def __init__(self, model_path="studxchange_model.pt", class_names_path="class_names.yaml"):
+        self.model_path = model_path
+        self.class_names_path = class_names_path
+        self.model = None
+        self.class_names = {}
+        self.memory_ceiling = MemoryCeiling.from_env()
+        self.buffer_pool = BufferPool()
+        self.memory_monitor = MemoryMonitor.from_env()
+        self.load_model()
+        
+    def load_model(self):
+        """Load the trained model and class names"""
+        try:
+            # Load YOLO model on the best device this machine offers
+            self.serving = serving_settings()
+            if os.environ.get("SHARED_WEIGHTS") == "1" and self.serving['device'] == 'cpu':
+                # mmap the fused weights so every worker on the node shares one copy
+                self.model = load_shared_model(ensure_shared_weights(self.model_path))
+            else:
+                self.model = YOLO(self.model_path)
+            print(f"✅ Model loaded: {self.model_path} ({self.serving['device']}, half={self.serving['half']})")
+            
+            # Load class names
+            model_names = {int(k): v for k, v in (getattr(self.model, 'names', None) or {}).items()}
+            if os.path.exists(self.class_names_path):
+                import yaml
+                with open(self.class_names_path, 'r') as f:
+                    config = yaml.safe_load(f)
+                    names = config.get('names', {})
+                    # data.yaml files list the names; the detector looks them up by id
+                    names = dict(enumerate(names)) if isinstance(names, list) else names
+            else:
+                # The checkpoint's own names, else the original dataset's id order
+                names = model_names or dict(enumerate(LEGACY_CLASSES))
+            names = {int(k): v for k, v in names.items()}
+            
+            # Name every id the model can emit: a stale class_names.yaml or an
+            # incrementally widened head must not leave ids without a table row
+            num_classes = max(len(model_names), max(names, default=-1) + 1)
+            self.class_names = {i: names.get(i, model_names.get(i, f"dish_{i}")) for i in range(num_classes)}
+            
+            # Model classes -> canonical dishes; synonyms (chapati -> roti) share an id
+            self.class_map, dish_names = TAXONOMY.remap_table(self.class_names)
+            self.dish_names = dict(enumerate(dish_names))
+            
+            print(f"✅ Loaded {len(self.class_names)} dish classes")
+            
+        except Exception as e:
+            print(f"❌ Error loading model: {e}")
+            raise
+    
+    def detect_food(self, image, confidence_threshold=0.5, trace=None):
+        """Detect Indian food dishes in image
+        
+        Each stage is timed into `trace` (a detector_metrics.RequestTrace). When
+        no trace is passed one is created and finished here. Images over the
+        per-request memory ceiling are downsized (boxes are reported in the
+        original image's coordinates) or rejected.
+        """
+        
+        owns_trace = trace is None
+        trace = trace or RequestTrace("detect_food")
+        pooled = None
+        annotated_image = None
+        
+        try:
+            image, scale = self._decode(image, trace)
+            pooled = image
+            
+            # Run inference
+            results = self.model(image, conf=confidence_threshold, verbose=False, **self.inference_options())
+            detections, annotated_image = self._collect(results[0], image, scale, trace)
+            return self._success(detections, annotated_image, trace, owns_trace)
+            
+        except Exception as e:
+            return self._failure(e, trace, owns_trace)
+        
+        finally:
+            # The pooled buffer is reusable unless it is what we handed back
+            if pooled is not None and pooled is not annotated_image:
+                self.buffer_pool.release(pooled)
+            self.memory_monitor.tick()
+    
+    def detect_food_batch(self, images, confidence_threshold=0.5, traces=None, annotate=False):
+        """Batched detect_food; yields (index, result) as each image completes
+        
+        A failing image (undecodable, over the memory ceiling) only fails its own
+        result. If the batched forward pass itself fails, the remaining images
+        are retried one at a time so the error stays with the image causing it.
+        """
+        
+        owns_traces = traces is None
+        traces = traces or [RequestTrace("detect_food") for _ in images]
+        pending = []
+        
+        try:
+            for i, (image, trace) in enumerate(zip(images, traces)):
+                try:
+                    array, scale = self._decode(image, trace)
+                    pending.append((i, array, scale))
+                except Exception as e:
+                    self.memory_monitor.tick()
+                    yield i, self._failure(e, trace, owns_traces)
+            
+            if not pending:
+                return
+            
+            try:
+                results = self.model([array for _, array, _ in pending], conf=confidence_threshold,
+                                     stream=True, verbose=False, **self.inference_options())
+                for r in results:
+                    i, array, scale = pending[0]
+                    yield i, self._finish_batch_item(r, array, scale, traces[i], owns_traces, annotate)
+                    pending.pop(0)
+            except Exception:
+                # Isolate the failure: one image at a time for whatever is left
+                while pending:
+                    i, array, scale = pending[0]
+                    try:
+                        r = self.model(array, conf=confidence_threshold, verbose=False, **self.inference_options())[0]
+                        result = self._finish_batch_item(r, array, scale, traces[i], owns_traces, annotate)
+                    except Exception as e:
+                        self.buffer_pool.release(array)
+                        self.memory_monitor.tick()
+                        result = self._failure(e, traces[i], owns_traces)
+                    pending.pop(0)
+                    yield i, result
+        
+        finally:
+            # Consumer stopped early: hand the remaining buffers back
+            for _, array, _ in pending:
+                self.buffer_pool.release(array)
+    
+    def _finish_batch_item(self, r, array, scale, trace, owns_trace, annotate):
+        detections, annotated_image = self._collect(r, array, scale, trace, annotate)
+        if annotated_image is not array:
+            self.buffer_pool.release(array)
+        self.memory_monitor.tick()
+        result = self._success(detections, annotated_image if annotate else None, trace, owns_trace)
+        return result
+    
+    def _decode(self, image, trace):
+        """Decode into a pooled buffer within the memory ceiling (forces the lazy decode of API uploads)"""
+        with stage_timer(trace, "decode"):
+            original_size = image.size if isinstance(image, Image.Image) else (image.shape[1], image.shape[0])
+            array, scale = self.memory_ceiling.apply(image, self.buffer_pool)
+        trace.fields["image_size"] = [int(original_size[0]), int(original_size[1])]
+        if scale < 1.0:
+            trace.fields["downscaled"] = round(scale, 3)
+        return array, scale
+    
+    def _collect(self, r, image, scale, trace, annotate=True):
+        """Detections (in original image coordinates) and annotated image from one result"""
+        
+        # ultralytics times preprocess / forward / NMS itself (ms, monotonic clock)
+        trace.record("preprocess", r.speed["preprocess"] / 1000)
+        trace.record("forward", r.speed["inference"] / 1000)
+        trace.record("postprocess", r.speed["postprocess"] / 1000)
+        
+        # Process results
+        detections = []
+        annotated_image = image
+        
+        if r.boxes is not None:
+            # Extract detection info, with sibling-class boxes merged into one dish
+            with stage_timer(trace, "serialize"):
+                boxes, confidences, class_ids = merge_predictions(
+                    r.boxes.xyxy.cpu().numpy(), r.boxes.conf.cpu().numpy(),
+                    r.boxes.cls.cpu().numpy(), self.class_map)
+            
+            # Get annotated image, drawn from the merged boxes and dish names
+            if annotate:
+                with stage_timer(trace, "annotate"):
+                    annotated_image = self._plot_merged(r, boxes, confidences, class_ids)
+            
+            with stage_timer(trace, "serialize"):
+                for xyxy, confidence, class_id in zip(boxes.tolist(), confidences.tolist(), class_ids.tolist()):
+                    
+                    # Get class name
+                    dish_name = self.dish_names.get(class_id, f"dish_{class_id}")
+                    
+                    # Estimate price (basic logic)
+                    estimated_price = self.estimate_price(dish_name)
+                    
+                    # Get bounding box
+                    bbox = [v / scale for v in xyxy]  # [x1, y1, x2, y2]
+                    
+                    detections.append({
+                        "class_id": class_id,
+                        "dish_name": dish_name.replace('_', ' ').title(),
+                        "confidence": round(confidence, 3),
+                        "estimated_price": estimated_price,
+                        "bbox": bbox,
+                        "category": self.get_dish_category(dish_name)
+                    })
+        
+        trace.fields["backend"] = self.serving["device"]
+        trace.fields["boxes"] = len(detections)
+        return detections, annotated_image
+    
+    def _plot_merged(self, r, boxes, confidences, class_ids):
+        """r.plot() of the merged detections, labelled with dish names instead of model classes"""
+        data = np.concatenate([boxes, confidences[:, None], class_ids[:, None]], axis=1).astype(np.float32)
+        r.update(boxes=r.boxes.data.new_tensor(data))
+        r.names = {i: name.replace('_', ' ').title() for i, name in self.dish_names.items()}
+        return r.plot()
+    
+    def _success(self, detections, annotated_image, trace, owns_trace):
+        inference_time = trace.finish([d["dish_name"] for d in detections]) if owns_trace else trace.elapsed
+        return {
+            "success": True,
+            "detections": detections,
+            "total_dishes": len(detections),
+            "inference_time": round(inference_time, 3),
+            "stage_timings": {k: round(v, 4) for k, v in trace.stages.items()},
+            "annotated_image": annotated_image,
+            "model_info": "StudXchange Custom YOLOv8 Model"
+        }
+    
+    def _failure(self, error, trace, owns_trace):
+        if trace.status != "error":
+            trace.fail("detect", error)
+        if owns_trace:
+            trace.finish()
+        return {
+            "success": False,
+            "error": str(error),
+            "error_type": type(error).__name__,
+            "detections": [],
+            "total_dishes": 0
+        }
+    
+    def inference_options(self):
+        """Device / precision keyword arguments for every model call"""
+        return {'device': self.serving['device'], 'half': self.serving['half']}
+
+    def predict_arrays(self, image, confidence_threshold=0.5, imgsz=640, merged=True):
+        """Run raw inference and return (boxes_xyxy, confidences, class_ids) arrays
+
+        With merged=True (default) sibling boxes are merged and the ids are
+        dish ids (look names up in `dish_names`); merged=False returns the
+        model's own class ids (`class_names`).
+        """
+        results = self.model(image, conf=confidence_threshold, imgsz=imgsz, verbose=False,
+                             **self.inference_options())
+        boxes = results[0].boxes
+
+        if boxes is None or len(boxes) == 0:
+            return (np.zeros((0, 4), dtype=np.float32),
+                    np.zeros(0, dtype=np.float32),
+                    np.zeros(0, dtype=np.int64))
+
+        arrays = (boxes.xyxy.cpu().numpy().astype(np.float32),
+                  boxes.conf.cpu().numpy().astype(np.float32),
+                  boxes.cls.cpu().numpy().astype(np.int64))
+        if merged:
+            arrays = merge_predictions(*arrays, self.class_map)
+        return arrays
+
+    def estimate_price(self, dish_name):
+        """Estimate price based on dish type"""
+        # Price estimation logic based on typical Indian mess prices
+        price_map = {
+            # Breakfast items
+            'aloo_paratha': 25, 'plain_paratha': 15, 'poha': 20, 'upma': 20,
+            'idli': 25, 'dosa': 30, 'bread_butter': 15, 
+            
+            # Main course
+            'dal_tadka': 40, 'dal_fry': 35, 'rajma': 45, 'chole': 40,
+            'rice': 20, 'roti': 8, 'aloo_sabzi': 35,
+            'bhindi_sabzi': 40, 'paneer_butter_masala': 60,
+            
+            # Sides and beverages
+            'curd': 15, 'pickle': 10, 'tea': 10, 'coffee': 15,
+            'samosa': 12, 'pakora': 15, 'papad': 5, 'raita': 20, 'salad': 25
+        }
+        
+        return price_map.get(TAXONOMY.canonical(dish_name) or dish_name, 30)  # Default price
+    
+    def get_dish_category(self, dish_name):
+        """Categorize dish type"""
+        return TAXONOMY.category(dish_name)
@@ -0,0 +1,64 @@
+# 📐 Box Geometry - StudXchange Custom Model
+## Vectorised IoU and overlap search for xyxy boxes
+
+"""
+NumPy-only box helpers shared by the tracker, evaluation, label linting,
+the taxonomy merge and menu aggregation. Kept apart from
+streaming_detection.py so the offline tools don't need OpenCV.
+
+Usage:
+    from geometry import box_iou, grouped_pairs
+    iou = box_iou(predicted, ground_truth)
+    i, j = grouped_pairs((class_ids, image_ids), boxes, 0.7)
+"""
+
+import numpy as np
+
+
+def box_iou(boxes_a, boxes_b):
+    """Pairwise IoU between two (N, 4) and (M, 4) xyxy arrays"""
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)), dtype=np.float32)
+
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def grouped_pairs(keys, boxes, threshold, over_smaller=False):
+    """(i, j), i < j, of xyxy boxes that share every key array and overlap >= threshold
+
+    Overlap is IoU, or intersection over the smaller box with over_smaller.
+    Rows are sorted by the keys; comparing row k with row k + offset for
+    offset = 1, 2, ... covers every pair inside a run of equal keys, and the
+    loop stops at the first offset with no such pair, i.e. after the longest
+    run. No N x N matrix, so it scales to every box of a whole dataset.
+    """
+    order = np.lexsort(keys)
+    sorted_keys = [k[order] for k in keys]
+    sorted_boxes = boxes[order]
+    found_i, found_j = [], []
+    for offset in range(1, len(order)):
+        same = np.ones(len(order) - offset, dtype=bool)
+        for k in sorted_keys:
+            same &= k[offset:] == k[:-offset]
+        if not same.any():
+            break
+        a = np.flatnonzero(same)
+        b = a + offset
+        top_left = np.maximum(sorted_boxes[a, :2], sorted_boxes[b, :2])
+        bottom_right = np.minimum(sorted_boxes[a, 2:], sorted_boxes[b, 2:])
+        inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=1)
+        area_a = np.prod(sorted_boxes[a, 2:] - sorted_boxes[a, :2], axis=1)
+        area_b = np.prod(sorted_boxes[b, 2:] - sorted_boxes[b, :2], axis=1)
+        union = np.minimum(area_a, area_b) if over_smaller else area_a + area_b - inter
+        hit = inter / (union + 1e-9) >= threshold
+        found_i.append(np.minimum(order[a][hit], order[b][hit]))
+        found_j.append(np.maximum(order[a][hit], order[b][hit]))
+    if not found_i:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+    return np.concatenate(found_i), np.concatenate(found_j)
@@ -0,0 +1,296 @@
+# 🖥️ Hardware Profiling - StudXchange Custom Model
+## Pick batch size, workers, device/AMP and cache mode from the machine
+
+"""
+Probes the current machine before training or serving instead of trusting
+hardcoded numbers (16/2 on Colab, 32/4 on Kaggle, device '0' everywhere):
+
+- RAM, CPU cores and GPU VRAM
+- dataloader decode throughput on a sample of the real training images
+- the largest batch that trains without running out of memory (GPU)
+
+and turns that into batch_size, workers, device, amp and cache settings.
+The chosen values and the measurements are returned as one dict so they can
+be stored in the run metadata.
+
+Usage:
+    python hardware_profile.py --data dataset/data.yaml --model-size n
+"""
+
+import argparse
+import json
+import math
+import os
+import shutil
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Keep this much of VRAM / RAM free when choosing batch size and cache mode
+VRAM_HEADROOM = 0.85
+RAM_CACHE_FRACTION = 0.5
+
+# ====================================================================
+# PROBES
+# ====================================================================
+
+def probe_memory():
+    """Total and available system RAM in bytes"""
+    if psutil is not None:
+        vm = psutil.virtual_memory()
+        return {'ram_total': vm.total, 'ram_available': vm.available}
+
+    if os.path.exists('/proc/meminfo'):
+        info = {}
+        with open('/proc/meminfo') as f:
+            for line in f:
+                key, value = line.split(':', 1)
+                info[key] = int(value.split()[0]) * 1024
+        return {'ram_total': info.get('MemTotal', 0),
+                'ram_available': info.get('MemAvailable', info.get('MemFree', 0))}
+
+    total = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    return {'ram_total': total, 'ram_available': total // 2}
+
+
+def probe_process_rss():
+    """Resident set size of this process in bytes"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+
+    if os.path.exists('/proc/self/statm'):
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # peak, not current
+
+
+def probe_cpu():
+    """Number of CPU cores this process may use"""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    return {'cpu_cores': cores}
+
+
+def probe_gpu():
+    """CUDA / MPS device summary"""
+    if torch is None:
+        return {'device_type': 'cpu', 'gpu_name': None, 'vram_total': 0, 'vram_free': 0}
+
+    if torch.cuda.is_available():
+        free, total = torch.cuda.mem_get_info(0)
+        return {'device_type': 'cuda', 'gpu_name': torch.cuda.get_device_name(0),
+                'vram_total': total, 'vram_free': free}
+
+    if getattr(torch.backends, 'mps', None) is not None and torch.backends.mps.is_available():
+        return {'device_type': 'mps', 'gpu_name': 'Apple MPS', 'vram_total': 0, 'vram_free': 0}
+
+    return {'device_type': 'cpu', 'gpu_name': None, 'vram_total': 0, 'vram_free': 0}
+
+
+def sample_images(image_dir, limit=32):
+    """First `limit` images of a directory"""
+    images = sorted(p for p in Path(image_dir).rglob('*') if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+    return images[:limit]
+
+
+def measure_decode_throughput(images, imgsz=640):
+    """Single-worker decode + resize throughput (images/s) and decoded size per image"""
+    if not images:
+        return {'decode_images_per_sec': 0.0, 'decoded_bytes_per_image': imgsz * imgsz * 3}
+
+    decoded_bytes = []
+    start_time = time.perf_counter()
+    for path in images:
+        image = cv2.imread(str(path))
+        if image is None:
+            continue
+        h, w = image.shape[:2]
+        ratio = imgsz / max(h, w)
+        resized = cv2.resize(image, (max(1, int(w * ratio)), max(1, int(h * ratio))))
+        decoded_bytes.append(resized.nbytes)
+    elapsed = time.perf_counter() - start_time
+
+    return {
+        'decode_images_per_sec': round(len(decoded_bytes) / max(elapsed, 1e-9), 1),
+        'decoded_bytes_per_image': int(np.mean(decoded_bytes)) if decoded_bytes else imgsz * imgsz * 3
+    }
+
+
+def _train_step(net, batch_size, imgsz, device, amp):
+    """One forward+backward pass on random data; returns seconds"""
+    x = torch.rand(batch_size, 3, imgsz, imgsz, device=device)
+    start_time = time.perf_counter()
+    with torch.autocast(device_type='cuda', enabled=amp):
+        preds = net(x)
+    preds = preds if isinstance(preds, (list, tuple)) else [preds]
+    loss = sum(p.float().mean() for p in preds if torch.is_tensor(p))
+    loss.backward()
+    net.zero_grad(set_to_none=True)
+    torch.cuda.synchronize()
+    return time.perf_counter() - start_time
+
+
+def find_max_batch(model_size='n', imgsz=640, candidates=(4, 8, 16, 32, 64, 128), amp=True):
+    """Largest batch whose peak VRAM stays under VRAM_HEADROOM, plus its images/s"""
+    from ultralytics import YOLO
+
+    net = YOLO(f"yolov8{model_size}.yaml").model.to('cuda').train()
+    for p in net.parameters():
+        p.requires_grad_(True)
+    total = torch.cuda.get_device_properties(0).total_memory
+
+    best = {'batch_size': candidates[0], 'train_images_per_sec': 0.0, 'peak_vram': 0}
+    for batch_size in candidates:
+        try:
+            torch.cuda.empty_cache()
+            torch.cuda.reset_peak_memory_stats()
+            _train_step(net, batch_size, imgsz, 'cuda', amp)  # warmup / allocator
+            seconds = _train_step(net, batch_size, imgsz, 'cuda', amp)
+            peak = torch.cuda.max_memory_allocated()
+        except RuntimeError as e:
+            if 'out of memory' not in str(e).lower():
+                raise
+            break
+        if peak > VRAM_HEADROOM * total:
+            break
+        best = {'batch_size': batch_size, 'train_images_per_sec': round(batch_size / seconds, 1), 'peak_vram': peak}
+
+    del net
+    torch.cuda.empty_cache()
+    return best
+
+# ====================================================================
+# DECISIONS
+# ====================================================================
+
+def choose_workers(cpu_cores, decode_rate, train_rate, device_type, mosaic=True):
+    """Enough decode workers to keep the GPU fed, without starving the CPU"""
+    if decode_rate <= 0:
+        return max(1, min(8, cpu_cores - 1))
+
+    # Mosaic decodes four images per training sample
+    needed_rate = train_rate * (4 if mosaic else 1)
+    workers = math.ceil(needed_rate / decode_rate) if needed_rate else 2
+    limit = cpu_cores - 1 if device_type != 'cpu' else max(1, cpu_cores // 2)
+    return int(max(1, min(workers, limit, 16)))
+
+
+def choose_cache_mode(num_images, decoded_bytes_per_image, ram_available, disk_path='.'):
+    """'ram' if the decoded dataset fits comfortably, else 'disk', else no cache"""
+    dataset_bytes = num_images * decoded_bytes_per_image
+    if dataset_bytes < RAM_CACHE_FRACTION * ram_available:
+        return 'ram', dataset_bytes
+    if dataset_bytes < 0.8 * shutil.disk_usage(disk_path).free:
+        return 'disk', dataset_bytes
+    return False, dataset_bytes
+
+
+def _count_images(data_yaml):
+    import yaml
+    from dataset_layout import resolve_split_dir
+
+    with open(data_yaml) as f:
+        data_config = yaml.safe_load(f)
+    train_dir = resolve_split_dir(str(Path(data_yaml).parent), data_config, 'train')
+    return train_dir, len(sample_images(train_dir, limit=None)) if train_dir and train_dir.exists() else 0
+
+
+def profile_hardware(data_yaml=None, model_size='n', imgsz=640, probe_batch=True):
+    """Measure the machine and choose training settings"""
+    print("🖥️  Profiling hardware...")
+    profile = {**probe_memory(), **probe_cpu(), **probe_gpu()}
+
+    train_dir, num_images = (None, 0)
+    if data_yaml:
+        train_dir, num_images = _count_images(data_yaml)
+    profile['num_train_images'] = num_images
+    profile.update(measure_decode_throughput(sample_images(train_dir) if train_dir else [], imgsz))
+
+    device_type = profile['device_type']
+    if device_type == 'cuda' and probe_batch:
+        batch_probe = find_max_batch(model_size, imgsz)
+        profile.update(batch_probe)
+        batch_size = batch_probe['batch_size']
+        train_rate = batch_probe['train_images_per_sec']
+    else:
+        # CPU / MPS: small batches, bounded by RAM (activations + gradients ~40x the decoded image)
+        per_image = profile['decoded_bytes_per_image'] * 4 * 10
+        batch_size = int(max(2, min(16, profile['cpu_cores'] * 2, profile['ram_available'] // per_image)))
+        train_rate = batch_size / 2.0  # CPU training runs at a few images per second
+
+    cache_mode, dataset_bytes = choose_cache_mode(num_images, profile['decoded_bytes_per_image'],
+                                                  profile['ram_available'])
+    chosen = {
+        'batch_size': batch_size,
+        'workers': choose_workers(profile['cpu_cores'], profile['decode_images_per_sec'], train_rate, device_type),
+        'device': {'cuda': '0', 'mps': 'mps'}.get(device_type, 'cpu'),
+        'amp': device_type == 'cuda',
+        'cache': cache_mode
+    }
+    profile['decoded_dataset_bytes'] = dataset_bytes
+    profile['chosen'] = chosen
+
+    print(f"   Device: {profile['gpu_name'] or 'CPU'} | cores: {profile['cpu_cores']} | "
+          f"RAM free: {profile['ram_available'] / 1e9:.1f} GB | VRAM: {profile['vram_total'] / 1e9:.1f} GB")
+    print(f"   Decode: {profile['decode_images_per_sec']} img/s per worker")
+    print(f"   ➜ batch={chosen['batch_size']} workers={chosen['workers']} device={chosen['device']} "
+          f"amp={chosen['amp']} cache={chosen['cache']}")
+    return profile
+
+
+def apply_hardware_profile(config, profile):
+    """Fill every 'auto' hardware key of a training config from a profile"""
+    resolved = dict(config)
+    for key, value in profile['chosen'].items():
+        if resolved.get(key, 'auto') == 'auto':
+            resolved[key] = value
+    return resolved
+
+
+def serving_settings():
+    """Device, precision and thread count for the inference server"""
+    profile = {**probe_cpu(), **probe_gpu()}
+    settings = {
+        'device': {'cuda': 'cuda:0', 'mps': 'mps'}.get(profile['device_type'], 'cpu'),
+        'half': profile['device_type'] == 'cuda',
+        'threads': profile['cpu_cores']
+    }
+    if torch is not None and settings['device'] == 'cpu':
+        torch.set_num_threads(settings['threads'])
+    return settings
+
+# ====================================================================
+# COMMAND LINE
+# ====================================================================
+
+def main():
+    """Print the hardware profile and chosen settings as JSON"""
+    parser = argparse.ArgumentParser(description="StudXchange hardware profiling")
+    parser.add_argument("--data", help="Dataset data.yaml to measure decode throughput on")
+    parser.add_argument("--model-size", default="n")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--no-batch-probe", action="store_true")
+    args = parser.parse_args()
+
+    profile = profile_hardware(args.data, args.model_size, args.imgsz, probe_batch=not args.no_batch_probe)
+    print(json.dumps(profile, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,171 +3,34 @@
 
 try:
     import gradio as gr
-    import torch
-    from ultralytics import YOLO
 except ImportError as e:
     print(f"Missing required packages: {e}")
     print("Please install with: pip install gradio torch ultralytics")
     gr = None
-    torch = None
-    YOLO = None
-import cv2
-import numpy as np
 from PIL import Image
-import json
+import logging
 import os
-import time
-from datetime import datetime
-import requests
+from detector_metrics import RequestTrace, start_metrics_server
+from menu_aggregation import aggregate_menu, build_menu
+from menu_rendering import PRETTY, render_menu
+from model_registry import ModelRegistry
+from request_coalescing import SingleFlight, content_key
+from request_profiler import RequestProfiler
+from streaming_detection import detect_video
 
 # ====================================================================
-# MODEL CONFIGURATION
+# GRADIO INTERFACE
 # ====================================================================
 
-class StudXchangeFoodDetector:
-    """StudXchange Indian Food Detection Model"""
-    
-    def __init__(self, model_path="studxchange_model.pt"):
-        self.model_path = model_path
-        self.model = None
-        self.class_names = {}
-        self.load_model()
-        
-    def load_model(self):
-        """Load the trained model and class names"""
-        try:
-            # Load YOLO model
-            self.model = YOLO(self.model_path)
-            print(f"✅ Model loaded: {self.model_path}")
-            
-            # Load class names
-            if os.path.exists("class_names.yaml"):
-                import yaml
-                with open("class_names.yaml", 'r') as f:
-                    config = yaml.safe_load(f)
-                    self.class_names = config.get('names', {})
-            else:
-                # Default Indian food classes
-                self.class_names = {
-                    0: "aloo_paratha", 1: "plain_paratha", 2: "poha", 3: "upma",
-                    4: "idli", 5: "dosa", 6: "bread_butter", 7: "tea",
-                    8: "dal_tadka", 9: "dal_fry", 10: "rajma", 11: "chole",
-                    12: "rice", 13: "roti", 14: "chapati", 15: "aloo_sabzi",
-                    16: "bhindi_sabzi", 17: "paneer_butter_masala", 18: "curd", 
-                    19: "pickle", 20: "coffee", 21: "samosa", 22: "papad", 
-                    23: "raita", 24: "salad"
-                }
-            
-            print(f"✅ Loaded {len(self.class_names)} dish classes")
-            
-        except Exception as e:
-            print(f"❌ Error loading model: {e}")
-            raise
-    
-    def detect_food(self, image, confidence_threshold=0.5):
-        """Detect Indian food dishes in image"""
-        
-        start_time = time.time()
-        
-        try:
-            # Convert PIL to numpy if needed
-            if isinstance(image, Image.Image):
-                image = np.array(image)
-            
-            # Run inference
-            results = self.model(image, conf=confidence_threshold)
-            
-            # Process results
-            detections = []
-            annotated_image = image.copy()
-            
-            for r in results:
-                if r.boxes is not None:
-                    # Get annotated image
-                    annotated_image = r.plot()
-                    
-                    # Extract detection info
-                    for box in r.boxes:
-                        class_id = int(box.cls[0])
-                        confidence = float(box.conf[0])
-                        
-                        # Get class name
-                        dish_name = self.class_names.get(class_id, f"dish_{class_id}")
-                        
-                        # Estimate price (basic logic)
-                        estimated_price = self.estimate_price(dish_name)
-                        
-                        # Get bounding box
-                        bbox = box.xyxy[0].tolist()  # [x1, y1, x2, y2]
-                        
-                        detections.append({
-                            "dish_name": dish_name.replace('_', ' ').title(),
-                            "confidence": round(confidence, 3),
-                            "estimated_price": estimated_price,
-                            "bbox": bbox,
-                            "category": self.get_dish_category(dish_name)
-                        })
-            
-            inference_time = time.time() - start_time
-            
-            return {
-                "success": True,
-                "detections": detections,
-                "total_dishes": len(detections),
-                "inference_time": round(inference_time, 3),
-                "annotated_image": annotated_image,
-                "model_info": "StudXchange Custom YOLOv8 Model"
-            }
-            
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e),
-                "detections": [],
-                "total_dishes": 0
-            }
-    
-    def estimate_price(self, dish_name):
-        """Estimate price based on dish type"""
-        # Price estimation logic based on typical Indian mess prices
-        price_map = {
-            # Breakfast items
-            'aloo_paratha': 25, 'plain_paratha': 15, 'poha': 20, 'upma': 20,
-            'idli': 25, 'dosa': 30, 'bread_butter': 15, 
-            
-            # Main course
-            'dal_tadka': 40, 'dal_fry': 35, 'rajma': 45, 'chole': 40,
-            'rice': 20, 'roti': 8, 'chapati': 8, 'aloo_sabzi': 35,
-            'bhindi_sabzi': 40, 'paneer_butter_masala': 60,
-            
-            # Sides and beverages
-            'curd': 15, 'pickle': 10, 'tea': 10, 'coffee': 15,
-            'samosa': 12, 'papad': 5, 'raita': 20, 'salad': 25
-        }
-        
-        return price_map.get(dish_name, 30)  # Default price
-    
-    def get_dish_category(self, dish_name):
-        """Categorize dish type"""
-        categories = {
-            'breakfast': ['aloo_paratha', 'plain_paratha', 'poha', 'upma', 'idli', 'dosa', 'bread_butter'],
-            'main_course': ['dal_tadka', 'dal_fry', 'rajma', 'chole', 'rice', 'roti', 'chapati', 'aloo_sabzi', 'bhindi_sabzi', 'paneer_butter_masala'],
-            'sides': ['curd', 'pickle', 'papad', 'raita', 'salad'],
-            'beverages': ['tea', 'coffee'],
-            'snacks': ['samosa']
-        }
-        
-        for category, dishes in categories.items():
-            if dish_name in dishes:
-                return category
-        return 'other'
+# Initialize detector (active version from models/ or studxchange_model.pt; hot-swappable)
+registry = ModelRegistry.from_env()
+registry.watch()
 
-# ====================================================================
-# GRADIO INTERFACE
-# ====================================================================
+# Opt-in profiling (PROFILE_SAMPLE_RATE / SLOW_REQUEST_SECONDS); a no-op when unset
+profiler = RequestProfiler.from_env()
 
-# Initialize detector
-detector = StudXchangeFoodDetector()
+# Identical uploads arriving together (double-click, change + click) share one inference
+coalescer = SingleFlight(linger_if=lambda result: result["success"])
 
 def detect_indian_food(image, confidence_threshold):
     """Main detection function for Gradio interface"""
@@ -176,7 +39,11 @@ def detect_indian_food(image, confidence_threshold):
         return None, "Please upload an image", {}
     
     # Run detection
-    result = detector.detect_food(image, confidence_threshold)
+    trace = RequestTrace("gradio")
+    with profiler.profile(trace):
+        result = coalescer.run(content_key(image, confidence_threshold),
+                               registry.detect_food, image, confidence_threshold, trace=trace)
+    trace.finish([d["dish_name"] for d in result["detections"]])
     
     if not result["success"]:
         return None, f"Detection failed: {result.get('error', 'Unknown error')}", {}
@@ -190,54 +57,110 @@ def detect_indian_food(image, confidence_threshold):
         detection_data = {}
     else:
         summary = f"🍛 Detected {result['total_dishes']} dish(es) in {result['inference_time']}s\n\n"
-        
-        total_price = 0
-        detection_data = {"detections": []}
-        
-        for i, detection in enumerate(result["detections"], 1):
-            dish_name = detection["dish_name"]
-            confidence = detection["confidence"]
-            price = detection["estimated_price"]
-            category = detection["category"]
-            
-            total_price += price
-            
-            summary += f"{i}. **{dish_name}** ({category})\n"
-            summary += f"   Confidence: {confidence:.1%}\n"
-            summary += f"   Estimated Price: ₹{price}\n\n"
-            
-            detection_data["detections"].append({
-                "name": dish_name,
-                "confidence": confidence,
-                "price": price,
-                "category": category
-            })
-        
-        summary += f"💰 **Total Estimated Cost: ₹{total_price}**"
-        detection_data["total_price"] = total_price
-        detection_data["total_dishes"] = result["total_dishes"]
+        detection_data = menu_state(result["detections"], aggregate_menu([result]))
+        summary += menu_summary(detection_data["menu"])
     
     return annotated_image, summary, detection_data
 
+def detect_food_video(video_path, confidence_threshold):
+    """Streaming detection over a counter pan video for the Gradio interface"""
+    
+    if video_path is None:
+        return "Please upload a video", {}
+    
+    detector = registry.active_detector()
+    summary_data = detect_video(detector, video_path, confidence_threshold=confidence_threshold)
+    
+    if summary_data["total_dishes"] == 0:
+        return "No Indian dishes detected in the video.", {}
+    
+    summary = (f"🎥 Tracked {summary_data['total_dishes']} dish(es) across {summary_data['frames']} frames "
+               f"({summary_data['keyframes']} keyframes, {summary_data['processing_fps']} FPS)\n\n")
+    
+    # Tracks are already one per physical dish, so counts are portions
+    dishes = sorted(summary_data["dishes"].items())
+    menu = build_menu([name.replace('_', ' ').title() for name, _ in dishes],
+                      [detector.get_dish_category(name) for name, _ in dishes],
+                      [detector.estimate_price(name) for name, _ in dishes],
+                      [info["count"] for _, info in dishes],
+                      [info["confidence"] for _, info in dishes])
+    detections = [{"name": item["name"], "confidence": item["confidence"], "price": item["unit_price"],
+                   "category": item["category"]} for item in menu["items"] for _ in range(item["quantity"])]
+    detection_data = {"detections": detections, "menu": menu,
+                      "total_price": menu["total_price"], "total_dishes": summary_data["total_dishes"]}
+    summary += menu_summary(menu)
+    
+    return summary, detection_data
+
+def detect_meal_photos(files, confidence_threshold):
+    """Several photos of one meal -> one deduplicated menu"""
+    if not files:
+        return "Please upload one or more photos", {}
+    
+    images = [Image.open(getattr(f, "name", f)) for f in files]
+    traces = [RequestTrace("gradio_photos") for _ in images]
+    results = [None] * len(images)
+    for index, result in registry.detect_food_batch(images, confidence_threshold, traces=traces):
+        traces[index].finish([d["dish_name"] for d in result["detections"]])
+        results[index] = result
+    
+    failed = sum(not r["success"] for r in results)
+    menu = aggregate_menu(results, same_meal=True)
+    if not menu["items"]:
+        return f"No Indian dishes detected in {len(images)} photo(s).", {}
+    
+    summary = (f"📸 {len(images)} photo(s), {menu['detections']} boxes → "
+               f"{menu['total_portions']} portion(s) of {menu['total_items']} dish(es)"
+               + (f" ({failed} photo(s) failed)" if failed else "") + "\n\n")
+    detections = [d for r in results if r["success"] for d in r["detections"]]
+    detection_data = menu_state(detections, menu)
+    summary += menu_summary(menu)
+    return summary, detection_data
+
+def menu_state(detections, menu):
+    """Gradio state for create_menu_items: raw detections plus the consolidated menu"""
+    return {
+        "detections": [{"name": d["dish_name"], "confidence": d["confidence"],
+                        "price": d["estimated_price"], "category": d["category"]} for d in detections],
+        "menu": menu,
+        "total_price": menu["total_price"],
+        "total_dishes": menu["total_portions"]
+    }
+
+def menu_summary(menu):
+    """Markdown lines for a consolidated menu"""
+    summary = ""
+    for i, item in enumerate(menu["items"], 1):
+        quantity = f" x{item['quantity']}" if item["quantity"] > 1 else ""
+        summary += f"{i}. **{item['name']}**{quantity} ({item['category']})\n"
+        summary += f"   Confidence: {item['confidence']:.1%}\n"
+        summary += f"   Estimated Price: ₹{item['unit_price']}" + (f" each, ₹{item['total']}" if quantity else "") + "\n\n"
+    summary += f"💰 **Total Estimated Cost: ₹{menu['total_price']}**"
+    return summary
+
+def list_slow_traces():
+    """Markdown table of captured traces for the admin view"""
+    traces = profiler.buffer.list()
+    if not traces:
+        return "No traces captured yet."
+    
+    rows = ["| Trace | Reason | Latency | Image | Boxes | Backend |", "|---|---|---|---|---|---|"]
+    for t in traces:
+        rows.append(f"| `{t['trace_id']}` | {t['reason']} | {t['latency']:.3f}s | "
+                    f"{t['image_size']} | {t['boxes']} | {t['backend']} |")
+    return "\n".join(rows)
+
+def export_slow_traces():
+    """Zip every captured trace for download"""
+    return profiler.buffer.export(os.path.join(profiler.buffer.directory, "traces.zip"))
+
 def create_menu_items(detection_data):
-    """Convert detections to menu format"""
-    if not detection_data or "detections" not in detection_data:
+    """Convert the consolidated menu to menu items (one per dish, with quantity)"""
+    if not detection_data or "menu" not in detection_data:
         return "No detections to convert to menu items."
     
-    menu_items = []
-    for detection in detection_data["detections"]:
-        menu_item = {
-            "name": detection["name"],
-            "category": detection["category"],
-            "price": detection["price"],
-            "description": f"Fresh {detection['name']} prepared with authentic Indian spices",
-            "is_available": True,
-            "confidence": detection["confidence"]
-        }
-        menu_items.append(menu_item)
-    
-    # Format as JSON for easy API integration
-    return json.dumps(menu_items, indent=2)
+    # Pretty JSON from precompiled per-dish templates, memoized per detection set
+    return render_menu(detection_data["menu"], PRETTY)
 
 # ====================================================================
 # GRADIO APP INTERFACE
@@ -341,6 +264,48 @@ with gr.Blocks(css=custom_css, title="StudXchange Food Detection") as app:
                 value="Upload and detect dishes to generate menu items..."
             )
     
+    # Video / camera pan
+    with gr.Row():
+        with gr.Column(scale=1):
+            gr.HTML("<h3>🎥 Or Pan Across the Counter</h3>")
+            
+            video_input = gr.Video(
+                label="Record or upload a short counter video",
+                sources=["upload", "webcam"],
+                height=300
+            )
+            
+            detect_video_btn = gr.Button(
+                "🎬 Detect Dishes in Video",
+                variant="secondary"
+            )
+        
+        with gr.Column(scale=1):
+            video_summary = gr.Markdown(
+                value="Upload a video to build a menu from a counter pan..."
+            )
+    
+    # Several photos of one meal
+    with gr.Row():
+        with gr.Column(scale=1):
+            gr.HTML("<h3>📸 Or Upload Several Photos of One Meal</h3>")
+            
+            photos_input = gr.File(
+                label="Photos of the same plate or table",
+                file_count="multiple",
+                file_types=["image"]
+            )
+            
+            detect_photos_btn = gr.Button(
+                "🍽️ Build Menu from Photos",
+                variant="secondary"
+            )
+        
+        with gr.Column(scale=1):
+            photos_summary = gr.Markdown(
+                value="Dishes seen in several photos are counted once..."
+            )
+    
     # Example images
     with gr.Row():
         gr.HTML("<h3>🖼️ Try These Example Images</h3>")
@@ -360,6 +325,18 @@ with gr.Blocks(css=custom_css, title="StudXchange Food Detection") as app:
             label="Click any example to try it"
         )
     
+    # Admin view for captured traces (PROFILER_ADMIN=1)
+    if profiler.enabled and os.environ.get("PROFILER_ADMIN") == "1":
+        with gr.Accordion("🩺 Slow Request Traces", open=False):
+            traces_table = gr.Markdown(value="Click refresh to list captured traces...")
+            with gr.Row():
+                refresh_traces_btn = gr.Button("🔄 Refresh")
+                export_traces_btn = gr.Button("📦 Download Traces")
+            traces_file = gr.File(label="Trace archive")
+        
+        refresh_traces_btn.click(fn=list_slow_traces, inputs=[], outputs=[traces_table])
+        export_traces_btn.click(fn=export_slow_traces, inputs=[], outputs=[traces_file])
+    
     # Hidden state for detection data
     detection_state = gr.State({})
     
@@ -374,6 +351,26 @@ with gr.Blocks(css=custom_css, title="StudXchange Food Detection") as app:
         outputs=[menu_output]
     )
     
+    detect_video_btn.click(
+        fn=detect_food_video,
+        inputs=[video_input, confidence_slider],
+        outputs=[video_summary, detection_state]
+    ).then(
+        fn=create_menu_items,
+        inputs=[detection_state],
+        outputs=[menu_output]
+    )
+    
+    detect_photos_btn.click(
+        fn=detect_meal_photos,
+        inputs=[photos_input, confidence_slider],
+        outputs=[photos_summary, detection_state]
+    ).then(
+        fn=create_menu_items,
+        inputs=[detection_state],
+        outputs=[menu_output]
+    )
+    
     # Auto-detect when image is uploaded
     image_input.change(
         fn=detect_indian_food,
@@ -400,7 +397,7 @@ def create_api_endpoint():
             image = Image.open(image_file)
             
             # Run detection
-            result = detector.detect_food(image, confidence_threshold=0.5)
+            result = registry.detect_food(image, confidence_threshold=0.5)
             
             if result["success"]:
                 return {
@@ -433,11 +430,16 @@ if __name__ == "__main__":
     # Print startup information
     print("🚀 Starting StudXchange Food Detection App")
     print("=" * 50)
-    print(f"✅ Model loaded: {detector.model_path}")
-    print(f"✅ Classes available: {len(detector.class_names)}")
+    print(f"✅ Model loaded: {registry.model_path} (version: {registry.active_version or 'default'})")
+    print(f"✅ Classes available: {len(registry.active_detector().class_names)}")
     print("🌐 App will be available at: http://localhost:7860")
     print("=" * 50)
     
+    # Structured per-request logs and optional Prometheus endpoint
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if os.environ.get("METRICS_PORT"):
+        start_metrics_server(int(os.environ["METRICS_PORT"]))
+    
     # Launch app
     app.launch(
         server_name="0.0.0.0",  # Allow external access
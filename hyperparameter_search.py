@@ -0,0 +1,321 @@
+# 🔎 Hyperparameter Search - StudXchange Custom Model
+## Short trials with successive halving on a shared cached dataset
+
+"""
+Replaces "run the full 200-300 epoch config and compare" with a successive
+halving search over the keys of TRAINING_CONFIG / KAGGLE_CONFIG:
+
+1. Sample N configs from SEARCH_SPACE on top of a base platform config
+2. Train every trial for `min_epochs` on one shared, pre-decoded subset
+3. Keep the best 1/eta, continue them from their own weights for eta x
+   the epochs, and repeat until `max_epochs`
+
+Every trial is logged locally through LocalRunLogger (wandb optional), and
+the winning config is written to best_config.json.
+
+CPU smoke test on a tiny subset:
+    python hyperparameter_search.py --data dataset/data.yaml --device cpu \\
+        --fraction 0.02 --imgsz 320 --trials 4 --min-epochs 1 --max-epochs 2 --eta 2
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import math
+import os
+import random
+import shutil
+from pathlib import Path
+
+import yaml
+
+try:
+    from ultralytics import YOLO
+except ImportError:
+    print("Ultralytics not installed. Please install with: pip install ultralytics")
+    YOLO = None
+
+from dataset_layout import IMAGE_EXTENSIONS, label_path, resolve_split_dir
+from run_logger import LocalRunLogger
+from training_config import PLATFORM_CONFIGS, build_train_args
+
+# ====================================================================
+# SEARCH SPACE
+# ====================================================================
+
+# Config key -> (distribution, low, high) or ('choice', [values])
+SEARCH_SPACE = {
+    'learning_rate': ('loguniform', 1e-4, 1e-2),
+    'weight_decay': ('loguniform', 1e-5, 1e-3),
+    'box_loss': ('loguniform', 0.02, 10.0),
+    'cls_loss': ('uniform', 0.2, 1.0),
+    'dfl_loss': ('uniform', 0.5, 2.0),
+    'hsv_s': ('uniform', 0.2, 0.8),
+    'hsv_v': ('uniform', 0.1, 0.5),
+    'degrees': ('uniform', 0.0, 15.0),
+    'scale': ('uniform', 0.2, 0.6),
+    'mosaic': ('uniform', 0.5, 1.0),
+    'mixup': ('uniform', 0.0, 0.3),
+    'optimizer': ('choice', ['AdamW', 'SGD'])
+}
+
+
+def sample_config(base_config, search_space, rng):
+    """Draw one trial config on top of a base config"""
+    config = copy.deepcopy(base_config)
+    for key, spec in search_space.items():
+        kind = spec[0]
+        if kind == 'uniform':
+            config[key] = round(rng.uniform(spec[1], spec[2]), 5)
+        elif kind == 'loguniform':
+            config[key] = float(f"{math.exp(rng.uniform(math.log(spec[1]), math.log(spec[2]))):.3g}")
+        elif kind == 'choice':
+            config[key] = rng.choice(spec[1])
+        else:
+            raise ValueError(f"Unknown search distribution for {key}: {kind}")
+    return config
+
+# ====================================================================
+# SHARED CACHED DATASET
+# ====================================================================
+
+def _link(src, dst):
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if dst.exists():
+        return
+    try:
+        os.symlink(os.path.abspath(src), dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _split_files(dataset_location, data_config, split):
+    """Sorted image paths of one split; refuses a missing or empty split"""
+    image_dir = resolve_split_dir(dataset_location, data_config, split)
+    if image_dir is None or not image_dir.is_dir():
+        raise FileNotFoundError(f"{split} split not found: {data_config.get(split)} (resolved to {image_dir})")
+    images = sorted(p for p in image_dir.rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS)
+    if not images:
+        raise ValueError(f"No images in the {split} split: {image_dir}")
+    return image_dir, images
+
+
+def _fingerprint(images):
+    """Hash of every image's and label file's path, size and mtime"""
+    digest = hashlib.sha1()
+    for image in images:
+        for path in (image, Path(label_path(image))):
+            stat = path.stat() if path.exists() else None
+            digest.update(f"{path}:{stat and stat.st_size}:{stat and stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def prepare_trial_dataset(data_yaml, fraction=1.0, seed=0, cache_root=".search_cache"):
+    """Build (once) a subset of the dataset that every trial shares
+
+    Images are symlinked into one directory per (dataset contents, fraction,
+    seed), and trials train with cache='disk', so ultralytics decodes each
+    image to .npy only the first time and every later trial reuses the
+    decoded arrays.
+    """
+    with open(data_yaml, 'r') as f:
+        data_config = yaml.safe_load(f)
+
+    dataset_location = Path(data_yaml).parent
+    splits = {split: _split_files(dataset_location, data_config, split) for split in ('train', 'val')}
+    fingerprint = _fingerprint([image for _, images in splits.values() for image in images])
+    key = hashlib.sha1(f"{fingerprint}|{data_config.get('names')}|{fraction}|{seed}".encode()).hexdigest()[:12]
+    subset_dir = Path(cache_root) / f"dataset_{key}"
+    subset_yaml = subset_dir / "data.yaml"
+    if subset_yaml.exists():
+        print(f"♻️  Reusing cached trial dataset: {subset_dir}")
+        return str(subset_yaml)
+
+    rng = random.Random(seed)
+    for split, (image_dir, images) in splits.items():
+        keep = max(1, int(len(images) * fraction))
+        for image in sorted(rng.sample(images, keep)):
+            # Keep the path below the split dir: nested folders may reuse basenames
+            relative = image.relative_to(image_dir)
+            _link(image, subset_dir / 'images' / split / relative)
+            label = Path(label_path(image))
+            if label.exists():
+                _link(label, subset_dir / 'labels' / split / relative.with_suffix('.txt'))
+        print(f"📁 {split}: {keep}/{len(images)} images in trial subset")
+
+    subset_config = {
+        'path': str(subset_dir.resolve()),
+        'train': 'images/train',
+        'val': 'images/val',
+        'nc': data_config.get('nc'),
+        'names': data_config.get('names')
+    }
+    with open(subset_yaml, 'w') as f:
+        yaml.safe_dump(subset_config, f)
+
+    return str(subset_yaml)
+
+# ====================================================================
+# TRIAL RUNNER
+# ====================================================================
+
+class UltralyticsTrialRunner:
+    """Runs one budgeted chunk of a trial with ultralytics"""
+
+    def __init__(self, data_yaml, device='cpu', imgsz=None, workers=None, cache='disk',
+                 project_dir='runs/hparam_trials'):
+        self.data_yaml = data_yaml
+        self.device = device
+        self.imgsz = imgsz
+        self.workers = workers
+        self.cache = cache
+        self.project_dir = project_dir
+
+    def run(self, trial, epochs, init_weights=None):
+        """Train `epochs` more epochs and return (mAP50-95, last weights path)"""
+        config = trial['config']
+        model = YOLO(init_weights or f"yolov8{config.get('model_size', 'n')}.pt")
+
+        overrides = {
+            'epochs': epochs,
+            'patience': epochs,
+            'device': self.device,
+            'cache': self.cache,
+            'val': True,
+            'plots': False,
+            'verbose': False,
+            'project': self.project_dir,
+            'name': f"{trial['trial_id']}_e{trial['epochs_done'] + epochs}",
+            'exist_ok': True
+        }
+        if init_weights:
+            overrides['warmup_epochs'] = 0  # continuing, no second warmup
+        if self.imgsz:
+            overrides['imgsz'] = self.imgsz
+        if self.workers is not None:
+            overrides['workers'] = self.workers
+
+        metrics = model.train(**build_train_args(config, self.data_yaml, **overrides))
+        score = float(metrics.box.map) if metrics is not None else 0.0
+        return score, str(model.trainer.last)
+
+# ====================================================================
+# SUCCESSIVE HALVING
+# ====================================================================
+
+class SuccessiveHalvingSearch:
+    """Successive halving over sampled configs with early pruning"""
+
+    def __init__(self, runner, base_config, search_space=None, n_trials=9, min_epochs=3,
+                 max_epochs=27, eta=3, seed=0, project='studxchange-hparam-search',
+                 log_root='runs', use_wandb=False):
+        self.runner = runner
+        self.base_config = base_config
+        self.search_space = search_space or SEARCH_SPACE
+        self.n_trials = n_trials
+        self.min_epochs = min_epochs
+        self.max_epochs = max_epochs
+        self.eta = eta
+        self.rng = random.Random(seed)
+        self.project = project
+        self.log_root = log_root
+        self.use_wandb = use_wandb
+
+    def run(self):
+        """Run the search and return trials sorted best-first"""
+        trials = []
+        for i in range(self.n_trials):
+            trial = {
+                'trial_id': f"trial_{i:03d}",
+                'config': sample_config(self.base_config, self.search_space, self.rng),
+                'epochs_done': 0,
+                'weights': None,
+                'score': None,
+                'status': 'running'
+            }
+            trial['logger'] = LocalRunLogger(self.project, trial['trial_id'], trial['config'],
+                                             root=self.log_root, use_wandb=self.use_wandb)
+            trials.append(trial)
+
+        alive = trials
+        budget = self.min_epochs
+        rung = 0
+
+        while alive:
+            print(f"\n🪜 Rung {rung}: {len(alive)} trial(s) up to {budget} epochs")
+            for trial in alive:
+                epochs = budget - trial['epochs_done']
+                score, weights = self.runner.run(trial, epochs, trial['weights'])
+                trial.update(score=score, weights=weights, epochs_done=budget)
+                trial['logger'].log({'rung': rung, 'epochs': budget, 'mAP50_95': score}, step=budget)
+                print(f"   {trial['trial_id']}: mAP@0.5:0.95 = {score:.4f} after {budget} epochs")
+
+            alive.sort(key=lambda t: t['score'], reverse=True)
+            if budget >= self.max_epochs or len(alive) == 1:
+                break
+
+            keep = max(1, len(alive) // self.eta)
+            for trial in alive[keep:]:
+                trial['status'] = 'pruned'
+                self._close(trial)
+            alive = alive[:keep]
+            budget = min(budget * self.eta, self.max_epochs)
+            rung += 1
+
+        for trial in alive:
+            trial['status'] = 'completed'
+            self._close(trial)
+
+        ranked = sorted(trials, key=lambda t: (t['status'] == 'completed', t['epochs_done'], t['score']),
+                        reverse=True)
+        self._write_results(ranked)
+        return ranked
+
+    def _close(self, trial):
+        trial['logger'].summary.update(status=trial['status'], epochs_done=trial['epochs_done'])
+        trial['logger'].finish()
+
+    def _write_results(self, ranked):
+        results_dir = Path(self.log_root) / self.project
+        leaderboard = [{k: v for k, v in t.items() if k != 'logger'} for t in ranked]
+        with open(results_dir / "search_results.json", 'w') as f:
+            json.dump(leaderboard, f, indent=2, default=str)
+        with open(results_dir / "best_config.json", 'w') as f:
+            json.dump(ranked[0]['config'], f, indent=2)
+        print(f"\n🏆 Best trial: {ranked[0]['trial_id']} (mAP@0.5:0.95 = {ranked[0]['score']:.4f})")
+        print(f"📁 Results saved to: {results_dir}")
+
+# ====================================================================
+# COMMAND LINE
+# ====================================================================
+
+def main():
+    """Run a successive halving search from the command line"""
+    parser = argparse.ArgumentParser(description="StudXchange hyperparameter search")
+    parser.add_argument("--data", required=True, help="Path to the dataset data.yaml")
+    parser.add_argument("--base", choices=sorted(PLATFORM_CONFIGS), default="colab")
+    parser.add_argument("--trials", type=int, default=9)
+    parser.add_argument("--min-epochs", type=int, default=3)
+    parser.add_argument("--max-epochs", type=int, default=27)
+    parser.add_argument("--eta", type=int, default=3)
+    parser.add_argument("--fraction", type=float, default=0.25, help="Share of the dataset used by trials")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--imgsz", type=int)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--project", default="studxchange-hparam-search")
+    parser.add_argument("--wandb", action="store_true", help="Also log trials to wandb")
+    args = parser.parse_args()
+
+    data_yaml = prepare_trial_dataset(args.data, args.fraction, args.seed)
+    runner = UltralyticsTrialRunner(data_yaml, device=args.device, imgsz=args.imgsz, workers=args.workers)
+    search = SuccessiveHalvingSearch(runner, PLATFORM_CONFIGS[args.base], n_trials=args.trials,
+                                     min_epochs=args.min_epochs, max_epochs=args.max_epochs,
+                                     eta=args.eta, seed=args.seed, project=args.project,
+                                     use_wandb=args.wandb)
+    search.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+# 🧬 Image Embeddings - StudXchange Custom Model
+## Batched CPU feature vectors for diversity sampling and near-duplicate search
+
+"""
+One L2-normalized vector per image, computed in batches on the CPU with
+decoding in a thread pool ahead of the model (batch_scoring's prefetcher).
+
+Backends:
+- "yolo": pooled backbone features from the trained detector
+  (`YOLO.embed`), which group photos by dish and plating
+- "thumb": 16x16 gray thumbnail + HSV color histogram; no torch needed,
+  very fast, and good enough to find burst frames and re-saved copies
+
+Vectors are kept in an EmbeddingStore (.npz, float16) keyed by path, file
+size and mtime, so re-running over a growing collection only embeds the new
+images.
+
+Usage:
+    python image_embeddings.py data/labeled_dataset/images --store .embeddings/labeled.npz
+    python image_embeddings.py data/raw_collection --backend thumb
+"""
+
+import argparse
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+try:
+    from ultralytics import YOLO
+except ImportError:
+    YOLO = None
+
+from batch_scoring import batched, discover_images, prefetch_decoded
+
+EMBEDDING_DIR = ".embeddings"
+
+# ====================================================================
+# EMBEDDING BACKENDS
+# ====================================================================
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+
+
+def thumbnail_embedding(image):
+    """384-d vector: mean-centred 16x16 gray thumbnail + 8x4x4 HSV histogram"""
+    small = cv2.resize(image, (16, 16), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.float32).ravel()
+    gray -= gray.mean()
+    gray /= np.linalg.norm(gray) + 1e-6
+
+    hsv = cv2.cvtColor(cv2.resize(image, (64, 64), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1, 2], None, [8, 4, 4], [0, 180, 0, 256, 0, 256]).ravel()
+    hist = np.sqrt(hist / (hist.sum() + 1e-6))  # Hellinger: dot product ~ histogram similarity
+    return np.concatenate([gray, hist])
+
+
+class Embedder:
+    """Batch embedding with the detector backbone or the thumbnail fallback"""
+
+    def __init__(self, model_path="studxchange_model.pt", backend="yolo", imgsz=320):
+        if backend == "yolo" and (YOLO is None or not os.path.exists(model_path)):
+            print("⚠️  Detector unavailable for embeddings, using thumbnail backend")
+            backend = "thumb"
+        self.backend = backend
+        self.imgsz = imgsz
+        self.model = YOLO(model_path) if backend == "yolo" else None
+        self.name = f"yolo:{Path(model_path).name}:{imgsz}" if backend == "yolo" else "thumb"
+
+    def embed(self, images):
+        """(N, D) normalized vectors for a list of BGR arrays"""
+        if self.model is None:
+            return normalize([thumbnail_embedding(image) for image in images])
+        vectors = self.model.embed(images, imgsz=self.imgsz, device='cpu', verbose=False)
+        return normalize(np.stack([v.cpu().numpy().ravel() for v in vectors]))
+
+# ====================================================================
+# EMBEDDING STORE
+# ====================================================================
+
+class EmbeddingStore:
+    """Vectors by path, reused while the file's size and mtime are unchanged"""
+
+    def __init__(self, path, backend_name):
+        self.path = Path(path)
+        self.backend_name = backend_name
+        self.entries = {}  # path -> (size, mtime, row)
+        self.vectors = np.zeros((0, 0), dtype=np.float16)
+        if self.path.exists():
+            with np.load(self.path) as data:
+                if str(data['backend']) == backend_name:
+                    self.vectors = data['vectors']
+                    for row, (p, size, mtime) in enumerate(zip(data['paths'], data['sizes'], data['mtimes'])):
+                        self.entries[str(p)] = (int(size), float(mtime), row)
+
+    @staticmethod
+    def stamp(path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime
+
+    def missing(self, paths):
+        """Paths without an up-to-date vector"""
+        todo = []
+        for path in paths:
+            entry = self.entries.get(path)
+            if entry is None or entry[:2] != self.stamp(path):
+                todo.append(path)
+        return todo
+
+    def add(self, paths, vectors):
+        start = len(self.vectors)
+        vectors = vectors.astype(np.float16)
+        self.vectors = vectors if start == 0 else np.concatenate([self.vectors, vectors])
+        for i, path in enumerate(paths):
+            self.entries[path] = (*self.stamp(path), start + i)
+
+    def get(self, paths):
+        """(found paths, (N, D) float32 vectors) in the order given"""
+        found = [p for p in paths if p in self.entries]
+        rows = [self.entries[p][2] for p in found]
+        return found, self.vectors[rows].astype(np.float32)
+
+    def save(self):
+        """Write only live rows (stale vectors from re-embedded files are dropped)"""
+        paths = sorted(self.entries)
+        rows = [self.entries[p][2] for p in paths]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp.npz')
+        np.savez(tmp, backend=self.backend_name, paths=np.array(paths),
+                 sizes=np.array([self.entries[p][0] for p in paths], dtype=np.int64),
+                 mtimes=np.array([self.entries[p][1] for p in paths], dtype=np.float64),
+                 vectors=self.vectors[rows] if rows else self.vectors)
+        os.replace(tmp, self.path)
+
+
+def compute_embeddings(paths, embedder, store_path=None, batch_size=32, workers=8, log_every=2000):
+    """(paths, (N, D) float32 vectors) for every readable image, embedding only what the store lacks"""
+    paths = list(paths)
+    store = EmbeddingStore(store_path or Path(EMBEDDING_DIR) / "embeddings.npz", embedder.name)
+    todo = store.missing(paths)
+    if len(todo) < len(paths):
+        print(f"♻️  {len(paths) - len(todo)} embeddings reused from {store.path}")
+
+    done = 0
+    decoded = prefetch_decoded(todo, workers=workers, prefetch=4 * batch_size)
+    for batch in batched(decoded, batch_size):
+        ready = [(path, image) for path, image, error in batch if image is not None]
+        if ready:
+            store.add([path for path, _ in ready], embedder.embed([image for _, image in ready]))
+        done += len(batch)
+        if done % log_every < batch_size:
+            print(f"🧬 {done}/{len(todo)} images embedded")
+
+    if todo:
+        store.save()
+    return store.get(paths)
+
+# ====================================================================
+# CLUSTERING
+# ====================================================================
+
+def kmeans(vectors, k, iterations=20, seed=0, chunk=65536):
+    """Spherical k-means on normalized vectors; returns (centroids, labels)"""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(vectors))
+
+    # k-means++ seeding on a sample keeps this linear in N
+    sample = vectors[rng.choice(len(vectors), min(len(vectors), 20 * k), replace=False)]
+    centroids = [sample[rng.integers(len(sample))]]
+    distance = 1 - sample @ centroids[0]
+    for _ in range(1, k):
+        probabilities = np.clip(distance, 0, None)
+        probabilities = probabilities / probabilities.sum() if probabilities.sum() > 0 else None
+        centroids.append(sample[rng.choice(len(sample), p=probabilities)])
+        distance = np.minimum(distance, 1 - sample @ centroids[-1])
+    centroids = np.stack(centroids)
+
+    labels = np.zeros(len(vectors), dtype=np.int32)
+    for _ in range(iterations):
+        for start in range(0, len(vectors), chunk):
+            labels[start:start + chunk] = np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        empty = np.bincount(labels, minlength=k) == 0
+        sums[empty] = centroids[empty]
+        new_centroids = normalize(sums)
+        if np.allclose(new_centroids, centroids, atol=1e-4):
+            break
+        centroids = new_centroids
+    return centroids, labels
+
+# ====================================================================
+# COMMAND LINE
+# ====================================================================
+
+def main():
+    """Embed a directory of images into a store"""
+    parser = argparse.ArgumentParser(description="StudXchange image embeddings")
+    parser.add_argument("root", help="Directory to walk for images")
+    parser.add_argument("--store", default=str(Path(EMBEDDING_DIR) / "embeddings.npz"))
+    parser.add_argument("--model", default="studxchange_model.pt")
+    parser.add_argument("--backend", choices=["yolo", "thumb"], default="yolo")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    embedder = Embedder(args.model, args.backend)
+    paths, vectors = compute_embeddings(discover_images(args.root), embedder, args.store,
+                                        args.batch_size, args.workers)
+    print(f"✅ {len(paths)} embeddings ({vectors.shape[1] if len(vectors) else 0}-d, {embedder.name}) in {args.store}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+# 🔁 Incremental Training - StudXchange Custom Model
+## Fine-tune the current best.pt on new dishes without forgetting the old ones
+
+"""
+Adding a dish or a batch of new photos meant a full 200-300 epoch run from
+yolov8*.pt over the whole dataset. Incremental mode starts from the current
+best.pt instead and trains briefly on:
+
+- the new labelled data, plus
+- a replay buffer sampled from the old train split (REPLAY_RATIO old images
+  per new image, stratified so every old dish keeps some examples, rarest
+  dishes first), which is what keeps the old classes from being forgotten
+
+Class ids are merged, not reassigned: the base model's classes keep their
+ids and dishes only the new data has are appended. Names match exactly
+first and through the taxonomy's synonyms second, so "chapati" in the new
+data lands on the model's "roti" only when the model has no "chapati" class.
+`expand_head` grows the Detect head's class convs to the merged class count
+with the old rows copied in, so the old dishes start out exactly as good as
+they were. Training runs a short schedule with the backbone frozen
+(INCREMENTAL_OVERRIDES).
+
+`compare_models` evaluates the base and the fine-tuned weights on the same
+validation images (old val + new val) through evaluation.py and reports the
+mAP delta separately for the old classes (forgetting) and the new ones.
+
+Usage:
+    python training_pipeline.py --source local --dataset-path new_batch \\
+        --incremental runs/train/<run>/weights/best.pt --old-data dataset/data.yaml
+    python incremental_training.py build best.pt dataset/data.yaml new_batch/data.yaml --output incremental
+    python incremental_training.py compare best.pt incremental_run/best.pt incremental/data.yaml --base-classes 25
+"""
+
+import argparse
+import json
+import math
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+from dataset_layout import label_path, split_images
+from evaluation import Evaluation, cache_predictions
+from label_lint import LabelTable
+from taxonomy import TAXONOMY, normalize_name
+
+REPLAY_RATIO = 1.0  # old images replayed per new image
+REPLAY_SEED = 0
+INCREMENTAL_DIR = "incremental_dataset"
+
+# Short schedule on top of trained weights: layers 0-9 are the YOLOv8
+# backbone, so only the neck and head adapt to the new data
+INCREMENTAL_OVERRIDES = {
+    'epochs': 30,
+    'patience': 10,
+    'freeze': 10,
+    'warmup_epochs': 1,
+    'close_mosaic': 5
+}
+
+# ====================================================================
+# CLASS MERGING
+# ====================================================================
+
+def _key(name):
+    return TAXONOMY.canonical(name) or normalize_name(name)
+
+
+def read_names(data_yaml):
+    """Class names of a data.yaml as a list indexed by class id"""
+    with open(data_yaml, 'r') as f:
+        names = yaml.safe_load(f).get('names', [])
+    if isinstance(names, dict):
+        names = [names[k] for k in sorted(names, key=int)]
+    return list(names)
+
+
+def merge_classes(base_names, *dataset_names):
+    """(merged names, one int32 id table per dataset): base ids kept, unseen dishes appended
+
+    An exact name match wins over a synonym, so a model that still has
+    separate roti and chapati classes keeps both.
+    """
+    merged = list(base_names)
+    exact, canonical = {}, {}
+    for class_id, name in enumerate(merged):
+        exact.setdefault(normalize_name(name), class_id)
+        canonical.setdefault(_key(name), class_id)
+    tables = []
+    for names in dataset_names:
+        table = np.full(len(names), -1, dtype=np.int32)
+        for class_id, name in enumerate(names):
+            target = exact.get(normalize_name(name), canonical.get(_key(name)))
+            if target is None:
+                target = exact[_key(name)] = canonical[_key(name)] = len(merged)
+                merged.append(_key(name))
+            table[class_id] = target
+        tables.append(table)
+    return merged, tables
+
+# ====================================================================
+# REPLAY BUFFER
+# ====================================================================
+
+def read_split_labels(image_paths, workers=16):
+    """(LabelTable, image index per table file) over the images that have a label file"""
+    labelled = [(i, path) for i, path in enumerate(map(label_path, image_paths)) if os.path.exists(path)]
+    table = LabelTable([path for _, path in labelled], workers)
+    return table, np.array([i for i, _ in labelled], dtype=np.int64)
+
+
+def sample_replay(image_paths, num_classes, budget, seed=REPLAY_SEED, workers=16):
+    """Indices of up to `budget` images: a per-class quota (rarest class first), then random fill"""
+    if budget >= len(image_paths):
+        return np.arange(len(image_paths))
+
+    table, image_of = read_split_labels(image_paths, workers)
+    valid = (table.cls >= 0) & (table.cls < num_classes)
+    present = np.zeros((len(image_paths), num_classes), dtype=bool)
+    present[image_of[table.file_id[valid]], table.cls[valid].astype(np.int64)] = True
+
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(image_paths))
+    chosen = np.zeros(len(image_paths), dtype=bool)
+    counts = present.sum(axis=0)
+    classes = np.flatnonzero(counts)
+    quota = max(1, budget // max(len(classes), 1))
+
+    for c in classes[np.argsort(counts[classes], kind='stable')]:
+        missing = quota - int((present[:, c] & chosen).sum())
+        if missing > 0:
+            candidates = order[present[order, c] & ~chosen[order]]
+            chosen[candidates[:min(missing, budget - int(chosen.sum()))]] = True
+        if chosen.sum() >= budget:
+            break
+
+    fill = order[~chosen[order]][:budget - int(chosen.sum())]
+    chosen[fill] = True
+    return np.flatnonzero(chosen)
+
+# ====================================================================
+# DATASET
+# ====================================================================
+
+def _link(source, destination):
+    if destination.exists():
+        destination.unlink()
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)  # different filesystem
+
+
+def write_remapped(image_paths, table, output_dir, split, prefix, workers=16):
+    """Link images into output_dir/images/<split> and write labels with ids remapped; returns dropped boxes"""
+    image_dir, label_dir = Path(output_dir) / 'images' / split, Path(output_dir) / 'labels' / split
+    image_dir.mkdir(parents=True, exist_ok=True)
+    label_dir.mkdir(parents=True, exist_ok=True)
+
+    labels, image_of = read_split_labels(image_paths, workers)
+    in_range = (labels.cls >= 0) & (labels.cls < len(table))
+    mapped = np.full(len(labels), -1, dtype=np.int64)
+    mapped[in_range] = table[labels.cls[in_range].astype(np.int64)]
+    keep = mapped >= 0
+    lines = [''] * len(image_paths)
+    for row in np.flatnonzero(keep):
+        x, y, w, h = labels.xywh[row]
+        lines[image_of[labels.file_id[row]]] += f"{mapped[row]} {x:.6f} {y:.6f} {w:.6f} {h:.6f}\n"
+
+    for path, text in zip(image_paths, lines):
+        name = f"{prefix}_{Path(path).name}"
+        _link(path, image_dir / name)
+        with open(label_dir / f"{Path(name).stem}.txt", 'w') as f:
+            f.write(text)
+    return int((~keep).sum()) + len(labels.malformed)
+
+
+def build_incremental_dataset(base_names, old_yaml, new_yaml, output_dir=INCREMENTAL_DIR,
+                              replay_ratio=REPLAY_RATIO, seed=REPLAY_SEED):
+    """New train data + replay buffer + both val splits in merged class ids; returns a summary dict"""
+    output_dir = Path(output_dir).resolve()
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+    old_names, new_names = read_names(old_yaml), read_names(new_yaml)
+    names, (old_table, new_table) = merge_classes(base_names, old_names, new_names)
+
+    new_train = split_images(new_yaml, 'train')[0]
+    old_train = split_images(old_yaml, 'train')[0]
+    budget = int(round(replay_ratio * len(new_train)))
+    replay = [old_train[i] for i in sample_replay(old_train, len(old_names), budget, seed)]
+
+    dropped = write_remapped(new_train, new_table, output_dir, 'train', 'new')
+    dropped += write_remapped(replay, old_table, output_dir, 'train', 'old')
+    for yaml_path, table, prefix in ((new_yaml, new_table, 'new'), (old_yaml, old_table, 'old')):
+        dropped += write_remapped(split_images(yaml_path, 'val')[0], table, output_dir, 'val', prefix)
+    if dropped:
+        print(f"⚠️  {dropped} label lines dropped (malformed or unknown class) - run label_lint.py first")
+
+    data = {'path': str(output_dir), 'train': 'images/train', 'val': 'images/val',
+            'nc': len(names), 'names': names}
+    with open(output_dir / 'data.yaml', 'w') as f:
+        yaml.safe_dump(data, f, sort_keys=False)
+
+    added = names[len(base_names):]
+    print(f"📁 Incremental dataset: {len(new_train)} new + {len(replay)} replayed train images → {output_dir}")
+    if added:
+        print(f"🆕 New classes: {', '.join(added)}")
+    return {
+        'data_yaml': str(output_dir / 'data.yaml'),
+        'base_classes': len(base_names),
+        'new_classes': added,
+        'new_images': len(new_train),
+        'replay_images': len(replay)
+    }
+
+# ====================================================================
+# MODEL
+# ====================================================================
+
+def _load_checkpoint(weights):
+    """(checkpoint dict, its model) - the EMA weights when the checkpoint still has them"""
+    if torch is None:
+        raise ImportError("PyTorch is required: pip install torch")
+    checkpoint = torch.load(weights, map_location='cpu', weights_only=False)
+    model = checkpoint.get('ema')
+    return checkpoint, model if model is not None else checkpoint['model']
+
+
+def checkpoint_names(weights):
+    """Class names stored in an ultralytics checkpoint"""
+    names = _load_checkpoint(weights)[1].names
+    return [names[k] for k in sorted(names)] if isinstance(names, dict) else list(names)
+
+
+def expand_head(weights, names, output_path):
+    """Copy of a checkpoint whose Detect head predicts len(names) classes, old class rows kept"""
+    checkpoint, model = _load_checkpoint(weights)
+    detect = model.model[-1]
+    old_nc, new_nc = detect.nc, len(names)
+
+    if new_nc > old_nc:
+        for branch, stride in zip(detect.cv3, detect.stride.tolist()):
+            old = branch[-1]
+            new = torch.nn.Conv2d(old.in_channels, new_nc, 1).to(old.weight.device)
+            with torch.no_grad():
+                new.weight[:old_nc] = old.weight.float()
+                # Same prior as Detect.bias_init, so new classes start rare instead of random
+                new.bias[:old_nc] = old.bias.float()
+                new.bias[old_nc:] = math.log(5 / new_nc / (640 / stride) ** 2)
+            branch[-1] = new.to(old.weight.dtype)
+        detect.nc = new_nc
+        detect.no = new_nc + detect.reg_max * 4
+        model.yaml['nc'] = new_nc
+    model.names = dict(enumerate(names))
+
+    checkpoint.update(model=model, ema=None, optimizer=None, updates=None, epoch=-1)
+    torch.save(checkpoint, output_path)
+    print(f"🧠 Detect head {old_nc} → {new_nc} classes: {output_path}")
+    return str(output_path)
+
+
+def incremental_overrides(config):
+    """train() arguments for fine-tuning: short schedule, frozen backbone, 1/10 learning rate"""
+    return {**INCREMENTAL_OVERRIDES, 'lr0': config.get('learning_rate', 0.01) / 10}
+
+# ====================================================================
+# BEFORE / AFTER
+# ====================================================================
+
+def _group(ap, gt_counts, classes):
+    present = classes[gt_counts[classes] > 0]
+    return round(float(ap[present].mean()), 4) if len(present) else None
+
+
+def compare_models(base_weights, tuned_weights, data_yaml, base_classes, split='val'):
+    """mAP50-95 of both models on the same images, split into old and new classes"""
+    rows = {}
+    for label, weights in (('before', base_weights), ('after', tuned_weights)):
+        predictions = cache_predictions(weights, data_yaml, split)[0]
+        ap, gt_counts = Evaluation(predictions).per_class_ap()
+        rows[label] = ap.mean(axis=1)
+    names = predictions.names
+
+    classes = np.arange(len(gt_counts))
+    report = {}
+    for group, members in (('old_classes', classes[:base_classes]), ('new_classes', classes[base_classes:])):
+        before, after = _group(rows['before'], gt_counts, members), _group(rows['after'], gt_counts, members)
+        report[group] = {
+            'mAP50_95_before': before,
+            'mAP50_95_after': after,
+            'delta': round(after - before, 4) if before is not None else None,
+            'per_class': {names.get(int(c), f"dish_{c}"): round(float(rows['after'][c] - rows['before'][c]), 4)
+                          for c in members if gt_counts[c]}
+        }
+    return report
+
+
+def print_comparison(report):
+    for group, row in report.items():
+        if row['delta'] is None:
+            continue
+        print(f"   {group.replace('_', ' ')}: mAP50-95 {row['mAP50_95_before']:.3f} → "
+              f"{row['mAP50_95_after']:.3f} ({row['delta']:+.3f})")
+    forgotten = sorted(report['old_classes']['per_class'].items(), key=lambda item: item[1])[:3]
+    for name, delta in forgotten:
+        if delta < 0:
+            print(f"   ⚠️  {name}: {delta:+.3f}")
+
+# ====================================================================
+# COMMAND LINE
+# ====================================================================
+
+def main():
+    """Build an incremental dataset or compare a fine-tuned model with its base"""
+    parser = argparse.ArgumentParser(description="StudXchange incremental fine-tuning")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Merge classes, sample the replay buffer and expand the head")
+    build.add_argument("weights", help="Current best.pt")
+    build.add_argument("old_data", help="data.yaml the weights were trained on")
+    build.add_argument("new_data", help="data.yaml of the new labelled data")
+    build.add_argument("--output", default=INCREMENTAL_DIR)
+    build.add_argument("--replay-ratio", type=float, default=REPLAY_RATIO)
+    build.add_argument("--seed", type=int, default=REPLAY_SEED)
+
+    compare = commands.add_parser("compare", help="mAP delta on old and new classes")
+    compare.add_argument("base_weights")
+    compare.add_argument("tuned_weights")
+    compare.add_argument("data_yaml", help="The incremental dataset's data.yaml")
+    compare.add_argument("--base-classes", type=int, required=True, help="Class count of the base model")
+    compare.add_argument("--json", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        summary = build_incremental_dataset(checkpoint_names(args.weights), args.old_data, args.new_data,
+                                            args.output, args.replay_ratio, args.seed)
+        expand_head(args.weights, read_names(summary['data_yaml']), Path(args.output) / 'init.pt')
+    else:
+        report = compare_models(args.base_weights, args.tuned_weights, args.data_yaml, args.base_classes)
+        print_comparison(report)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
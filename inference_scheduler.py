@@ -0,0 +1,248 @@
+# 🚥 Inference Scheduler - StudXchange Custom Model
+## Priority lanes and per-key rate limiting in front of the detector
+
+"""
+One detector, two kinds of callers: mess owners creating a menu right now
+(interactive) and background re-scoring jobs (batch).
+
+- a single worker thread owns the detector and always takes the oldest
+  interactive request first; batch requests only run when no interactive
+  request is waiting, so they soak up spare capacity and an interactive
+  request waits at most for the one batch item already on the model (a
+  single image, or a small chunk of a bulk upload)
+- both lanes have bounded queues; a full interactive queue sheds load
+  immediately instead of letting p95 grow without bound
+- token buckets per API key (or user) cap how fast one caller can submit;
+  limits come from RATE_LIMIT_RPS / RATE_LIMIT_BURST and optional per-key
+  overrides in the JSON file named by RATE_LIMITS_FILE:
+
+      {"backend-rescore": {"rate": 20, "burst": 50}, "free-tier": {"rate": 0.5, "burst": 2}}
+"""
+
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from detector_metrics import REGISTRY
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+LANES = (INTERACTIVE, BATCH)
+
+QUEUE_DEPTH = REGISTRY.gauge(
+    "studx_queue_depth", "Requests waiting for the detector", ("lane",))
+QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "studx_queue_wait_seconds", "Time from submit until the detector picked the request up", ("lane",))
+REJECTED_TOTAL = REGISTRY.counter(
+    "studx_rejected_total", "Requests refused before inference", ("lane", "reason"))
+
+
+class RateLimited(Exception):
+    """The caller's token bucket is empty"""
+
+    def __init__(self, key, retry_after):
+        super().__init__(f"Rate limit exceeded for {key}; retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class QueueFull(Exception):
+    """The lane's queue is at capacity"""
+
+# ====================================================================
+# RATE LIMITING
+# ====================================================================
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def level(self, now=None):
+        """Tokens available at `now`, without spending any"""
+        now = time.monotonic() if now is None else now
+        return min(self.burst, self.tokens + (now - self.updated) * self.rate)
+
+    def take(self, cost=1.0):
+        """Spend tokens; returns 0 on success or the seconds until enough are available"""
+        now = time.monotonic()
+        self.tokens = self.level(now)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate if self.rate > 0 else float('inf')
+
+
+class RateLimiter:
+    """One token bucket per API key / user"""
+
+    def __init__(self, rate=5.0, burst=10.0, overrides=None, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.overrides = overrides or {}
+        self.max_keys = max_keys
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Limiter configured from the environment, or None when no limits are set"""
+        if not os.environ.get("RATE_LIMIT_RPS") and not os.environ.get("RATE_LIMITS_FILE"):
+            return None
+        overrides = {}
+        if os.environ.get("RATE_LIMITS_FILE"):
+            with open(os.environ["RATE_LIMITS_FILE"]) as f:
+                overrides = json.load(f)
+        return cls(rate=float(os.environ.get("RATE_LIMIT_RPS", 5)),
+                   burst=float(os.environ.get("RATE_LIMIT_BURST", 10)),
+                   overrides=overrides)
+
+    def check(self, key, cost=1.0):
+        """Raise RateLimited if `key` is over its limit"""
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                if len(self.buckets) >= self.max_keys:
+                    self._evict()
+                limits = self.overrides.get(key, {})
+                bucket = TokenBucket(limits.get('rate', self.rate), limits.get('burst', self.burst))
+                self.buckets[key] = bucket
+            retry_after = bucket.take(cost)
+        if retry_after:
+            raise RateLimited(key, retry_after)
+
+    def max_cost(self, key):
+        """Largest cost `key` can ever be charged at once: its bucket never holds more than burst"""
+        return self.overrides.get(key, {}).get('burst', self.burst)
+
+    def refund(self, key, cost=1.0):
+        """Give back tokens charged for a request that was then refused"""
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.tokens = min(bucket.burst, bucket.tokens + cost)
+
+    def _evict(self):
+        """Shrink the bucket table (called with the lock held)"""
+        now = time.monotonic()
+        # Forget idle callers; a full bucket is what they'd get back anyway
+        self.buckets = {k: b for k, b in self.buckets.items() if b.level(now) < b.burst}
+        if len(self.buckets) >= self.max_keys:
+            # Every caller is active: keep the most recently seen half
+            recent = sorted(self.buckets.items(), key=lambda item: item[1].updated)
+            self.buckets = dict(recent[len(recent) - self.max_keys // 2:])
+
+# ====================================================================
+# PRIORITY SCHEDULER
+# ====================================================================
+
+class InferenceScheduler:
+    """Single detector worker fed from an interactive lane and a batch lane"""
+
+    def __init__(self, detector, limiter=None, max_interactive=32, max_batch=1000):
+        self.detector = detector
+        self.limiter = limiter
+        self.limits = {INTERACTIVE: max_interactive, BATCH: max_batch}
+        self.heap = []
+        self.depth = {lane: 0 for lane in LANES}
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        threading.Thread(target=self._run, daemon=True, name="inference-scheduler").start()
+
+    @property
+    def model_path(self):
+        return self.detector.model_path
+
+    def admit(self, lane=INTERACTIVE, key=None, cost=1.0):
+        """Validate the lane and charge `key`'s rate limit without queueing anything
+
+        For callers that may not reach submit_call themselves (coalesced
+        requests); pass key=None to submit_call afterwards.
+        """
+        if lane not in LANES:
+            raise ValueError(f"Unknown lane: {lane}")
+        if self.limiter is not None and key is not None and cost > 0:
+            try:
+                self.limiter.check(key, cost)
+            except RateLimited:
+                REJECTED_TOTAL.inc(lane=lane, reason="rate_limited")
+                raise
+
+    def max_cost(self, key):
+        """Largest single charge `key` can ever pass (inf without a limiter)"""
+        if self.limiter is None or key is None:
+            return float('inf')
+        return self.limiter.max_cost(key)
+
+    def refund(self, key, cost=1.0):
+        """Undo an admit() charge for a request that was then refused"""
+        if self.limiter is not None and key is not None:
+            self.limiter.refund(key, cost)
+
+    def submit(self, image, confidence_threshold=0.5, trace=None, lane=INTERACTIVE, key=None):
+        """Queue one detection; returns a Future with the detect_food result"""
+        return self.submit_call(lambda detector: detector.detect_food(image, confidence_threshold, trace=trace),
+                                lane, key, traces=[trace] if trace is not None else None)
+
+    def submit_call(self, fn, lane=INTERACTIVE, key=None, cost=1.0, traces=None):
+        """Queue fn(detector) to run on the worker; returns a Future with its result
+
+        Bulk callers split work into several calls so interactive requests can
+        run in between; `cost` charges the rate limit for all of it at once.
+        """
+        if lane not in LANES:
+            raise ValueError(f"Unknown lane: {lane}")
+
+        future = Future()
+        with self.condition:
+            # Queue first: a request shed with 503 must not spend the caller's tokens
+            if self.depth[lane] >= self.limits[lane]:
+                REJECTED_TOTAL.inc(lane=lane, reason="queue_full")
+                raise QueueFull(f"{lane} queue is full ({self.limits[lane]} waiting)")
+            if self.limiter is not None and key is not None and cost > 0:
+                try:
+                    self.limiter.check(key, cost)
+                except RateLimited:
+                    REJECTED_TOTAL.inc(lane=lane, reason="rate_limited")
+                    raise
+            priority = LANES.index(lane)
+            heapq.heappush(self.heap, (priority, next(self.sequence), time.perf_counter(), lane,
+                                       (fn, traces or []), future))
+            self.depth[lane] += 1
+            QUEUE_DEPTH.set(self.depth[lane], lane=lane)
+            self.condition.notify()
+        return future
+
+    def detect_food(self, image, confidence_threshold=0.5, trace=None, lane=INTERACTIVE, key=None):
+        """Blocking submit, same signature and result as detector.detect_food"""
+        return self.submit(image, confidence_threshold, trace, lane, key).result()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.heap:
+                    self.condition.wait()
+                _, _, queued_at, lane, (fn, traces), future = heapq.heappop(self.heap)
+                self.depth[lane] -= 1
+                QUEUE_DEPTH.set(self.depth[lane], lane=lane)
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            wait = time.perf_counter() - queued_at
+            QUEUE_WAIT_SECONDS.observe(wait, lane=lane)
+
+            for trace in traces:
+                trace.record("queue", wait)
+                trace.fields["lane"] = lane
+            try:
+                future.set_result(fn(self.detector))
+            except Exception as e:
+                future.set_exception(e)
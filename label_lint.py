@@ -0,0 +1,308 @@
+# 🧹 Label Lint - StudXchange Custom Model
+## Vectorized YOLO label checks with safe automatic fixes
+
+"""
+Training, evaluation and the collection tools all read YOLO label files
+without checking them. This linter reads every label file of a split in a
+thread pool, puts all boxes into one array per split and runs each check
+as a single NumPy expression over it:
+
+- malformed      a line that is not five numbers (reported, kept as is)
+- bad_class      class id that is not an integer in [0, nc) (reported)
+- out_of_range   box edges outside the image            -> clipped
+- zero_area      width or height ~0, also after clipping -> dropped
+- duplicate      same-class boxes in one file with IoU above the threshold
+                 -> the later line is dropped
+- missing_label  image without a label file (reported; YOLO treats it as
+                 background, which is usually a forgotten label)
+- orphan_label   label file without an image (reported)
+
+Fixes only rewrite the affected files, and the originals are copied to
+`<dataset>/.label_lint_backup/<timestamp>/` first. 100k label files lint in
+a few seconds; reading the files dominates.
+
+Usage:
+    python label_lint.py data/labeled_dataset/data.yaml
+    python label_lint.py data.yaml --dry-run --json label_lint_report.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from dataset_layout import label_path, split_images
+from geometry import grouped_pairs
+
+SPLITS = ('train', 'val', 'test')
+DUPLICATE_IOU = 0.9
+MIN_SIDE = 1e-3     # normalized width/height below this is a zero-area box
+EDGE_TOLERANCE = 1e-4
+BACKUP_DIR = ".label_lint_backup"
+
+# ====================================================================
+# LOADING
+# ====================================================================
+
+def _read(path):
+    with open(path, 'r', errors='replace') as f:
+        return f.read()
+
+
+def _read_chunk(paths):
+    return [_read(path) for path in paths]
+
+
+class LabelTable:
+    """Every box of a set of label files as flat arrays
+
+    Row r is line `line[r]` of `files[file_id[r]]`; `cls` stays float so
+    non-integer class ids can be reported instead of silently truncated.
+    """
+
+    def __init__(self, files, workers=16):
+        self.files = list(files)
+        chunks = [self.files[i:i + 256] for i in range(0, len(self.files), 256)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            texts = [text for chunk in pool.map(_read_chunk, chunks) for text in chunk]
+
+        rows, file_ids, lines = [], [], []
+        self.malformed = []  # (file id, line number, text)
+        for file_id, text in enumerate(texts):
+            for number, line in enumerate(text.splitlines(), 1):
+                tokens = line.split()
+                if not tokens:
+                    continue
+                if len(tokens) == 5:
+                    rows.append(tokens)
+                    file_ids.append(file_id)
+                    lines.append(number)
+                else:
+                    self.malformed.append((file_id, number, line.strip()))
+
+        try:
+            values = np.array(rows, dtype=np.float64).reshape(-1, 5)
+        except ValueError:
+            # Rare non-numeric tokens: find them line by line, only on this path
+            numeric = []
+            for tokens in rows:
+                try:
+                    numeric.append([float(t) for t in tokens])
+                except ValueError:
+                    numeric.append(None)
+            bad = [i for i, v in enumerate(numeric) if v is None]
+            self.malformed += [(file_ids[i], lines[i], ' '.join(rows[i])) for i in bad]
+            keep = [i for i, v in enumerate(numeric) if v is not None]
+            values = np.array([numeric[i] for i in keep], dtype=np.float64).reshape(-1, 5)
+            file_ids, lines = [file_ids[i] for i in keep], [lines[i] for i in keep]
+
+        self.file_id = np.array(file_ids, dtype=np.int32)
+        self.line = np.array(lines, dtype=np.int32)
+        self.cls = values[:, 0]
+        self.xywh = values[:, 1:].astype(np.float32)
+
+    def __len__(self):
+        return len(self.cls)
+
+    def where(self, mask, limit=None):
+        """'file:line' strings for the masked rows"""
+        rows = np.flatnonzero(mask)[:limit]
+        return [f"{self.files[self.file_id[r]]}:{self.line[r]}" for r in rows]
+
+# ====================================================================
+# GEOMETRY CHECKS
+# ====================================================================
+
+def xywh_to_xyxy(xywh):
+    half = xywh[:, 2:] / 2
+    return np.concatenate([xywh[:, :2] - half, xywh[:, :2] + half], axis=1)
+
+
+def xyxy_to_xywh(xyxy):
+    return np.concatenate([(xyxy[:, :2] + xyxy[:, 2:]) / 2, xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+
+
+def geometry_issues(xywh):
+    """(clipped xywh, out_of_range mask, zero_area mask) for normalized boxes"""
+    xyxy = xywh_to_xyxy(xywh)
+    out_of_range = ((xyxy < -EDGE_TOLERANCE) | (xyxy > 1 + EDGE_TOLERANCE)).any(axis=1)
+    clipped = xyxy_to_xywh(np.clip(xyxy, 0, 1))
+    zero_area = (clipped[:, 2] < MIN_SIDE) | (clipped[:, 3] < MIN_SIDE)
+    return clipped, out_of_range, zero_area
+
+
+def clean_boxes(xywh, class_ids=None, iou_threshold=DUPLICATE_IOU):
+    """(clipped xywh, keep mask) for in-memory proposals: clip, drop zero-area and duplicates"""
+    xywh = np.asarray(xywh, dtype=np.float32).reshape(-1, 4)
+    class_ids = np.zeros(len(xywh)) if class_ids is None else np.asarray(class_ids)
+    clipped, _, zero_area = geometry_issues(xywh)
+    keep = ~zero_area
+    _, later = grouped_pairs((class_ids,), xywh_to_xyxy(clipped), iou_threshold)
+    keep[later] = False
+    return clipped, keep
+
+# ====================================================================
+# LINTING
+# ====================================================================
+
+def lint_split(image_paths, nc=None, iou_threshold=DUPLICATE_IOU, workers=16):
+    """(issues, table, fixes) for one split: masks over the table rows plus file-level lists"""
+    # Pair by directory listing: one label_path() per folder, no per-file stat
+    by_dir = {}
+    for image in image_paths:
+        by_dir.setdefault(os.path.dirname(image), []).append(image)
+    expected, present = {}, set()
+    for images in by_dir.values():
+        label_dir = os.path.dirname(label_path(images[0]))
+        for image in images:
+            expected[os.path.join(label_dir, os.path.splitext(os.path.basename(image))[0] + '.txt')] = image
+        if os.path.isdir(label_dir):
+            with os.scandir(label_dir) as entries:
+                present.update(e.path for e in entries if e.name.endswith('.txt') and e.is_file())
+
+    missing_label = sorted(image for path, image in expected.items() if path not in present)
+    orphan_label = sorted(present.difference(expected))
+
+    table = LabelTable(sorted(present.intersection(expected)), workers)
+    clipped, out_of_range, zero_area = geometry_issues(table.xywh)
+    bad_class = (table.cls != np.round(table.cls)) | (table.cls < 0)
+    if nc is not None:
+        bad_class |= table.cls >= nc
+
+    candidates = np.flatnonzero(~zero_area)
+    i, j = grouped_pairs((table.cls[candidates], table.file_id[candidates]),
+                         xywh_to_xyxy(clipped[candidates]), iou_threshold)
+    duplicate = np.zeros(len(table), dtype=bool)
+    duplicate[candidates[j]] = True
+
+    issues = {
+        'malformed': table.malformed,
+        'bad_class': bad_class,
+        'out_of_range': out_of_range,
+        'zero_area': zero_area,
+        'duplicate': duplicate,
+        'missing_label': missing_label,
+        'orphan_label': orphan_label
+    }
+    fixes = {'clip': out_of_range & ~zero_area & ~bad_class, 'drop': zero_area | duplicate, 'xywh': clipped}
+    return issues, table, fixes
+
+
+def apply_fixes(table, fixes, dataset_root):
+    """Rewrite files with clipped or dropped boxes, backing up the originals; returns files rewritten"""
+    touched = fixes['clip'] | fixes['drop']
+    if not touched.any():
+        return 0
+    backup = Path(dataset_root) / BACKUP_DIR / datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    rows_by_file = {}
+    for row in np.flatnonzero(touched):
+        rows_by_file.setdefault(int(table.file_id[row]), []).append(row)
+    for file_id, rows in rows_by_file.items():
+        path = table.files[file_id]
+        target = backup / os.path.relpath(path, dataset_root)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(path, target)
+
+        lines = _read(path).splitlines()
+        for row in rows:
+            index = table.line[row] - 1
+            if fixes['drop'][row]:
+                lines[index] = None
+            else:
+                x, y, w, h = fixes['xywh'][row]
+                lines[index] = f"{int(table.cls[row])} {x:.6f} {y:.6f} {w:.6f} {h:.6f}"
+        with open(path, 'w') as f:
+            f.write(''.join(line + '\n' for line in lines if line is not None))
+    print(f"💾 Originals of {len(rows_by_file)} rewritten label files backed up to {backup}")
+    return len(rows_by_file)
+
+
+def summarize(issues, table, examples=5):
+    counts, shown = {}, {}
+    for name, found in issues.items():
+        if isinstance(found, np.ndarray):
+            counts[name] = int(found.sum())
+            shown[name] = table.where(found, examples)
+        else:
+            counts[name] = len(found)
+            shown[name] = [f"{table.files[f]}:{n}  {text}" for f, n, text in found[:examples]] \
+                if name == 'malformed' else [str(p) for p in found[:examples]]
+    return counts, {name: items for name, items in shown.items() if items}
+
+
+def lint_dataset(data_yaml, fix=True, iou_threshold=DUPLICATE_IOU, workers=16):
+    """Lint every split in a data yaml; returns the report dict"""
+    data_yaml = Path(data_yaml)
+    if data_yaml.is_dir():
+        data_yaml = data_yaml / 'data.yaml'
+    with open(data_yaml, 'r') as f:
+        data = yaml.safe_load(f)
+    root = Path(data.get('path') or data_yaml.parent)
+    names = data.get('names', [])
+    nc = data.get('nc', len(names) if names else None)
+
+    report = {'data': str(data_yaml), 'nc': nc, 'splits': {}}
+    for split in (s for s in SPLITS if data.get(s)):
+        start = datetime.now()
+        images, _ = split_images(data_yaml, split)
+        issues, table, fixes = lint_split(images, nc, iou_threshold, workers)
+        counts, examples = summarize(issues, table)
+        entry = {
+            'images': len(images),
+            'label_files': len(table.files),
+            'boxes': len(table),
+            'issues': counts,
+            'examples': examples,
+            'fixable': {'clip': int(fixes['clip'].sum()), 'drop': int(fixes['drop'].sum())}
+        }
+        if fix:
+            entry['files_rewritten'] = apply_fixes(table, fixes, root)
+        entry['seconds'] = round((datetime.now() - start).total_seconds(), 2)
+        report['splits'][split] = entry
+    return report
+
+# ====================================================================
+# COMMAND LINE
+# ====================================================================
+
+def main():
+    """Lint a YOLO dataset and apply safe fixes"""
+    parser = argparse.ArgumentParser(description="StudXchange YOLO label linter")
+    parser.add_argument("data", nargs="?", default="data.yaml", help="data.yaml or a dataset folder containing it")
+    parser.add_argument("--iou", type=float, default=DUPLICATE_IOU, help="Same-class IoU treated as a duplicate")
+    parser.add_argument("--dry-run", action="store_true", help="Report only, do not rewrite label files")
+    parser.add_argument("--json", help="Write the full report to this path")
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+
+    report = lint_dataset(args.data, fix=not args.dry_run, iou_threshold=args.iou, workers=args.workers)
+    for split, entry in report['splits'].items():
+        problems = {k: v for k, v in entry['issues'].items() if v}
+        status = "✅" if not problems else "⚠️ "
+        print(f"\n{status} {split}: {entry['images']} images, {entry['boxes']} boxes in "
+              f"{entry['label_files']} label files ({entry['seconds']}s)")
+        for name, count in problems.items():
+            print(f"   {name:<14} {count}")
+            for example in entry['examples'].get(name, [])[:3]:
+                print(f"      {example}")
+        if args.dry_run:
+            print(f"   would clip {entry['fixable']['clip']} and drop {entry['fixable']['drop']} boxes")
+        elif entry.get('files_rewritten'):
+            print(f"   🔧 clipped {entry['fixable']['clip']}, dropped {entry['fixable']['drop']} boxes "
+                  f"in {entry['files_rewritten']} files")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📄 Report saved: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+# 🕵️ Leakage Index - StudXchange Custom Model
+## Near-duplicate search across train/val/test and a leak-free re-split
+
+"""
+The same plate photographed twice, or neighbouring burst frames from
+`collect_from_camera`, can land in train and val and inflate the reported
+mAP. This module embeds every image of every split (batched CPU inference,
+see image_embeddings.py), indexes the vectors in an inverted-file (IVF)
+index and finds near-duplicate pairs without comparing all N² pairs:
+
+- `IVFIndex` clusters the vectors into ~sqrt(N) lists with k-means; a
+  query only scans the `nprobe` lists whose centroids are closest. The
+  self-join (`near_pairs`) goes list by list, one matrix product per list
+  against its probed neighbours, which keeps 100k images in the seconds to
+  minutes range on a CPU
+- connected components of near-duplicate pairs form clusters; a cluster
+  spanning more than one split is a leak
+- the re-split moves every leaking cluster into the split that already
+  holds most of it (train on ties) and writes train/val/test lists plus a
+  data yaml pointing at them; no image or label file is moved
+
+Usage:
+    python leakage_index.py report data.yaml --threshold 0.95
+    python leakage_index.py resplit data.yaml --output data_resplit
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from dataset_layout import split_images
+from image_embeddings import EMBEDDING_DIR, Embedder, compute_embeddings, kmeans
+
+SPLITS = ('train', 'val', 'test')
+
+# ====================================================================
+# IVF INDEX
+# ====================================================================
+
+class IVFIndex:
+    """Inverted-file approximate nearest-neighbour index over normalized vectors"""
+
+    def __init__(self, nlist=None, nprobe=8):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.centroids = None
+        self.order = None    # vector ids sorted by list
+        self.offsets = None  # list l holds order[offsets[l]:offsets[l + 1]]
+        self.vectors = None
+
+    def build(self, vectors, seed=0):
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        nlist = self.nlist or max(1, int(np.sqrt(len(vectors))))
+        self.centroids, labels = kmeans(self.vectors, nlist, iterations=10, seed=seed)
+        self.order = np.argsort(labels, kind='stable')
+        self.offsets = np.searchsorted(labels[self.order], np.arange(len(self.centroids) + 1))
+        return self
+
+    def _members(self, lists):
+        return np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in lists])
+
+    def _probe(self, queries):
+        nprobe = min(self.nprobe, len(self.centroids))
+        scores = queries @ self.centroids.T
+        return np.argpartition(-scores, nprobe - 1, axis=1)[:, :nprobe]
+
+    def search(self, queries, k=10):
+        """(similarities, ids) of the k nearest indexed vectors per query; -1 pads short rows"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        similarities = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+
+        # Queries sharing a probe set share one candidate matrix product
+        probes = np.sort(self._probe(queries), axis=1)
+        groups = {}
+        for q, probe in enumerate(map(tuple, probes)):
+            groups.setdefault(probe, []).append(q)
+        for probe, group in groups.items():
+            candidates = self._members(probe)
+            scores = queries[group] @ self.vectors[candidates].T
+            top = min(k, len(candidates))
+            best = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+            best_scores = np.take_along_axis(scores, best, axis=1)
+            ranking = np.argsort(-best_scores, axis=1)
+            similarities[group, :top] = np.take_along_axis(best_scores, ranking, axis=1)
+            ids[group, :top] = candidates[np.take_along_axis(best, ranking, axis=1)]
+        return similarities, ids
+
+    def near_pairs(self, threshold=0.95):
+        """(i, j, similarity) for every indexed pair above threshold (i < j), list by list"""
+        neighbour_lists = self._probe(self.centroids)
+        found_i, found_j, found_s = [], [], []
+        for l in range(len(self.centroids)):
+            members = self.order[self.offsets[l]:self.offsets[l + 1]]
+            if len(members) == 0:
+                continue
+            candidates = self._members(np.union1d(neighbour_lists[l], [l]))
+            scores = self.vectors[members] @ self.vectors[candidates].T
+            rows, cols = np.nonzero(scores >= threshold)
+            i, j = members[rows], candidates[cols]
+            keep = i < j
+            found_i.append(i[keep])
+            found_j.append(j[keep])
+            found_s.append(scores[rows, cols][keep])
+
+        if not found_i:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0, np.float32)
+        i, j, s = np.concatenate(found_i), np.concatenate(found_j), np.concatenate(found_s)
+        # A pair is found from both of its lists when they probe each other
+        _, unique = np.unique(i * len(self.vectors) + j, return_index=True)
+        return i[unique], j[unique], s[unique]
+
+    def save(self, path):
+        np.savez(path, centroids=self.centroids, order=self.order, offsets=self.offsets,
+                 vectors=self.vectors.astype(np.float16), nprobe=self.nprobe)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            index = cls(nlist=len(data['centroids']), nprobe=int(data['nprobe']))
+            index.centroids, index.order, index.offsets = data['centroids'], data['order'], data['offsets']
+            index.vectors = data['vectors'].astype(np.float32)
+        return index
+
+# ====================================================================
+# NEAR-DUPLICATE CLUSTERS
+# ====================================================================
+
+def connected_components(n, i, j):
+    """Component label per node for an undirected edge list (union-find)"""
+    parent = np.arange(n)
+
+    def find(x):
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    for a, b in zip(i.tolist(), j.tolist()):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+    return np.array([find(x) for x in range(n)])
+
+
+def load_splits(data_yaml, embedder, store_path=None, batch_size=32, workers=8):
+    """(paths, split name per path, vectors) for every split in the data yaml"""
+    with open(data_yaml, 'r') as f:
+        available = [s for s in SPLITS if yaml.safe_load(f).get(s)]
+    paths, splits = [], []
+    for split in available:
+        split_paths, _ = split_images(data_yaml, split)
+        paths += split_paths
+        splits += [split] * len(split_paths)
+
+    print(f"🧬 Embedding {len(paths)} images across {', '.join(available)}...")
+    embedded, vectors = compute_embeddings(paths, embedder, store_path, batch_size, workers)
+    split_of = dict(zip(paths, splits))
+    return embedded, np.array([split_of[p] for p in embedded]), vectors
+
+
+def find_leakage(paths, splits, vectors, threshold=0.95, nprobe=8):
+    """Near-duplicate clusters and the ones that cross splits"""
+    index = IVFIndex(nprobe=nprobe).build(vectors)
+    i, j, similarity = index.near_pairs(threshold)
+    components = connected_components(len(paths), i, j)
+
+    cross = splits[i] != splits[j]
+    pair_counts = {}
+    for a, b in zip(splits[i][cross], splits[j][cross]):
+        key = '/'.join(sorted((str(a), str(b)), key=SPLITS.index))
+        pair_counts[key] = pair_counts.get(key, 0) + 1
+
+    clusters = {}
+    for node in np.unique(np.concatenate([i, j])):
+        clusters.setdefault(int(components[node]), []).append(int(node))
+    leaking = {c: members for c, members in clusters.items() if len(set(splits[members])) > 1}
+
+    # Evaluation images with any near-duplicate in train
+    train_nodes = set(np.flatnonzero(splits == 'train').tolist())
+    contaminated = {}
+    for members in leaking.values():
+        if train_nodes.intersection(members):
+            for node in members:
+                if splits[node] != 'train':
+                    contaminated[str(splits[node])] = contaminated.get(str(splits[node]), 0) + 1
+
+    split_sizes = {s: int((splits == s).sum()) for s in SPLITS if (splits == s).any()}
+    order = np.argsort(-similarity[cross])[:20]
+    return {
+        'images': len(paths),
+        'threshold': threshold,
+        'near_duplicate_pairs': int(len(i)),
+        'cross_split_pairs': pair_counts,
+        'duplicate_clusters': len(clusters),
+        'leaking_clusters': len(leaking),
+        'contaminated_eval_images': {s: {'count': n, 'fraction': round(n / split_sizes[s], 4)}
+                                     for s, n in contaminated.items()},
+        'examples': [{'a': paths[a], 'b': paths[b], 'similarity': round(float(s), 4)}
+                     for a, b, s in zip(i[cross][order], j[cross][order], similarity[cross][order])]
+    }, components, leaking
+
+
+def resplit(paths, splits, leaking):
+    """New split per image: each leaking cluster goes wholly to its majority split (train on ties)"""
+    new_splits = splits.copy()
+    for members in leaking.values():
+        names, counts = np.unique(splits[members], return_counts=True)
+        winners = names[counts == counts.max()]
+        target = 'train' if 'train' in winners else sorted(winners, key=SPLITS.index)[0]
+        new_splits[members] = target
+    return new_splits
+
+
+def write_resplit(data_yaml, paths, new_splits, output_dir):
+    """Split list files plus a data yaml using them"""
+    output_dir = Path(output_dir).resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(data_yaml, 'r') as f:
+        data = yaml.safe_load(f)
+
+    for split in SPLITS:
+        members = [str(Path(p).resolve()) for p, s in zip(paths, new_splits) if s == split]
+        if not members and not data.get(split):
+            continue
+        with open(output_dir / f"{split}.txt", 'w') as f:
+            f.write('\n'.join(members) + '\n')
+        data[split] = str(output_dir / f"{split}.txt")
+    data['path'] = str(output_dir)
+
+    target = output_dir / 'data.yaml'
+    with open(target, 'w') as f:
+        yaml.safe_dump(data, f, sort_keys=False)
+    return target
+
+# ====================================================================
+# COMMAND LINE
+# ====================================================================
+
+def main():
+    """Leakage report or leak-free re-split for a YOLO dataset"""
+    parser = argparse.ArgumentParser(description="StudXchange near-duplicate leakage index")
+    parser.add_argument("command", choices=["report", "resplit"])
+    parser.add_argument("data", nargs="?", default="data.yaml")
+    parser.add_argument("--threshold", type=float, default=0.95, help="Cosine similarity for near-duplicates")
+    parser.add_argument("--nprobe", type=int, default=8, help="IVF lists scanned per query")
+    parser.add_argument("--model", default="studxchange_model.pt")
+    parser.add_argument("--backend", choices=["yolo", "thumb"], default="yolo")
+    parser.add_argument("--store", default=str(Path(EMBEDDING_DIR) / "dataset.npz"))
+    parser.add_argument("--output", default="data_resplit", help="resplit: directory for lists + data.yaml")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    paths, splits, vectors = load_splits(args.data, Embedder(args.model, args.backend), args.store,
+                                         args.batch_size, args.workers)
+    report, _, leaking = find_leakage(paths, splits, vectors, args.threshold, args.nprobe)
+
+    print(f"\n🕵️ {report['near_duplicate_pairs']} near-duplicate pairs in {report['images']} images, "
+          f"{report['leaking_clusters']} clusters cross splits")
+    for pair, count in report['cross_split_pairs'].items():
+        print(f"   {pair}: {count} pairs")
+    for split, info in report['contaminated_eval_images'].items():
+        print(f"   ⚠️  {split}: {info['count']} images ({info['fraction']:.1%}) have a near-duplicate in train")
+    for example in report['examples'][:5]:
+        print(f"   {example['similarity']:.3f}  {example['a']}  ↔  {example['b']}")
+
+    if args.command == "report":
+        with open('leakage_report.json', 'w') as f:
+            json.dump(report, f, indent=2)
+        print("📄 Report saved: leakage_report.json")
+        return
+
+    new_splits = resplit(paths, splits, leaking)
+    moved = int((new_splits != splits).sum())
+    target = write_resplit(args.data, paths, new_splits, args.output)
+    sizes = ', '.join(f"{s}={int((new_splits == s).sum())}" for s in SPLITS)
+    print(f"✅ Re-split moved {moved} images ({sizes}); train with: {target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+# 🚦 Load Testing - StudXchange Custom Model
+## Replay realistic upload traffic against the detector
+
+"""
+Open-loop load generator for capacity planning: how many mess owners can
+one Space instance serve?
+
+- arrivals follow a Poisson process, optionally with a lunch-hour burst
+  (a window where the rate is multiplied), generated up front so slow
+  responses never delay later arrivals
+- each request picks a plate image from a real corpus at a random size
+  (phone thumbnails up to full-res camera shots) and a random threshold;
+  with --batch-fraction some requests are sent on the batch lane so the
+  interactive p95 under background re-scoring can be checked
+- targets: the in-process StudXchangeFoodDetector, any HTTP deployment of
+  detection_api.py, or a stand-in server started locally with --serve
+- latency is measured from the scheduled arrival time, so queueing inside
+  an overloaded server shows up instead of being hidden
+
+The report has latency percentiles, throughput, error rate and a per-window
+timeline with RSS so memory growth over the run is visible.
+
+Usage:
+    python load_test.py --images data/plates --target inprocess --rate 2 --duration 120
+    python load_test.py --images data/plates --serve --pattern lunch --rate 1 --duration 600
+    python load_test.py --images data/plates --target http://space-host:8000 --rate 5
+"""
+
+import argparse
+import io
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from hardware_profile import probe_process_rss
+from inference_scheduler import BATCH, INTERACTIVE, InferenceScheduler
+from response_codec import decode_response
+
+# ====================================================================
+# CORPUS AND ARRIVALS
+# ====================================================================
+
+def load_corpus(image_dir, sizes=(640, 1280, 2560), limit=200, seed=0):
+    """Real plate images re-encoded at several long-side sizes"""
+    paths = sorted(p for p in Path(image_dir).rglob('*') if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+    if not paths:
+        raise FileNotFoundError(f"No images found in {image_dir}")
+    random.Random(seed).shuffle(paths)
+
+    corpus = []
+    for path in paths[:limit]:
+        image = Image.open(path).convert('RGB')
+        for size in sizes:
+            ratio = size / max(image.size)
+            resized = image.resize((max(1, round(image.width * ratio)), max(1, round(image.height * ratio))))
+            buffer = io.BytesIO()
+            resized.save(buffer, format='JPEG', quality=90)
+            corpus.append({'name': path.name, 'size': size, 'bytes': buffer.getvalue()})
+
+    print(f"🖼️  Corpus: {len(paths[:limit])} images x {len(sizes)} sizes")
+    return corpus
+
+
+def rate_at(t, duration, rate, pattern='poisson', burst_factor=4.0, burst_start=0.4, burst_length=0.2):
+    """Arrival rate (req/s) at offset t"""
+    if pattern == 'lunch' and burst_start * duration <= t < (burst_start + burst_length) * duration:
+        return rate * burst_factor
+    return rate
+
+
+def arrival_schedule(duration, rate, pattern='poisson', seed=0, **burst):
+    """Offsets (seconds) of every arrival, by thinning a Poisson process at the peak rate"""
+    rng = random.Random(seed)
+    peak = max(rate_at(t, duration, rate, pattern, **burst) for t in np.linspace(0, duration, 1000))
+    offsets = []
+    t = 0.0
+    while True:
+        t += rng.expovariate(peak)
+        if t >= duration:
+            return offsets
+        if rng.random() < rate_at(t, duration, rate, pattern, **burst) / peak:
+            offsets.append(t)
+
+# ====================================================================
+# TARGETS
+# ====================================================================
+
+class InProcessTarget:
+    """Calls StudXchangeFoodDetector.detect_food through the same scheduler as the API"""
+
+    name = "inprocess"
+
+    def __init__(self, detector):
+        self.scheduler = InferenceScheduler(detector)
+
+    def call(self, image_bytes, confidence_threshold, lane=INTERACTIVE):
+        image = Image.open(io.BytesIO(image_bytes))
+        result = self.scheduler.detect_food(image, confidence_threshold, lane=lane)
+        return result["success"], result.get("error")
+
+    def rss(self):
+        return probe_process_rss()
+
+
+class HTTPTarget:
+    """POSTs to a detection_api.py compatible endpoint"""
+
+    def __init__(self, base_url, timeout=60, accept=None):
+        self.base_url = base_url.rstrip('/')
+        self.name = self.base_url
+        self.timeout = timeout
+        self.accept = accept
+        self.class_tables = {}
+        self.table_id = None
+
+    def call(self, image_bytes, confidence_threshold, lane=INTERACTIVE):
+        headers = {"Content-Type": "image/jpeg", "X-Request-Class": lane}
+        if self.accept:
+            headers["Accept"] = self.accept
+        if self.table_id:
+            headers["X-Class-Table"] = self.table_id
+        request = urllib.request.Request(f"{self.base_url}/api/detect_food?conf={confidence_threshold}",
+                                         data=image_bytes, headers=headers, method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                payload = decode_response(response.read(), response.headers.get("Content-Type", "application/json"),
+                                          self.class_tables)
+                self.table_id = response.headers.get("X-Class-Table")
+        except urllib.error.HTTPError as e:
+            return False, f"HTTP {e.code}"
+        except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+            return False, type(e).__name__
+        return payload.get("status") == "success", payload.get("message")
+
+    def rss(self):
+        """Server RSS from /health (None if unavailable)"""
+        try:
+            with urllib.request.urlopen(f"{self.base_url}/health", timeout=5) as response:
+                return json.loads(response.read()).get("rss_bytes")
+        except Exception:
+            return None
+
+# ====================================================================
+# RUNNER
+# ====================================================================
+
+def run_load_test(target, corpus, schedule, thresholds=(0.25, 0.4, 0.5, 0.6), concurrency=64,
+                  sample_interval=1.0, seed=0, batch_fraction=0.0):
+    """Fire requests at their scheduled offsets; returns per-request records and RSS samples"""
+    rng = random.Random(seed)
+    plan = [(offset, rng.choice(corpus), rng.choice(thresholds),
+             BATCH if rng.random() < batch_fraction else INTERACTIVE) for offset in schedule]
+    records = []
+    records_lock = threading.Lock()
+    rss_samples = []
+    stop = threading.Event()
+
+    def sample_memory(start):
+        while not stop.is_set():
+            rss_samples.append((round(time.perf_counter() - start, 2), target.rss()))
+            stop.wait(sample_interval)
+
+    def fire(start, offset, item, conf, lane):
+        began = time.perf_counter()
+        try:
+            ok, error = target.call(item['bytes'], conf, lane)
+        except Exception as e:
+            ok, error = False, f"{type(e).__name__}: {e}"
+        done = time.perf_counter()
+        with records_lock:
+            records.append({
+                'offset': offset,
+                'latency': done - (start + offset),   # includes queueing
+                'service': done - began,
+                'ok': ok,
+                'error': error,
+                'size': item['size'],
+                'conf': conf,
+                'lane': lane
+            })
+
+    print(f"🚦 {len(plan)} requests over {schedule[-1] if schedule else 0:.0f}s against {target.name}")
+    start = time.perf_counter()
+    sampler = threading.Thread(target=sample_memory, args=(start,), daemon=True)
+    sampler.start()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for offset, item, conf, lane in plan:
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(fire, start, offset, item, conf, lane)
+
+    stop.set()
+    sampler.join()
+    rss_samples.append((round(time.perf_counter() - start, 2), target.rss()))
+    return records, rss_samples, time.perf_counter() - start
+
+# ====================================================================
+# REPORTING
+# ====================================================================
+
+def _percentiles(values):
+    if len(values) == 0:
+        return {}
+    values = np.asarray(values)
+    stats = {f"p{q}": round(float(np.percentile(values, q)), 4) for q in (50, 90, 95, 99)}
+    stats["max"] = round(float(values.max()), 4)
+    return stats
+
+
+def summarize(records, rss_samples, wall_seconds, window=10.0):
+    """Overall and per-window latency, throughput, errors and memory"""
+    ok = [r for r in records if r['ok']]
+    errors = {}
+    for r in records:
+        if not r['ok']:
+            errors[r['error']] = errors.get(r['error'], 0) + 1
+
+    timeline = []
+    horizon = max([r['offset'] for r in records] + [0.0])
+    for lo in np.arange(0, horizon + window, window):
+        in_window = [r for r in records if lo <= r['offset'] < lo + window]
+        if not in_window:
+            continue
+        rss = [v for t, v in rss_samples if lo <= t < lo + window and v is not None]
+        timeline.append({
+            'start': float(lo),
+            'requests': len(in_window),
+            'offered_rps': round(len(in_window) / window, 2),
+            'error_rate': round(sum(not r['ok'] for r in in_window) / len(in_window), 4),
+            'p95': _percentiles([r['latency'] for r in in_window if r['ok']]).get('p95'),
+            'rss_mb': round(max(rss) / 1e6, 1) if rss else None
+        })
+
+    by_size = {}
+    for size in sorted({r['size'] for r in records}):
+        by_size[size] = _percentiles([r['latency'] for r in ok if r['size'] == size])
+
+    by_lane = {}
+    for lane in sorted({r['lane'] for r in records}):
+        by_lane[lane] = _percentiles([r['latency'] for r in ok if r['lane'] == lane])
+
+    rss_values = [v for _, v in rss_samples if v is not None]
+    return {
+        'requests': len(records),
+        'succeeded': len(ok),
+        'error_rate': round(1 - len(ok) / len(records), 4) if records else 0.0,
+        'errors': errors,
+        'throughput_rps': round(len(ok) / wall_seconds, 2) if wall_seconds else 0.0,
+        'latency': _percentiles([r['latency'] for r in ok]),
+        'service_time': _percentiles([r['service'] for r in ok]),
+        'latency_by_size': by_size,
+        'latency_by_lane': by_lane,
+        'rss_start_mb': round(rss_values[0] / 1e6, 1) if rss_values else None,
+        'rss_end_mb': round(rss_values[-1] / 1e6, 1) if rss_values else None,
+        'rss_peak_mb': round(max(rss_values) / 1e6, 1) if rss_values else None,
+        'timeline': timeline
+    }
+
+
+def print_report(report):
+    """Human-readable summary"""
+    print("\n📊 LOAD TEST REPORT")
+    print("=" * 50)
+    print(f"Requests:    {report['requests']} ({report['succeeded']} ok, error rate {report['error_rate']:.1%})")
+    print(f"Throughput:  {report['throughput_rps']} req/s")
+    print(f"Latency:     {report['latency']}")
+    print(f"Service:     {report['service_time']}")
+    for size, stats in report['latency_by_size'].items():
+        print(f"   {size:>5}px   p95={stats.get('p95')}s")
+    for lane, stats in report['latency_by_lane'].items():
+        print(f"   {lane:<11} p95={stats.get('p95')}s")
+    print(f"RSS:         {report['rss_start_mb']} → {report['rss_end_mb']} MB (peak {report['rss_peak_mb']})")
+    for error, count in report['errors'].items():
+        print(f"❌ {error}: {count}")
+    print("\n  start  req/s  err%    p95    rss")
+    for w in report['timeline']:
+        print(f"  {w['start']:5.0f}  {w['offered_rps']:5.2f}  {w['error_rate']:5.1%}  "
+              f"{w['p95'] if w['p95'] is not None else '-':>6}  {w['rss_mb']}")
+
+# ====================================================================
+# COMMAND LINE
+# ====================================================================
+
+def main():
+    """Run a load test"""
+    parser = argparse.ArgumentParser(description="StudXchange load testing")
+    parser.add_argument("--images", required=True, help="Directory of real plate images")
+    parser.add_argument("--target", default="inprocess", help="'inprocess' or base URL of the API")
+    parser.add_argument("--serve", action="store_true", help="Start a local detection_api.py and target it")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--accept", help="Response encoding to request, e.g. application/x-msgpack")
+    parser.add_argument("--model", default="studxchange_model.pt")
+    parser.add_argument("--rate", type=float, default=1.0, help="Mean arrivals per second")
+    parser.add_argument("--duration", type=float, default=120)
+    parser.add_argument("--pattern", choices=["poisson", "lunch"], default="poisson")
+    parser.add_argument("--burst-factor", type=float, default=4.0)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[640, 1280, 2560])
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.25, 0.4, 0.5, 0.6])
+    parser.add_argument("--batch-fraction", type=float, default=0.0, help="Share of requests on the batch lane")
+    parser.add_argument("--concurrency", type=int, default=64, help="Max requests in flight")
+    parser.add_argument("--window", type=float, default=10.0, help="Timeline window in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.images, args.sizes, seed=args.seed)
+    schedule = arrival_schedule(args.duration, args.rate, args.pattern, seed=args.seed,
+                                burst_factor=args.burst_factor)
+
+    if args.serve or args.target == "inprocess":
+        from food_detector import StudXchangeFoodDetector
+        detector = StudXchangeFoodDetector(args.model)
+
+    if args.serve:
+        from detection_api import serve_in_background
+        serve_in_background(detector, port=args.port)
+        target = HTTPTarget(f"http://127.0.0.1:{args.port}", accept=args.accept)
+    elif args.target == "inprocess":
+        target = InProcessTarget(detector)
+    else:
+        target = HTTPTarget(args.target, accept=args.accept)
+
+    records, rss_samples, wall_seconds = run_load_test(target, corpus, schedule, args.thresholds,
+                                                       args.concurrency, seed=args.seed,
+                                                       batch_fraction=args.batch_fraction)
+    report = summarize(records, rss_samples, wall_seconds, args.window)
+    report['config'] = {k: v for k, v in vars(args).items() if k != 'images'}
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+# 🧠 Memory Guard - StudXchange Custom Model
+## Per-request memory ceiling, buffer pooling and leak detection
+
+"""
+Keeps the detection server's memory bounded over long uptimes.
+
+- `MemoryCeiling` estimates what a request will allocate (decoded array,
+  the model's BGR copy, the annotated image and the UI's output copy) and
+  downsizes or rejects images that would exceed the ceiling. JPEG uploads
+  that are still lazily opened are decoded at reduced scale (PIL draft)
+  so the full-resolution bitmap is never materialized.
+- `BufferPool` reuses the large decode buffers across requests instead of
+  allocating a fresh multi-megabyte array every time, which is what slowly
+  fragments the heap and ratchets RSS upwards.
+- `MemoryMonitor` samples RSS every N requests (and, with TRACEMALLOC=1,
+  diffs tracemalloc snapshots to point at the lines that keep growing).
+- `soak_test` hammers the detector and fails if steady-state RSS is not flat.
+
+Configuration (environment):
+    MAX_REQUEST_MB=192      per-request memory ceiling
+    MAX_IMAGE_SIDE=4096     hard cap on the long side, regardless of memory
+    MEMORY_POLICY=downsize  or 'reject'
+    MEMORY_SAMPLE_EVERY=100 RSS sample interval in requests
+    TRACEMALLOC=1           also record allocation growth by source line
+
+Usage:
+    python memory_guard.py soak --images data/plates --requests 2000
+"""
+
+import argparse
+import io
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from detector_metrics import PROCESS_RSS_BYTES
+from hardware_profile import probe_process_rss
+
+memory_logger = logging.getLogger("studxchange.memory")
+
+# Full-size copies of the image alive during one request
+COPIES_PER_REQUEST = 4
+POOL_ROUNDING = 1 << 20
+
+# ====================================================================
+# PER-REQUEST CEILING
+# ====================================================================
+
+class ImageTooLarge(ValueError):
+    """Raised when an image exceeds the memory ceiling and the policy is 'reject'"""
+
+
+class MemoryCeiling:
+    """Downsize or reject images whose processing would exceed a memory budget"""
+
+    def __init__(self, max_request_bytes=192 * 1024 * 1024, max_side=None, policy='downsize'):
+        if policy not in ('downsize', 'reject'):
+            raise ValueError(f"Unknown memory policy: {policy}")
+        self.max_request_bytes = max_request_bytes
+        self.max_side = max_side
+        self.policy = policy
+
+    @classmethod
+    def from_env(cls):
+        max_side = os.environ.get("MAX_IMAGE_SIDE")
+        return cls(max_request_bytes=int(float(os.environ.get("MAX_REQUEST_MB", 192)) * 1024 * 1024),
+                   max_side=int(max_side) if max_side else None,
+                   policy=os.environ.get("MEMORY_POLICY", "downsize"))
+
+    def estimate(self, width, height, channels=3):
+        """Bytes one request allocates for an image of this size"""
+        return width * height * channels * COPIES_PER_REQUEST
+
+    def target_scale(self, width, height):
+        """Largest scale <= 1 that fits both the memory budget and max_side"""
+        scale = min(1.0, math.sqrt(self.max_request_bytes / max(self.estimate(width, height), 1)))
+        if self.max_side:
+            scale = min(scale, self.max_side / max(width, height))
+        return scale
+
+    def apply(self, image, pool=None):
+        """Return (uint8 array, scale) for a PIL image or array, within the ceiling"""
+        is_pil = isinstance(image, Image.Image)
+        width, height = image.size if is_pil else (image.shape[1], image.shape[0])
+        scale = self.target_scale(width, height)
+
+        if scale < 1.0 and self.policy == 'reject':
+            raise ImageTooLarge(f"Image {width}x{height} needs ~{self.estimate(width, height) / 1e6:.0f} MB, "
+                                f"over the {self.max_request_bytes / 1e6:.0f} MB limit")
+
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        if is_pil:
+            if scale < 1.0:
+                image.draft('RGB', size)  # JPEG: decode at 1/2, 1/4 or 1/8 scale when possible
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            source = np.asarray(image)
+        else:
+            source = image
+
+        if scale >= 1.0:
+            if not is_pil:
+                return image, 1.0
+            array = pool.acquire(source.shape) if pool is not None else np.empty(source.shape, np.uint8)
+            np.copyto(array, source)
+            return array, 1.0
+
+        shape = (size[1], size[0]) + source.shape[2:]
+        array = pool.acquire(shape) if pool is not None else np.empty(shape, np.uint8)
+        cv2.resize(source, size, dst=array, interpolation=cv2.INTER_AREA)
+        return array, size[0] / width
+
+# ====================================================================
+# BUFFER POOL
+# ====================================================================
+
+class BufferPool:
+    """Reuses large uint8 buffers; arrays handed out are views of pooled storage"""
+
+    def __init__(self, max_buffers=4, max_bytes=512 * 1024 * 1024):
+        self.max_buffers = max_buffers
+        self.max_bytes = max_bytes
+        self.free = []
+        self.owned = set()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self, shape, dtype=np.uint8):
+        """A writable array of `shape`, backed by a pooled buffer when one is big enough"""
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with self.lock:
+            fitting = [b for b in self.free if b.nbytes >= nbytes]
+            if fitting:
+                buffer = min(fitting, key=lambda b: b.nbytes)
+                self.free.remove(buffer)
+                self.hits += 1
+            else:
+                buffer = np.empty(-(-nbytes // POOL_ROUNDING) * POOL_ROUNDING, np.uint8)
+                self.owned.add(id(buffer))
+                self.misses += 1
+        return buffer[:nbytes].view(dtype).reshape(shape)
+
+    def release(self, array):
+        """Return an array from acquire(); anything else is ignored"""
+        buffer = array.base if array.base is not None else array
+        with self.lock:
+            if id(buffer) not in self.owned:
+                return
+            self.free.append(buffer)
+            # Keep the largest buffers within both limits
+            self.free.sort(key=lambda b: b.nbytes, reverse=True)
+            while self.free and (len(self.free) > self.max_buffers or
+                                 sum(b.nbytes for b in self.free) > self.max_bytes):
+                dropped = self.free.pop()
+                self.owned.discard(id(dropped))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'pooled_bytes': sum(b.nbytes for b in self.free)}
+
+# ====================================================================
+# RSS / TRACEMALLOC MONITORING
+# ====================================================================
+
+class MemoryMonitor:
+    """Samples RSS every N requests and optionally diffs tracemalloc snapshots"""
+
+    def __init__(self, every=100, trace_allocations=False, top=10, history=1000):
+        self.every = every
+        self.top = top
+        self.requests = 0
+        self.samples = deque(maxlen=history)
+        self.baseline = None
+        self.lock = threading.Lock()
+        if trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start(5)
+
+    @classmethod
+    def from_env(cls):
+        return cls(every=int(os.environ.get("MEMORY_SAMPLE_EVERY", 100)),
+                   trace_allocations=os.environ.get("TRACEMALLOC") == "1")
+
+    def tick(self):
+        """Call once per request"""
+        with self.lock:
+            self.requests += 1
+            due = self.requests % self.every == 0
+        if due:
+            self.sample()
+
+    def sample(self):
+        rss = probe_process_rss()
+        PROCESS_RSS_BYTES.set(rss)
+        entry = {'requests': self.requests, 'time': time.time(), 'rss_bytes': rss}
+
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__)])
+            if self.baseline is None:
+                self.baseline = snapshot
+            else:
+                entry['top_growth'] = [
+                    {'where': str(stat.traceback[0]), 'size_diff': stat.size_diff, 'count_diff': stat.count_diff}
+                    for stat in snapshot.compare_to(self.baseline, 'lineno')[:self.top] if stat.size_diff > 0
+                ]
+
+        self.samples.append(entry)
+        memory_logger.info(json.dumps({'event': 'memory', **entry}))
+        return entry
+
+# ====================================================================
+# SOAK TEST
+# ====================================================================
+
+def soak_test(detector, image_paths, requests=2000, warmup_fraction=0.2, tolerance_mb=32.0,
+              sample_every=50, confidence_threshold=0.5):
+    """Run many requests and check that post-warmup RSS stays flat"""
+    payloads = [Path(p).read_bytes() for p in image_paths]
+    if not payloads:
+        raise ValueError("Soak test needs at least one image")
+
+    monitor = MemoryMonitor(every=sample_every, trace_allocations=os.environ.get("TRACEMALLOC") == "1")
+    print(f"🧪 Soak test: {requests} requests over {len(payloads)} images")
+
+    errors = 0
+    for i in range(requests):
+        # Lazily opened, like an upload to the API
+        result = detector.detect_food(Image.open(io.BytesIO(payloads[i % len(payloads)])), confidence_threshold)
+        errors += not result["success"]
+        monitor.tick()
+
+    samples = list(monitor.samples)
+    steady = [s for s in samples if s['requests'] > warmup_fraction * requests]
+    if len(steady) < 2:
+        raise ValueError("Not enough post-warmup samples; lower sample_every or raise requests")
+
+    x = np.array([s['requests'] for s in steady], dtype=float)
+    rss_mb = np.array([s['rss_bytes'] for s in steady], dtype=float) / 1e6
+    slope, _ = np.polyfit(x, rss_mb, 1)
+    growth_mb = slope * (x[-1] - x[0])
+
+    report = {
+        'requests': requests,
+        'errors': errors,
+        'rss_start_mb': round(float(samples[0]['rss_bytes']) / 1e6, 1),
+        'rss_steady_start_mb': round(float(rss_mb[0]), 1),
+        'rss_end_mb': round(float(rss_mb[-1]), 1),
+        'steady_growth_mb': round(float(growth_mb), 2),
+        'mb_per_1000_requests': round(float(slope * 1000), 3),
+        'tolerance_mb': tolerance_mb,
+        'flat': bool(growth_mb <= tolerance_mb),
+        'top_growth': samples[-1].get('top_growth', [])
+    }
+    return report
+
+# ====================================================================
+# COMMAND LINE
+# ====================================================================
+
+def main():
+    """Soak-test the detector for memory growth"""
+    parser = argparse.ArgumentParser(description="StudXchange memory guard")
+    sub = parser.add_subparsers(dest="command", required=True)
+    soak = sub.add_parser("soak", help="Assert steady-state RSS stays flat")
+    soak.add_argument("--images", required=True)
+    soak.add_argument("--model", default="studxchange_model.pt")
+    soak.add_argument("--requests", type=int, default=2000)
+    soak.add_argument("--sample-every", type=int, default=50)
+    soak.add_argument("--warmup", type=float, default=0.2, help="Fraction of requests ignored as warmup")
+    soak.add_argument("--tolerance-mb", type=float, default=32.0)
+    args = parser.parse_args()
+
+    from food_detector import StudXchangeFoodDetector
+
+    paths = sorted(p for p in Path(args.images).rglob('*') if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+    report = soak_test(StudXchangeFoodDetector(args.model), paths, args.requests, args.warmup,
+                       args.tolerance_mb, args.sample_every)
+    print(json.dumps(report, indent=2))
+
+    if report['flat']:
+        print(f"✅ RSS flat: {report['steady_growth_mb']} MB growth after warmup")
+    else:
+        print(f"❌ RSS grew {report['steady_growth_mb']} MB after warmup (limit {args.tolerance_mb} MB)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
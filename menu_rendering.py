@@ -0,0 +1,255 @@
+# 🧾 Menu Rendering - StudXchange Custom Model
+## Precompiled per-dish templates and memoized menu output
+
+"""
+`create_menu_items` rebuilt every dict and ran `json.dumps(indent=2)` on
+each call, with the same "Fresh X prepared with authentic Indian spices"
+for every dish. Rendering now works from per-dish templates compiled once:
+
+- DESCRIPTIONS holds a description template per canonical dish (fields:
+  {name}, {quantity}); dishes without one use their category's template,
+  then DEFAULT_DESCRIPTION
+- `compile_dish` turns a dish into ready-made output fragments: the JSON
+  object prefix (compact and pretty) and the CSV row prefix, with the
+  description already rendered unless it depends on the quantity. Every
+  taxonomy dish is compiled at import; other names on first use
+- `render_menu(menu, fmt)` joins fragments with the per-item numbers for
+  COMPACT (API), PRETTY (UI, same text as json.dumps(indent=2)) or CSV
+  (bulk export), memoized on the aggregated detection set: the (name,
+  category, quantity, price, confidence) of every menu item
+- `export_csv` writes one CSV for many messes
+
+Usage:
+    from menu_rendering import PRETTY, render_menu
+    text = render_menu(aggregate_menu(results), PRETTY)
+
+    python menu_rendering.py menus.jsonl --csv menus.csv    # {"mess": ..., "menu": {...}} per line
+"""
+
+import argparse
+import csv
+import io
+import json
+import string
+import time
+from functools import lru_cache
+
+from taxonomy import TAXONOMY
+
+COMPACT = "json"
+PRETTY = "pretty"
+CSV = "csv"
+CSV_COLUMNS = ["name", "category", "description", "price", "quantity", "total", "is_available", "confidence"]
+RENDER_CACHE_SIZE = 4096
+
+DEFAULT_DESCRIPTION = "Fresh {name} prepared with authentic Indian spices"
+
+CATEGORY_DESCRIPTIONS = {
+    'breakfast': "{name}, made fresh for the morning mess",
+    'main_course': "Home-style {name}, cooked fresh for lunch and dinner",
+    'sides': "{name} to go with your meal",
+    'beverages': "Hot {name}, brewed fresh",
+    'snacks': "Crispy {name}, fried to order"
+}
+
+DESCRIPTIONS = {
+    'aloo_paratha': "Whole-wheat paratha stuffed with spiced potato, served with butter",
+    'plain_paratha': "Layered whole-wheat paratha roasted with ghee",
+    'poha': "Flattened rice with onion, peanuts, turmeric and curry leaves",
+    'upma': "Roasted semolina cooked with mustard seeds, vegetables and curry leaves",
+    'idli': "{quantity} steamed rice-and-lentil idli with sambar and chutney",
+    'dosa': "Crisp fermented rice-and-lentil crepe with sambar and chutney",
+    'bread_butter': "Toasted bread with butter",
+    'dal_tadka': "Yellow lentils tempered with ghee, cumin, garlic and red chilli",
+    'dal_fry': "Lentils simmered with onion, tomato and mild spices",
+    'rajma': "Red kidney beans in a slow-cooked onion-tomato gravy",
+    'chole': "Chickpeas in a tangy, spiced gravy",
+    'rice': "Steamed basmati rice",
+    'roti': "{quantity} soft whole-wheat roti, fresh off the tawa",
+    'aloo_sabzi': "Potatoes cooked dry with cumin, turmeric and coriander",
+    'bhindi_sabzi': "Okra stir-fried with onion and dry spices",
+    'paneer_butter_masala': "Cottage cheese in a rich tomato, butter and cream gravy",
+    'curd': "Chilled fresh curd",
+    'pickle': "Tangy homemade achaar",
+    'papad': "Roasted crisp papad",
+    'raita': "Curd whisked with cucumber, onion and roasted cumin",
+    'salad': "Sliced onion, cucumber, tomato and lemon",
+    'tea': "Masala chai brewed with milk, ginger and cardamom",
+    'coffee': "Hot milk coffee",
+    'samosa': "{quantity} crisp pastry filled with spiced potato and peas",
+    'pakora': "Vegetable fritters in spiced gram-flour batter"
+}
+
+# ====================================================================
+# TEMPLATE COMPILATION
+# ====================================================================
+
+def compile_template(template):
+    """Template -> (parts, uses quantity); unknown fields fail here, at startup, not per request"""
+    parts = []
+    uses_quantity = False
+    for literal, field, format_spec, conversion in string.Formatter().parse(template):
+        if literal:
+            parts.append(literal)
+        if field is None:
+            continue
+        if field not in ('name', 'quantity') or format_spec or conversion:
+            raise ValueError(f"Unsupported template field {{{field}}} in {template!r}")
+        uses_quantity |= field == 'quantity'
+        parts.append((field,))
+    return parts, uses_quantity
+
+
+def _fill(parts, name, quantity):
+    return ''.join(part if isinstance(part, str) else (name if part[0] == 'name' else str(quantity))
+                   for part in parts)
+
+
+def _csv_fields(*fields):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='').writerow(fields)
+    return buffer.getvalue()
+
+
+class DishTemplate:
+    """Output fragments for one dish, rendered once"""
+
+    def __init__(self, name, category):
+        dish = TAXONOMY.canonical(name)
+        template = DESCRIPTIONS.get(dish) or CATEGORY_DESCRIPTIONS.get(category, DEFAULT_DESCRIPTION)
+        self.name, self.category = name, category
+        self.parts, self.uses_quantity = compile_template(template)
+        self._fragments = {} if self.uses_quantity else None
+        self.static = None if self.uses_quantity else self._build(_fill(self.parts, name, 1))
+
+    def _build(self, description):
+        head = {'name': self.name, 'category': self.category, 'description': description}
+        return {
+            COMPACT: json.dumps(head, separators=(',', ':'))[:-1] + ',',
+            PRETTY: '  {\n' + ''.join(f'    {json.dumps(k)}: {json.dumps(v)},\n' for k, v in head.items()),
+            CSV: _csv_fields(self.name, self.category, description) + ','
+        }
+
+    def fragments(self, quantity):
+        if self.static is not None:
+            return self.static
+        fragments = self._fragments.get(quantity)
+        if fragments is None:
+            fragments = self._fragments[quantity] = self._build(_fill(self.parts, self.name, quantity))
+        return fragments
+
+    def description(self, quantity=1):
+        return _fill(self.parts, self.name, quantity)
+
+
+_compiled = {}
+
+
+def compile_dish(name, category):
+    """DishTemplate for a display name, compiled on first use"""
+    template = _compiled.get((name, category))
+    if template is None:
+        template = _compiled[(name, category)] = DishTemplate(name, category)
+    return template
+
+
+for _dish in TAXONOMY.dishes:
+    compile_dish(_dish.replace('_', ' ').title(), TAXONOMY.category_of[_dish])
+
+# ====================================================================
+# RENDERING
+# ====================================================================
+
+def menu_key(menu):
+    """The aggregated detection set a rendering depends on"""
+    return tuple((item['name'], item['category'], item['quantity'], item['unit_price'], item['confidence'])
+                 for item in menu['items'])
+
+
+def _item(fmt, name, category, quantity, price, confidence):
+    head = compile_dish(name, category).fragments(quantity)[fmt]
+    total = price * quantity
+    if fmt == COMPACT:
+        return (f'{head}"price":{json.dumps(price)},"quantity":{quantity},"total":{json.dumps(total)},'
+                f'"is_available":true,"confidence":{json.dumps(confidence)}}}')
+    if fmt == PRETTY:
+        return (f'{head}    "price": {json.dumps(price)},\n    "quantity": {quantity},\n'
+                f'    "total": {json.dumps(total)},\n    "is_available": true,\n'
+                f'    "confidence": {json.dumps(confidence)}\n  }}')
+    return f'{head}{price},{quantity},{total},true,{confidence}'
+
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def _render(key, fmt):
+    items = [_item(fmt, *fields) for fields in key]
+    if fmt == COMPACT:
+        return '[' + ','.join(items) + ']'
+    if fmt == PRETTY:
+        return '[\n' + ',\n'.join(items) + '\n]' if items else '[]'
+    return '\n'.join([','.join(CSV_COLUMNS)] + items) + '\n'
+
+
+def render_menu(menu, fmt=COMPACT):
+    """Menu items as compact JSON, pretty JSON or CSV text"""
+    if fmt not in (COMPACT, PRETTY, CSV):
+        raise ValueError(f"Unknown menu format: {fmt}")
+    return _render(menu_key(menu), fmt)
+
+
+def menu_items(menu):
+    """Menu items as dicts (same fields as the rendered output)"""
+    return [{
+        'name': item['name'],
+        'category': item['category'],
+        'description': compile_dish(item['name'], item['category']).description(item['quantity']),
+        'price': item['unit_price'],
+        'quantity': item['quantity'],
+        'total': item['total'],
+        'is_available': True,
+        'confidence': item['confidence']
+    } for item in menu['items']]
+
+
+def export_csv(menus, path):
+    """One CSV for {mess id: menu}; returns rows written"""
+    rows = 0
+    with open(path, 'w', newline='') as f:
+        f.write(','.join(['mess'] + CSV_COLUMNS) + '\n')
+        for mess, menu in menus.items():
+            body = render_menu(menu, CSV).split('\n', 1)[1]
+            if body:
+                prefix = _csv_fields(mess) + ','
+                f.write(''.join(prefix + line + '\n' for line in body.splitlines()))
+                rows += len(menu['items'])
+    return rows
+
+# ====================================================================
+# COMMAND LINE
+# ====================================================================
+
+def main():
+    """Bulk-render menus from a JSONL file"""
+    parser = argparse.ArgumentParser(description="StudXchange menu rendering")
+    parser.add_argument("menus", help='JSONL, one {"mess": id, "menu": aggregate_menu output} per line')
+    parser.add_argument("--csv", help="Write all menus to one CSV")
+    parser.add_argument("--json", help="Write {mess: compact menu items} JSON")
+    args = parser.parse_args()
+
+    with open(args.menus, 'r') as f:
+        menus = {str(record['mess']): record['menu'] for record in map(json.loads, filter(str.strip, f))}
+
+    start = time.perf_counter()
+    if args.csv:
+        rows = export_csv(menus, args.csv)
+        print(f"📄 {rows} menu rows for {len(menus)} messes → {args.csv}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            f.write('{' + ','.join(f'{json.dumps(mess)}:{render_menu(menu, COMPACT)}'
+                                   for mess, menu in menus.items()) + '}')
+        print(f"📄 {len(menus)} menus → {args.json}")
+    elapsed = time.perf_counter() - start
+    print(f"⏱️  {elapsed * 1000:.1f} ms total, {elapsed * 1000 / max(len(menus), 1):.3f} ms per menu")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+# 🗂️ Model Registry - StudXchange Custom Model
+## Versioned models with atomic hot-swap and shadow evaluation
+
+"""
+Serves whichever model version is active without restarting the Space.
+
+Layout (each version is a deployment folder from the training pipeline):
+
+    models/
+      registry.json                 {"active": ..., "shadow": ..., "shadow_rate": ...}
+      v1.0_kaggle_20250101_1200/
+        deployment_info.json
+        studxchange_model.pt
+        class_names.yaml
+
+- `activate()` loads and warms up the new version first, then swaps one
+  reference under a lock. In-flight requests keep the detector they started
+  with, so nothing is dropped and the old model is freed once they finish.
+- shadow mode runs a candidate on a sampled fraction of requests in a
+  background worker (never on the request path; skipped when the worker is
+  busy) and logs box agreement and latency deltas to studxchange.shadow.
+- the server polls registry.json, so the CLI below switches a running app.
+
+Usage:
+    python model_registry.py import deployment_kaggle
+    python model_registry.py list
+    python model_registry.py activate v1.0_kaggle_20250101_1200
+    python model_registry.py shadow v1.0_colab_20250105_0900 --rate 0.1
+    python model_registry.py shadow off
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from detector_metrics import RequestTrace, REGISTRY
+from geometry import box_iou
+
+shadow_logger = logging.getLogger("studxchange.shadow")
+
+CONTROL_FILE = "registry.json"
+MODEL_SWAPS_TOTAL = REGISTRY.counter(
+    "studx_model_swaps_total", "Active model changes", ("version",))
+SHADOW_COMPARISONS_TOTAL = REGISTRY.counter(
+    "studx_shadow_comparisons_total", "Shadow runs by outcome", ("candidate", "outcome"))
+
+# ====================================================================
+# VERSION DISCOVERY
+# ====================================================================
+
+def read_version(version_dir):
+    """Summary of one version folder from its deployment_info.json"""
+    version_dir = Path(version_dir)
+    with open(version_dir / 'deployment_info.json') as f:
+        info = json.load(f)
+    files = info.get('model_files', {})
+    metrics = info.get('performance_metrics', {})
+    return {
+        'version': version_dir.name,
+        'dir': str(version_dir),
+        'weights': str(version_dir / files.get('pytorch', 'studxchange_model.pt')),
+        'class_names': str(version_dir / files.get('class_names', 'class_names.yaml')),
+        'trained': info.get('model_info', {}).get('training_date'),
+        'architecture': info.get('model_info', {}).get('architecture'),
+        'mAP_50': metrics.get('mAP_50'),
+        'mAP_50_95': metrics.get('mAP_50_95')
+    }
+
+
+def import_version(source, root="models"):
+    """Copy a deployment folder (or its zip) into the registry; returns the version name"""
+    source = Path(source)
+    root = Path(root)
+    staging = root / f".import_{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    if source.suffix == '.zip':
+        with zipfile.ZipFile(source) as zipf:
+            zipf.extractall(staging)
+    else:
+        shutil.copytree(source, staging)
+
+    with open(staging / 'deployment_info.json') as f:
+        version = json.load(f).get('model_info', {}).get('version') or source.stem
+    name, n = version, 2
+    while (root / name).exists():
+        name, n = f"{version}_{n}", n + 1
+
+    os.replace(staging, root / name)
+    print(f"📥 Imported {source} as {name}")
+    return name
+
+
+def read_control(root="models"):
+    """Contents of registry.json ({} if missing)"""
+    path = Path(root) / CONTROL_FILE
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def update_control(root="models", **changes):
+    """Atomically merge `changes` into registry.json"""
+    path = Path(root) / CONTROL_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    control = {**read_control(root), **changes}
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(control, f, indent=2)
+    os.replace(tmp, path)
+    return control
+
+
+def detection_agreement(primary, candidate, iou_threshold=0.5):
+    """Fraction of detections matched by dish and IoU across both models (1.0 if both empty)"""
+    if not primary and not candidate:
+        return 1.0
+    if not primary or not candidate:
+        return 0.0
+
+    iou = box_iou(np.array([d['bbox'] for d in primary], dtype=np.float32),
+                  np.array([d['bbox'] for d in candidate], dtype=np.float32))
+    same_dish = np.array([[p['dish_name'] == c['dish_name'] for c in candidate] for p in primary])
+    scores = np.where(same_dish, iou, 0.0)
+
+    matched = 0
+    while scores.size and scores.max() >= iou_threshold:
+        i, j = np.unravel_index(scores.argmax(), scores.shape)
+        matched += 1
+        scores[i, :] = 0
+        scores[:, j] = 0
+    return 2 * matched / (len(primary) + len(candidate))
+
+# ====================================================================
+# REGISTRY
+# ====================================================================
+
+class ModelRegistry:
+    """Holds the active (and optional shadow) detector and swaps them atomically"""
+
+    def __init__(self, root="models", default_model_path="studxchange_model.pt", loader=None):
+        if loader is None:
+            from food_detector import StudXchangeFoodDetector
+            loader = StudXchangeFoodDetector
+        self.root = Path(root)
+        self.default_model_path = default_model_path
+        self.loader = loader
+        self.lock = threading.Lock()
+        self.active_version = None
+        self.active = None
+        self.previous_version = None
+        self.shadow_version = None
+        self.shadow = None
+        self.shadow_rate = 0.0
+        self.shadow_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        self.shadow_busy = threading.Semaphore(2)  # one running + one queued, the rest are skipped
+        self.control_mtime = None
+
+        control = read_control(self.root)
+        versions = {v['version'] for v in self.versions()}
+        initial = control.get('active') if control.get('active') in versions else None
+        if initial is None and versions:
+            initial = sorted(versions)[-1]
+        self.activate(initial, persist=False)
+        if control.get('shadow') in versions:
+            self.set_shadow(control['shadow'], control.get('shadow_rate', 0.1), persist=False)
+
+    @classmethod
+    def from_env(cls, default_model_path="studxchange_model.pt"):
+        return cls(os.environ.get("MODEL_REGISTRY", "models"), default_model_path)
+
+    def versions(self):
+        if not self.root.exists():
+            return []
+        return [read_version(d) for d in sorted(self.root.iterdir())
+                if d.is_dir() and not d.name.startswith('.') and (d / 'deployment_info.json').exists()]
+
+    def load(self, version):
+        """Load and warm up a version; None loads the default model outside the registry"""
+        if version is None:
+            detector = self.loader(self.default_model_path)
+        else:
+            info = read_version(self.root / version)
+            detector = self.loader(info['weights'], info['class_names'])
+
+        # First call pays for CUDA context / graph setup; keep that off live traffic
+        detector.detect_food(np.zeros((64, 64, 3), dtype=np.uint8), 0.5, trace=RequestTrace("warmup"))
+        return detector
+
+    def poll_control(self):
+        """Apply registry.json changes made by the CLI"""
+        path = self.root / CONTROL_FILE
+        if not path.exists() or path.stat().st_mtime == self.control_mtime:
+            return
+        self.control_mtime = path.stat().st_mtime
+        control = read_control(self.root)
+
+        if control.get('active') and control['active'] != self.active_version:
+            self.activate(control['active'], persist=False)
+        if control.get('shadow') != self.shadow_version or control.get('shadow_rate', 0.0) != self.shadow_rate:
+            self.set_shadow(control.get('shadow'), control.get('shadow_rate', 0.0), persist=False)
+
+    def watch(self, interval=10.0):
+        """Poll registry.json from a daemon thread"""
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.poll_control()
+                except Exception as e:
+                    print(f"⚠️  Registry update failed: {e}")
+
+        threading.Thread(target=loop, daemon=True, name="model-registry").start()
+
+    def activate(self, version, persist=True):
+        """Load `version`, then atomically make it the active model"""
+        detector = self.shadow if version is not None and version == self.shadow_version else self.load(version)
+        with self.lock:
+            self.previous_version = self.active_version
+            self.active_version, self.active = version, detector
+        MODEL_SWAPS_TOTAL.inc(version=version or 'default')
+        if persist:
+            update_control(self.root, active=version)
+        print(f"🔁 Active model: {version or self.default_model_path}")
+
+    def rollback(self):
+        if self.previous_version is None:
+            raise ValueError("No previous version to roll back to")
+        self.activate(self.previous_version)
+
+    def set_shadow(self, version, rate=0.1, persist=True):
+        """Run `version` on a `rate` fraction of traffic off the request path (None disables)"""
+        detector = self.load(version) if version else None
+        with self.lock:
+            self.shadow_version, self.shadow, self.shadow_rate = version, detector, rate if version else 0.0
+        if persist:
+            update_control(self.root, shadow=version, shadow_rate=self.shadow_rate)
+        print(f"👥 Shadow model: {version or 'off'}" + (f" at {rate:.0%}" if version else ""))
+
+    def active_detector(self):
+        """The detector to use for one whole request (hold on to it, don't re-fetch)"""
+        with self.lock:
+            return self.active
+
+    @property
+    def model_path(self):
+        return self.active_detector().model_path
+
+    def detect_food(self, image, confidence_threshold=0.5, trace=None):
+        """detect_food on the active model, sampling the request into shadow mode"""
+        with self.lock:
+            active, active_version = self.active, self.active_version
+            shadow, shadow_version, shadow_rate = self.shadow, self.shadow_version, self.shadow_rate
+
+        # The shadow gets its own copy of the pixels (the active model may consume a lazy PIL image)
+        shadow_input = None
+        if shadow is not None and random.random() < shadow_rate and self.shadow_busy.acquire(blocking=False):
+            try:
+                shadow_input = image.copy()
+            except Exception:
+                self.shadow_busy.release()
+
+        result = active.detect_food(image, confidence_threshold, trace=trace)
+        if trace is not None:
+            trace.fields["model_version"] = active_version
+
+        if shadow_input is not None:
+            request_id = trace.request_id if trace is not None else None
+            self.shadow_pool.submit(self._run_shadow, shadow, shadow_version, active_version,
+                                    shadow_input, confidence_threshold, result, request_id)
+        return result
+
+    def detect_food_batch(self, images, confidence_threshold=0.5, traces=None, annotate=False):
+        """detect_food_batch on the active model (bulk requests are not shadow-sampled)"""
+        with self.lock:
+            active, active_version = self.active, self.active_version
+        for trace in traces or []:
+            trace.fields["model_version"] = active_version
+        return active.detect_food_batch(images, confidence_threshold, traces=traces, annotate=annotate)
+
+    def _run_shadow(self, shadow, shadow_version, active_version, image, confidence_threshold,
+                    primary, request_id):
+        try:
+            shadow_trace = RequestTrace("shadow")
+            candidate = shadow.detect_food(image, confidence_threshold, trace=shadow_trace)
+            if not candidate["success"] or not primary["success"]:
+                SHADOW_COMPARISONS_TOTAL.inc(candidate=shadow_version, outcome="error")
+                return
+
+            agreement = detection_agreement(primary["detections"], candidate["detections"])
+            SHADOW_COMPARISONS_TOTAL.inc(candidate=shadow_version,
+                                         outcome="agree" if agreement == 1.0 else "disagree")
+            shadow_logger.info(json.dumps({
+                "event": "shadow",
+                "request_id": request_id,
+                "active": active_version,
+                "candidate": shadow_version,
+                "agreement": round(agreement, 4),
+                "active_dishes": sorted(d["dish_name"] for d in primary["detections"]),
+                "candidate_dishes": sorted(d["dish_name"] for d in candidate["detections"]),
+                "active_seconds": primary["inference_time"],
+                "candidate_seconds": candidate["inference_time"],
+                "latency_delta": round(candidate["inference_time"] - primary["inference_time"], 4)
+            }))
+        except Exception as e:
+            SHADOW_COMPARISONS_TOTAL.inc(candidate=shadow_version, outcome="error")
+            print(f"⚠️  Shadow run failed: {e}")
+        finally:
+            self.shadow_busy.release()
+
+# ====================================================================
+# COMMAND LINE
+# ====================================================================
+
+def main():
+    """Manage registry versions; a running app picks up changes from registry.json"""
+    parser = argparse.ArgumentParser(description="StudXchange model registry")
+    parser.add_argument("--root", default=os.environ.get("MODEL_REGISTRY", "models"))
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="List versions")
+    import_cmd = sub.add_parser("import", help="Add a deployment folder or zip")
+    import_cmd.add_argument("source")
+    activate = sub.add_parser("activate", help="Make a version active")
+    activate.add_argument("version")
+    shadow = sub.add_parser("shadow", help="Shadow a version, or 'off'")
+    shadow.add_argument("version")
+    shadow.add_argument("--rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    root = Path(args.root)
+    root.mkdir(parents=True, exist_ok=True)
+    control = read_control(root)
+    versions = {d.name for d in root.iterdir() if not d.name.startswith('.') and (d / 'deployment_info.json').exists()}
+
+    if args.command == "list":
+        for d in sorted(versions):
+            v = read_version(root / d)
+            marks = ("*" if d == control.get('active') else " ") + ("s" if d == control.get('shadow') else " ")
+            print(f"{marks} {v['version']:<40} mAP50={v['mAP_50']} mAP50-95={v['mAP_50_95']} {v['trained']}")
+
+    elif args.command == "import":
+        import_version(args.source, root)
+
+    elif args.command == "activate":
+        if args.version not in versions:
+            parser.error(f"Unknown version: {args.version}")
+        update_control(root, active=args.version)
+        print(f"🔁 {args.version} will be activated on the next registry poll")
+
+    elif args.command == "shadow":
+        if args.version == "off":
+            update_control(root, shadow=None, shadow_rate=0.0)
+            print("👥 Shadow mode off")
+        elif args.version not in versions:
+            parser.error(f"Unknown version: {args.version}")
+        else:
+            update_control(root, shadow=args.version, shadow_rate=args.rate)
+            print(f"👥 Shadowing {args.version} on {args.rate:.0%} of requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+# 🩺 Request Profiler - StudXchange Custom Model
+## Opt-in sampling profiler and slow-request capture for the detection app
+
+"""
+Low-overhead diagnostics for tail latency without attaching a debugger.
+
+- A fraction of requests (`sample_rate`) is stack-sampled from start to end
+- Any request still running after `slow_threshold` seconds starts being
+  sampled at that moment, and is captured when it finishes
+- Captured traces (collapsed call stacks with sample counts, stage timings,
+  image size, box count, backend) go to a bounded on-disk ring buffer
+
+One background thread does both the watchdog and the sampling, reading
+other threads' frames with sys._current_frames(), so idle cost is a 50 ms
+poll and un-sampled fast requests pay only a dict insert.
+
+Enable in the app with PROFILE_SAMPLE_RATE=0.02 and/or SLOW_REQUEST_SECONDS=2.
+
+CLI:
+    python request_profiler.py list
+    python request_profiler.py show <trace_id>
+    python request_profiler.py export traces.zip
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zipfile
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+
+DEFAULT_TRACE_DIR = "profiles"
+
+# ====================================================================
+# ON-DISK RING BUFFER
+# ====================================================================
+
+class TraceRingBuffer:
+    """Keeps the newest `capacity` traces as JSON files"""
+
+    def __init__(self, directory=DEFAULT_TRACE_DIR, capacity=200):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.capacity = capacity
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        trace_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{record['request_id']}"
+        record['trace_id'] = trace_id
+        path = self.directory / f"trace_{trace_id}.json"
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(record, f)
+        with self.lock:
+            os.replace(tmp, path)
+            existing = sorted(self.directory.glob('trace_*.json'))
+            for old in existing[:max(0, len(existing) - self.capacity)]:
+                old.unlink(missing_ok=True)
+        return trace_id
+
+    def list(self):
+        """Summaries of stored traces, newest first"""
+        summaries = []
+        for path in sorted(self.directory.glob('trace_*.json'), reverse=True):
+            with open(path) as f:
+                record = json.load(f)
+            summaries.append({k: record.get(k) for k in
+                              ('trace_id', 'timestamp', 'latency', 'reason', 'image_size', 'boxes', 'backend')})
+        return summaries
+
+    def load(self, trace_id):
+        with open(self.directory / f"trace_{trace_id}.json") as f:
+            return json.load(f)
+
+    def export(self, zip_path, trace_ids=None):
+        """Zip selected (or all) traces for download"""
+        paths = sorted(self.directory.glob('trace_*.json'))
+        if trace_ids:
+            wanted = {f"trace_{t}.json" for t in trace_ids}
+            paths = [p for p in paths if p.name in wanted]
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            for path in paths:
+                zipf.write(path, path.name)
+        return str(zip_path)
+
+# ====================================================================
+# SAMPLING PROFILER
+# ====================================================================
+
+def _collapsed_stack(frame, limit=64):
+    """Render a frame chain as 'file:function:line;...' outermost first"""
+    parts = []
+    while frame is not None and len(parts) < limit:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ';'.join(reversed(parts))
+
+
+class _ActiveRequest:
+    __slots__ = ('trace', 'thread_id', 'started_at', 'sampling', 'sampled_from', 'stacks', 'done')
+
+    def __init__(self, trace, thread_id, sampling):
+        self.trace = trace
+        self.thread_id = thread_id
+        self.started_at = time.perf_counter()
+        self.sampling = sampling
+        self.sampled_from = 0.0 if sampling else None
+        self.stacks = Counter()
+        self.done = False
+
+
+class RequestProfiler:
+    """Sampling profiler + slow-request watchdog feeding a TraceRingBuffer"""
+
+    def __init__(self, sample_rate=0.0, slow_threshold=None, interval=0.005,
+                 trace_dir=DEFAULT_TRACE_DIR, capacity=200):
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.interval = interval
+        self.buffer = TraceRingBuffer(trace_dir, capacity)
+        self.active = {}
+        self.lock = threading.Lock()
+        self.enabled = sample_rate > 0 or slow_threshold is not None
+        if self.enabled:
+            threading.Thread(target=self._run, daemon=True, name="request-profiler").start()
+
+    @classmethod
+    def from_env(cls):
+        """Build from PROFILE_SAMPLE_RATE / SLOW_REQUEST_SECONDS / PROFILE_TRACE_DIR"""
+        slow = os.environ.get("SLOW_REQUEST_SECONDS")
+        return cls(sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", 0)),
+                   slow_threshold=float(slow) if slow else None,
+                   trace_dir=os.environ.get("PROFILE_TRACE_DIR", DEFAULT_TRACE_DIR))
+
+    def profile(self, trace):
+        """Context manager around one request (no-op when profiling is off)"""
+        if not self.enabled:
+            return nullcontext()
+        return self._profile(trace)
+
+    @contextmanager
+    def _profile(self, trace):
+        request = _ActiveRequest(trace, threading.get_ident(), random.random() < self.sample_rate)
+        with self.lock:
+            self.active[request.thread_id] = request
+        try:
+            yield
+        finally:
+            # The sampler may still hold this request from an earlier snapshot;
+            # once done is set under the lock it adds no more samples
+            with self.lock:
+                self.active.pop(request.thread_id, None)
+                request.done = True
+                stacks = dict(request.stacks.most_common(200))
+            self._maybe_capture(request, stacks)
+
+    def _run(self):
+        """Watchdog + sampler loop"""
+        while True:
+            now = time.perf_counter()
+            frames = None
+            with self.lock:
+                requests = list(self.active.values())
+
+            for request in requests:
+                elapsed = now - request.started_at
+                if not request.sampling and self.slow_threshold is not None and elapsed >= self.slow_threshold:
+                    request.sampling = True
+                    request.sampled_from = elapsed
+                if request.sampling:
+                    frames = frames if frames is not None else sys._current_frames()
+                    frame = frames.get(request.thread_id)
+                    if frame is not None:
+                        stack = _collapsed_stack(frame)
+                        with self.lock:
+                            if not request.done:
+                                request.stacks[stack] += 1
+
+            time.sleep(self.interval if any(r.sampling for r in requests) else 0.05)
+
+    def _maybe_capture(self, request, stacks):
+        latency = time.perf_counter() - request.started_at
+        slow = self.slow_threshold is not None and latency >= self.slow_threshold
+        if not slow and not (request.sampling and request.sampled_from == 0.0):
+            return
+
+        trace = request.trace
+        self.buffer.write({
+            'request_id': trace.request_id,
+            'timestamp': datetime.now().isoformat(),
+            'endpoint': trace.endpoint,
+            'reason': 'slow' if slow else 'sampled',
+            'latency': round(latency, 4),
+            'stages': {k: round(v, 6) for k, v in trace.stages.items()},
+            'image_size': trace.fields.get('image_size'),
+            'boxes': trace.fields.get('boxes'),
+            'backend': trace.fields.get('backend'),
+            'status': trace.status,
+            'sampling_interval': self.interval,
+            'sampled_from_seconds': request.sampled_from,
+            'stacks': stacks
+        })
+
+# ====================================================================
+# COMMAND LINE
+# ====================================================================
+
+def main():
+    """List, inspect and export captured traces"""
+    parser = argparse.ArgumentParser(description="StudXchange request traces")
+    parser.add_argument("--dir", default=os.environ.get("PROFILE_TRACE_DIR", DEFAULT_TRACE_DIR))
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="List captured traces")
+    show = sub.add_parser("show", help="Print one trace with its hottest stacks")
+    show.add_argument("trace_id")
+    show.add_argument("--top", type=int, default=15)
+    export = sub.add_parser("export", help="Zip traces for download")
+    export.add_argument("output")
+    export.add_argument("trace_ids", nargs="*")
+    args = parser.parse_args()
+
+    buffer = TraceRingBuffer(args.dir)
+
+    if args.command == "list":
+        for t in buffer.list():
+            print(f"{t['trace_id']}  {t['reason']:<7} {t['latency']:>7.3f}s  "
+                  f"size={t['image_size']} boxes={t['boxes']} backend={t['backend']}")
+
+    elif args.command == "show":
+        record = buffer.load(args.trace_id)
+        print(f"🩺 {record['trace_id']} ({record['reason']}, {record['latency']}s, {record['status']})")
+        print(f"   image={record['image_size']} boxes={record['boxes']} backend={record['backend']}")
+        for stage, seconds in record['stages'].items():
+            print(f"   {stage:<12} {seconds * 1000:8.1f} ms")
+        total = sum(record['stacks'].values()) or 1
+        print(f"\n🔥 Hottest stacks ({total} samples):")
+        for stack, count in list(record['stacks'].items())[:args.top]:
+            print(f"   {count / total:6.1%}  {stack.split(';')[-1]}")
+            print(f"           {stack}")
+
+    elif args.command == "export":
+        print(f"📦 Exported: {buffer.export(args.output, args.trace_ids)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# 🗜️ Response Codec - StudXchange Custom Model
+## Compact columnar encodings for detection API responses
+
+"""
+JSON with one dict per detection (float bboxes, repeated dish names and
+categories) is the default and stays that way. Batch clients can ask for a
+compact columnar encoding with the Accept header:
+
+    Accept: application/x-msgpack          msgpack map (needs `pip install msgpack`)
+    Accept: application/x-studx-columnar   raw buffer readable with np.frombuffer:
+                                           <u4 meta length, meta JSON, boxes, class_ids, conf
+
+Both carry the same columns:
+
+    class_ids  uint8 (uint16 for >255 classes)   one per detection
+    boxes      int16, shape (N, 4)               x1, y1, x2, y2 in whole pixels
+    conf       uint8                             round(confidence * 255)
+
+plus a class table {class_id: [dish_name, category, price]} identified by
+`table_id`. Clients that send `X-Class-Table: <table_id>` back get responses
+without the table, so it crosses the wire once per client.
+"""
+
+import hashlib
+import json
+import struct
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/x-msgpack"
+COLUMNAR = "application/x-studx-columnar"
+CODEC_VERSION = 1
+
+# ====================================================================
+# CONTENT NEGOTIATION
+# ====================================================================
+
+def supported_types():
+    return [JSON, COLUMNAR] + ([MSGPACK] if msgpack is not None else [])
+
+
+def negotiate(accept_header):
+    """Best supported media type for an Accept header (JSON when nothing better matches)"""
+    if not accept_header:
+        return JSON
+
+    aliases = {"application/msgpack": MSGPACK, "application/vnd.msgpack": MSGPACK}
+    supported = supported_types()
+    candidates = []
+    for position, part in enumerate(accept_header.split(',')):
+        fields = [f.strip() for f in part.split(';')]
+        media_type = aliases.get(fields[0].lower(), fields[0].lower())
+        quality = 1.0
+        for field in fields[1:]:
+            if field.startswith('q='):
+                try:
+                    quality = float(field[2:])
+                except ValueError:
+                    quality = 0.0
+        if media_type in supported and quality > 0:
+            candidates.append((-quality, position, media_type))
+    return min(candidates)[2] if candidates else JSON
+
+# ====================================================================
+# CLASS TABLE
+# ====================================================================
+
+def class_table(detector):
+    """{class_id: [dish_name, category, price]} for every class the detector knows"""
+    table = {}
+    for class_id, name in sorted(detector.dish_names.items()):
+        table[int(class_id)] = [name.replace('_', ' ').title(), detector.get_dish_category(name),
+                                detector.estimate_price(name)]
+    return table
+
+
+def table_id(table):
+    return hashlib.blake2b(json.dumps(table, sort_keys=True).encode(), digest_size=8).hexdigest()
+
+# ====================================================================
+# ENCODING
+# ====================================================================
+
+def to_columns(detections, num_classes):
+    """Quantized column arrays from detect_food detection dicts"""
+    id_dtype = np.uint8 if num_classes <= 256 else np.uint16
+    if not detections:
+        return (np.zeros(0, id_dtype), np.zeros((0, 4), np.int16), np.zeros(0, np.uint8))
+
+    class_ids = np.array([d['class_id'] for d in detections], dtype=np.int64)
+    if class_ids.min() < 0 or class_ids.max() >= num_classes:
+        # Would wrap around in the unsigned column (-1 -> 255) and decode as another dish
+        raise ValueError(f"class id outside the {num_classes}-entry class table: {class_ids.tolist()}")
+    class_ids = class_ids.astype(id_dtype)
+    boxes = np.clip(np.rint([d['bbox'] for d in detections]), -32768, 32767).astype(np.int16)
+    conf = np.rint(np.array([d['confidence'] for d in detections]) * 255).astype(np.uint8)
+    return class_ids, boxes, conf
+
+
+def encode_response(payload, media_type, table, client_table_id=None):
+    """Serialize a successful detection payload; returns (body bytes, content type)"""
+    if media_type == JSON:
+        return json.dumps(payload).encode(), JSON
+
+    class_ids, boxes, conf = to_columns(payload['detections'], len(table))
+    current_table_id = table_id(table)
+    meta = {
+        'v': CODEC_VERSION,
+        'status': payload['status'],
+        'model': payload.get('model'),
+        'inference_time': payload.get('inference_time'),
+        'n': int(len(class_ids)),
+        'table_id': current_table_id
+    }
+    if client_table_id != current_table_id:
+        meta['classes'] = {str(k): v for k, v in table.items()}
+
+    if media_type == MSGPACK:
+        meta.update({'class_ids': class_ids.tobytes(), 'id_dtype': class_ids.dtype.str,
+                     'boxes': boxes.astype('<i2').tobytes(), 'conf': conf.tobytes()})
+        return msgpack.packb(meta, use_bin_type=True), MSGPACK
+
+    meta['id_dtype'] = class_ids.dtype.str
+    meta_bytes = json.dumps(meta, separators=(',', ':')).encode()
+    body = b''.join([struct.pack('<I', len(meta_bytes)), meta_bytes,
+                     boxes.astype('<i2').tobytes(), class_ids.tobytes(), conf.tobytes()])
+    return body, COLUMNAR
+
+# ====================================================================
+# DECODING (CLIENT SIDE)
+# ====================================================================
+
+def decode_response(body, content_type, known_tables=None):
+    """Detections as dicts from any supported encoding
+
+    `known_tables` is a dict the caller keeps between calls; class tables are
+    stored there by table_id so later table-less responses can be expanded.
+    """
+    content_type = content_type.split(';')[0].strip()
+    if content_type == JSON:
+        return json.loads(body)
+
+    known_tables = known_tables if known_tables is not None else {}
+    if content_type == MSGPACK:
+        meta = msgpack.unpackb(body, raw=False)
+        class_ids = np.frombuffer(meta.pop('class_ids'), dtype=np.dtype(meta.pop('id_dtype')))
+        boxes = np.frombuffer(meta.pop('boxes'), dtype='<i2').reshape(-1, 4)
+        conf = np.frombuffer(meta.pop('conf'), dtype=np.uint8)
+    elif content_type == COLUMNAR:
+        meta_len = struct.unpack_from('<I', body)[0]
+        meta = json.loads(body[4:4 + meta_len])
+        n, offset = meta['n'], 4 + meta_len
+        id_dtype = np.dtype(meta['id_dtype'])
+        boxes = np.frombuffer(body, dtype='<i2', count=n * 4, offset=offset).reshape(-1, 4)
+        offset += n * 8
+        class_ids = np.frombuffer(body, dtype=id_dtype, count=n, offset=offset)
+        conf = np.frombuffer(body, dtype=np.uint8, count=n, offset=offset + n * id_dtype.itemsize)
+    else:
+        raise ValueError(f"Unsupported content type: {content_type}")
+
+    if 'classes' in meta:
+        known_tables[meta['table_id']] = meta['classes']
+    table = known_tables.get(meta['table_id'])
+    if table is None:
+        raise KeyError(f"Unknown class table {meta['table_id']}; resend without X-Class-Table")
+
+    detections = []
+    for class_id, box, c in zip(class_ids.tolist(), boxes.tolist(), conf.tolist()):
+        dish_name, category, price = table[str(class_id)]
+        detections.append({'class_id': class_id, 'dish_name': dish_name, 'confidence': round(c / 255, 3),
+                           'estimated_price': price, 'bbox': box, 'category': category})
+
+    return {'status': meta['status'], 'detections': detections, 'total_dishes': meta['n'],
+            'inference_time': meta['inference_time'], 'model': meta['model'], 'table_id': meta['table_id']}
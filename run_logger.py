@@ -0,0 +1,82 @@
+# 📝 Local Run Logger - StudXchange Custom Model
+## Offline stand-in for Weights & Biases experiment tracking
+
+"""
+Mirrors the small part of the wandb API the training scripts use
+(`init`, `log`, `summary`, `finish`) but writes everything to local files:
+
+    runs/<project>/<name>/config.json
+    runs/<project>/<name>/metrics.jsonl
+    runs/<project>/<name>/summary.json
+
+Pass `use_wandb=True` to also forward to wandb when it is installed and
+logged in, so nothing changes for runs that do have a wandb account.
+"""
+
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import wandb
+except ImportError:
+    wandb = None
+
+
+class LocalRunLogger:
+    """wandb-style run logger that writes JSON files under runs/"""
+
+    def __init__(self, project, name=None, config=None, root="runs", use_wandb=False):
+        self.project = project
+        self.name = name or datetime.now().strftime("run_%Y%m%d_%H%M%S")
+        self.config = dict(config or {})
+        self.run_dir = Path(root) / project / self.name
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        self.summary = {}
+        self.step = 0
+        self.started_at = time.time()
+
+        with open(self.run_dir / "config.json", 'w') as f:
+            json.dump(self.config, f, indent=2, default=str)
+        self.metrics_file = open(self.run_dir / "metrics.jsonl", 'a')
+
+        self.wandb_run = None
+        if use_wandb and wandb is not None:
+            self.wandb_run = wandb.init(project=project, name=self.name, config=self.config, reinit=True)
+
+    def log(self, metrics, step=None):
+        """Append one metrics row (like wandb.log)"""
+        self.step = self.step + 1 if step is None else step
+        row = {"step": self.step, "time": round(time.time() - self.started_at, 3), **metrics}
+        self.metrics_file.write(json.dumps(row, default=float) + '\n')
+        self.metrics_file.flush()
+        self.summary.update(metrics)
+
+        if self.wandb_run is not None:
+            self.wandb_run.log(metrics, step=self.step)
+
+    def finish(self):
+        """Write the summary and close the run (like wandb.finish)"""
+        self.summary["runtime_seconds"] = round(time.time() - self.started_at, 3)
+        with open(self.run_dir / "summary.json", 'w') as f:
+            json.dump(self.summary, f, indent=2, default=float)
+        self.metrics_file.close()
+
+        if self.wandb_run is not None:
+            self.wandb_run.finish()
+
+
+def read_runs(project, root="runs"):
+    """Load config and summary of every finished run in a project"""
+    runs = []
+    for run_dir in sorted((Path(root) / project).glob("*")):
+        summary_path = run_dir / "summary.json"
+        if not summary_path.exists():
+            continue
+        with open(run_dir / "config.json") as f:
+            config = json.load(f)
+        with open(summary_path) as f:
+            summary = json.load(f)
+        runs.append({"name": run_dir.name, "config": config, "summary": summary})
+    return runs
@@ -0,0 +1,266 @@
+# 🧩 Shared Model Weights - StudXchange Custom Model
+## Memory-mapped serving weights shared by every worker on a node
+
+"""
+`YOLO(model_path)` unpickles a private copy of every weight tensor, so N
+inference workers hold N copies. This module exports the fused serving
+weights once into a flat safetensors-layout file and loads them by mapping
+that file into memory: every worker reads the same page-cache pages, so
+resident weight memory stays near one copy regardless of worker count.
+
+- `export_shared_weights()` fuses Conv+BN (as serving always does) and writes
+  `weights.safetensors` (8-byte header length, JSON header, raw tensor data)
+  plus the model yaml and class names
+- `load_shared_model()` builds the network skeleton on the meta device (no
+  weight allocation), then `load_state_dict(..., assign=True)` points its
+  parameters at tensors backed by a copy-on-write mmap of the file
+- `ensure_shared_weights()` exports on first use, keyed by the checkpoint
+  hash, with an atomic rename so concurrent workers can race safely
+
+Only CPU serving shares pages; moving the model to a GPU copies it into each
+process's device memory as before.
+
+Enable in the app with SHARED_WEIGHTS=1.
+
+Usage:
+    python shared_weights.py export studxchange_model.pt
+    python shared_weights.py check studxchange_model.pt --workers 4
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import multiprocessing
+import os
+import shutil
+import struct
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+SHARED_CACHE_DIR = os.environ.get("SHARED_WEIGHTS_DIR", ".shared_weights")
+WEIGHTS_FILE = "weights.safetensors"
+
+# safetensors dtype names
+DTYPE_NAMES = {
+    'float64': 'F64', 'float32': 'F32', 'float16': 'F16', 'bfloat16': 'BF16',
+    'int64': 'I64', 'int32': 'I32', 'int16': 'I16', 'int8': 'I8', 'uint8': 'U8', 'bool': 'BOOL'
+}
+
+# ====================================================================
+# FLAT FILE FORMAT
+# ====================================================================
+
+def save_flat(tensors, path, metadata=None):
+    """Write a dict of tensors in the safetensors layout"""
+    # Widest dtypes first keeps every tensor naturally aligned without padding
+    names = sorted(tensors, key=lambda n: (-tensors[n].element_size(), n))
+
+    header = {'__metadata__': {k: str(v) for k, v in (metadata or {}).items()}}
+    offset = 0
+    for name in names:
+        t = tensors[name]
+        nbytes = t.numel() * t.element_size()
+        header[name] = {'dtype': DTYPE_NAMES[str(t.dtype).replace('torch.', '')],
+                        'shape': list(t.shape), 'data_offsets': [offset, offset + nbytes]}
+        offset += nbytes
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode()
+    header_bytes += b' ' * (-(8 + len(header_bytes)) % 8)
+
+    tmp = Path(path).with_suffix('.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        for name in names:
+            t = tensors[name].detach().cpu().contiguous().reshape(-1)
+            f.write(t.view(torch.uint8).numpy().tobytes())
+    os.replace(tmp, path)
+
+
+def read_header(path):
+    """(header dict, byte offset of the data section)"""
+    with open(path, 'rb') as f:
+        header_len = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(header_len))
+    return header, 8 + header_len
+
+
+def load_flat(path):
+    """Tensors backed by a copy-on-write mmap of `path` (pages shared until written)"""
+    header, data_start = read_header(path)
+    torch_dtypes = {v: getattr(torch, k) for k, v in DTYPE_NAMES.items()}
+
+    with open(path, 'rb') as f:
+        # ACCESS_COPY gives torch a writable buffer while reads stay on shared page-cache pages
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    tensors = {}
+    for name, spec in header.items():
+        if name == '__metadata__':
+            continue
+        dtype = torch_dtypes[spec['dtype']]
+        count = int(np.prod(spec['shape'])) if spec['shape'] else 1
+        if count == 0:
+            tensors[name] = torch.empty(spec['shape'], dtype=dtype)
+            continue
+        tensors[name] = torch.frombuffer(mapped, dtype=dtype, count=count,
+                                         offset=data_start + spec['data_offsets'][0]).reshape(spec['shape'])
+    return tensors, header.get('__metadata__', {})
+
+# ====================================================================
+# EXPORT / LOAD
+# ====================================================================
+
+def checkpoint_hash(model_path):
+    sha = hashlib.sha256()
+    with open(model_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()[:16]
+
+
+def export_shared_weights(model_path, output_dir):
+    """Fuse the checkpoint and write weights.safetensors, model.yaml and names.json"""
+    from ultralytics import YOLO
+
+    output_dir = Path(output_dir)
+    staging = output_dir.with_name(output_dir.name + f".tmp{os.getpid()}")
+    staging.mkdir(parents=True, exist_ok=True)
+
+    net = YOLO(model_path).model.float().eval()
+    net.fuse(verbose=False)
+
+    with open(staging / 'model.yaml', 'w') as f:
+        yaml.safe_dump(net.yaml, f, sort_keys=False)
+    with open(staging / 'names.json', 'w') as f:
+        json.dump({int(k): v for k, v in net.names.items()}, f)
+    save_flat(net.state_dict(), staging / WEIGHTS_FILE, metadata={
+        'source': os.path.basename(model_path),
+        'stride': json.dumps(net.stride.tolist()),
+        'fused': True
+    })
+
+    try:
+        os.replace(staging, output_dir)
+    except OSError:
+        # Another worker published first (os.replace can't replace a non-empty directory)
+        shutil.rmtree(staging, ignore_errors=True)
+        if not (output_dir / WEIGHTS_FILE).exists():
+            raise
+    print(f"🧩 Shared weights exported: {output_dir}")
+    return output_dir
+
+
+def ensure_shared_weights(model_path, cache_dir=SHARED_CACHE_DIR):
+    """Export once per checkpoint content; returns the shared weights directory"""
+    target = Path(cache_dir) / f"{Path(model_path).stem}_{checkpoint_hash(model_path)}"
+    if not (target / WEIGHTS_FILE).exists():
+        export_shared_weights(model_path, target)
+    return target
+
+
+def load_shared_model(shared_dir):
+    """A YOLO object whose weights live in the shared mmap"""
+    from ultralytics import YOLO
+
+    shared_dir = Path(shared_dir)
+    state, metadata = load_flat(shared_dir / WEIGHTS_FILE)
+    with open(shared_dir / 'names.json') as f:
+        names = {int(k): v for k, v in json.load(f).items()}
+
+    try:
+        # Skeleton without allocating weights; assign=True adopts the mmap tensors as parameters
+        with torch.device('meta'):
+            model = YOLO(str(shared_dir / 'model.yaml'), task='detect')
+            model.model.fuse(verbose=False)
+    except Exception:
+        model = YOLO(str(shared_dir / 'model.yaml'), task='detect')  # older torch: allocate, then drop
+        model.model.fuse(verbose=False)
+
+    net = model.model
+    net.load_state_dict(state, strict=True, assign=True)
+    stride = torch.tensor(json.loads(metadata['stride']), dtype=torch.float32)
+    net.stride = stride
+    net.model[-1].stride = stride
+    net.names = names
+    net.eval()
+    for p in net.parameters():
+        p.requires_grad_(False)
+    return model
+
+# ====================================================================
+# MULTI-WORKER CHECK
+# ====================================================================
+
+def _memory_rollup():
+    """Rss / Pss / shared-clean kB for this process (Linux)"""
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0].rstrip(':') in ('Rss', 'Pss', 'Shared_Clean', 'Private_Dirty'):
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return values
+
+
+def _worker(shared_dir, queue):
+    model = load_shared_model(shared_dir)
+    model(np.zeros((320, 320, 3), dtype=np.uint8), device='cpu', verbose=False)
+    queue.put({'pid': os.getpid(), **_memory_rollup()})
+
+
+def check_workers(model_path, workers=4):
+    """Load the shared weights in N processes and report per-process memory"""
+    shared_dir = ensure_shared_weights(model_path)
+    weights_mb = os.path.getsize(shared_dir / WEIGHTS_FILE) / 1e6
+
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    processes = [context.Process(target=_worker, args=(str(shared_dir), queue)) for _ in range(workers)]
+    for p in processes:
+        p.start()
+    reports = [queue.get() for _ in processes]
+    for p in processes:
+        p.join()
+
+    print(f"\n🧩 {workers} workers, weights file {weights_mb:.1f} MB")
+    for r in reports:
+        print(f"   pid {r['pid']}: Rss {r['Rss'] / 1e3:.0f} MB  Pss {r['Pss'] / 1e3:.0f} MB  "
+              f"shared {r['Shared_Clean'] / 1e3:.0f} MB")
+    return reports
+
+# ====================================================================
+# COMMAND LINE
+# ====================================================================
+
+def main():
+    """Export shared weights or check sharing across workers"""
+    parser = argparse.ArgumentParser(description="StudXchange shared model weights")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Write the mmap-able weights file")
+    export.add_argument("model", nargs="?", default="studxchange_model.pt")
+    export.add_argument("--output", help="Defaults to the shared cache directory")
+    check = sub.add_parser("check", help="Load in N processes and report memory")
+    check.add_argument("model", nargs="?", default="studxchange_model.pt")
+    check.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        if args.output:
+            export_shared_weights(args.model, args.output)
+        else:
+            ensure_shared_weights(args.model)
+    else:
+        check_workers(args.model, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+# 🎥 Streaming Food Detection - StudXchange Custom Model
+## Video and Live-Camera Detection with Keyframe Skipping and Tracking
+
+"""
+Runs the StudXchange detector over a video file or live camera instead of
+single still images. Inference only happens on keyframes picked by a cheap
+scene-change score; between keyframes the boxes are carried along by a
+lightweight IoU tracker that also compensates for camera panning. The result
+is one track per physical dish, so a 30-second pan over the serving counter
+produces a stable menu instead of hundreds of duplicate detections.
+
+Usage:
+    python streaming_detection.py counter_pan.mp4
+    python streaming_detection.py --camera 0 --show
+"""
+
+import argparse
+import math
+import time
+
+import cv2
+import numpy as np
+
+from geometry import box_iou
+
+# ====================================================================
+# FRAME SOURCES
+# ====================================================================
+
+def iter_video_frames(source, stride=1, max_frames=None):
+    """Yield (frame_index, timestamp, frame) tuples from a video file or camera index"""
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video source: {source}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_index = 0
+    emitted = 0
+
+    try:
+        while max_frames is None or emitted < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            if frame_index % stride == 0:
+                yield frame_index, frame_index / fps, frame
+                emitted += 1
+            frame_index += 1
+    finally:
+        cap.release()
+
+
+def video_fps(source):
+    """Read the nominal frame rate of a video source (defaults to 30)"""
+    cap = cv2.VideoCapture(source)
+    fps = cap.get(cv2.CAP_PROP_FPS) if cap.isOpened() else 0
+    cap.release()
+    return fps or 30.0
+
+# ====================================================================
+# SCENE CHANGE SCORING
+# ====================================================================
+
+class SceneChangeScorer:
+    """Cheap motion / scene-change score on downscaled grayscale thumbnails"""
+
+    def __init__(self, thumb_size=(96, 54)):
+        self.thumb_size = thumb_size
+
+    def thumbnail(self, frame):
+        """Downscale a BGR frame to a float32 grayscale thumbnail"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        small = cv2.resize(gray, self.thumb_size, interpolation=cv2.INTER_AREA)
+        return small.astype(np.float32)
+
+    def score(self, thumb, reference):
+        """Mean absolute difference between two thumbnails, in [0, 1]"""
+        if reference is None:
+            return 1.0
+        return float(np.mean(np.abs(thumb - reference)) / 255.0)
+
+    def global_shift(self, previous, current, frame_shape, min_response=0.1):
+        """Estimate the camera pan between two thumbnails in full-frame pixels"""
+        if previous is None:
+            return 0.0, 0.0
+
+        (dx, dy), response = cv2.phaseCorrelate(previous, current)
+        if response < min_response:
+            return 0.0, 0.0
+
+        scale_x = frame_shape[1] / self.thumb_size[0]
+        scale_y = frame_shape[0] / self.thumb_size[1]
+        return dx * scale_x, dy * scale_y
+
+# ====================================================================
+# IOU TRACKER
+# ====================================================================
+
+class Track:
+    """A single dish followed across frames"""
+
+    def __init__(self, track_id, box, class_id, confidence, frame_index, timestamp):
+        self.track_id = track_id
+        self.box = np.asarray(box, dtype=np.float32).copy()
+        self.class_votes = {class_id: confidence}
+        self.hits = 1
+        self.misses = 0
+        self.best_confidence = confidence
+        self.first_frame = frame_index
+        self.last_frame = frame_index
+        self.first_seen = timestamp
+
+    @property
+    def class_id(self):
+        """Class with the highest accumulated confidence"""
+        return max(self.class_votes, key=self.class_votes.get)
+
+    def shift(self, dx, dy):
+        """Move the box with the camera pan"""
+        self.box += np.array([dx, dy, dx, dy], dtype=np.float32)
+
+    def update(self, box, class_id, confidence, frame_index):
+        """Absorb a matched keyframe detection"""
+        self.box = np.asarray(box, dtype=np.float32).copy()
+        self.class_votes[class_id] = self.class_votes.get(class_id, 0.0) + confidence
+        self.best_confidence = max(self.best_confidence, confidence)
+        self.hits += 1
+        self.misses = 0
+        self.last_frame = frame_index
+
+
+class IoUTracker:
+    """Greedy IoU tracker run on keyframes, with pan compensation in between"""
+
+    def __init__(self, iou_threshold=0.3, min_hits=2, max_misses=3):
+        self.iou_threshold = iou_threshold
+        self.min_hits = min_hits
+        self.max_misses = max_misses
+        self.active = []
+        self.finished = []
+        self.next_id = 1
+
+    def shift(self, dx, dy, frame_shape):
+        """Carry every active track along with the camera and retire ones that left the frame"""
+        if dx == 0 and dy == 0:
+            return
+
+        height, width = frame_shape[:2]
+        still_visible = []
+        for track in self.active:
+            track.shift(dx, dy)
+            x1, y1, x2, y2 = track.box
+            if x2 <= 0 or y2 <= 0 or x1 >= width or y1 >= height:
+                self._retire(track)
+            else:
+                still_visible.append(track)
+        self.active = still_visible
+
+    def update(self, boxes, confidences, class_ids, frame_index, timestamp):
+        """Match keyframe detections to tracks, spawn new tracks and age unmatched ones"""
+        track_boxes = np.array([t.box for t in self.active], dtype=np.float32).reshape(-1, 4)
+        iou = box_iou(track_boxes, boxes)
+
+        matched_tracks = set()
+        matched_detections = set()
+        if iou.size:
+            for flat in np.argsort(-iou, axis=None):
+                t_idx, d_idx = np.unravel_index(flat, iou.shape)
+                if iou[t_idx, d_idx] < self.iou_threshold:
+                    break
+                if t_idx in matched_tracks or d_idx in matched_detections:
+                    continue
+                self.active[t_idx].update(boxes[d_idx], int(class_ids[d_idx]),
+                                          float(confidences[d_idx]), frame_index)
+                matched_tracks.add(t_idx)
+                matched_detections.add(d_idx)
+
+        survivors = []
+        for t_idx, track in enumerate(self.active):
+            if t_idx not in matched_tracks:
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    self._retire(track)
+                    continue
+            survivors.append(track)
+
+        for d_idx in range(len(boxes)):
+            if d_idx not in matched_detections:
+                survivors.append(Track(self.next_id, boxes[d_idx], int(class_ids[d_idx]),
+                                       float(confidences[d_idx]), frame_index, timestamp))
+                self.next_id += 1
+
+        self.active = survivors
+
+    def confirmed(self, include_finished=False):
+        """Tracks seen on at least `min_hits` keyframes"""
+        tracks = self.active + (self.finished if include_finished else [])
+        return [t for t in tracks if t.hits >= self.min_hits]
+
+    def _retire(self, track):
+        if track.hits >= self.min_hits:
+            self.finished.append(track)
+
+# ====================================================================
+# STREAMING DETECTOR
+# ====================================================================
+
+class StreamingFoodDetector:
+    """Keyframe-based streaming wrapper around StudXchangeFoodDetector"""
+
+    def __init__(self, detector, confidence_threshold=0.4, scene_change_threshold=0.08,
+                 min_keyframe_gap=3, max_keyframe_gap=15, inference_size=416,
+                 iou_threshold=0.3, min_hits=2, max_misses=3, fps=30.0):
+        self.detector = detector
+        self.confidence_threshold = confidence_threshold
+        self.scene_change_threshold = scene_change_threshold
+        self.min_keyframe_gap = min_keyframe_gap
+        self.max_keyframe_gap = max_keyframe_gap
+        self.inference_size = inference_size
+        self.fps = fps
+        self.scorer = SceneChangeScorer()
+        self.tracker_config = (iou_threshold, min_hits, max_misses)
+        self.reset()
+
+    def reset(self):
+        """Start a fresh session (new video or camera run)"""
+        self.tracker = IoUTracker(*self.tracker_config)
+        self.previous_thumb = None
+        self.keyframe_thumb = None
+        self.frames_since_keyframe = None
+        self.effective_min_gap = self.min_keyframe_gap
+        self.frame_count = 0
+        self.keyframe_count = 0
+        self.inference_seconds = 0.0
+        self.started_at = time.perf_counter()
+
+    def process_frame(self, frame, frame_index=None, timestamp=None):
+        """Process one BGR frame and return the tracks visible in it"""
+        frame_index = self.frame_count if frame_index is None else frame_index
+        timestamp = frame_index / self.fps if timestamp is None else timestamp
+        self.frame_count += 1
+
+        thumb = self.scorer.thumbnail(frame)
+        dx, dy = self.scorer.global_shift(self.previous_thumb, thumb, frame.shape)
+        self.tracker.shift(dx, dy, frame.shape)
+        self.previous_thumb = thumb
+
+        scene_change = self.scorer.score(thumb, self.keyframe_thumb)
+        is_keyframe = self._is_keyframe(scene_change)
+
+        if is_keyframe:
+            infer_start = time.perf_counter()
+            boxes, confidences, class_ids = self.detector.predict_arrays(
+                frame, self.confidence_threshold, imgsz=self.inference_size
+            )
+            infer_time = time.perf_counter() - infer_start
+
+            self.tracker.update(boxes, confidences, class_ids, frame_index, timestamp)
+            self.keyframe_thumb = thumb
+            self.frames_since_keyframe = 0
+            self.keyframe_count += 1
+            self.inference_seconds += infer_time
+
+            # Stay real-time: never schedule keyframes faster than inference can keep up
+            self.effective_min_gap = max(self.min_keyframe_gap, math.ceil(infer_time * self.fps))
+        else:
+            self.frames_since_keyframe += 1
+
+        return {
+            "frame_index": frame_index,
+            "timestamp": round(timestamp, 3),
+            "is_keyframe": is_keyframe,
+            "scene_change": round(scene_change, 4),
+            "tracks": [self._track_info(t) for t in self.tracker.confirmed()]
+        }
+
+    def stream(self, frames):
+        """Generator over frames (arrays or (index, timestamp, frame) tuples)"""
+        for item in frames:
+            if isinstance(item, tuple):
+                frame_index, timestamp, frame = item
+                yield self.process_frame(frame, frame_index, timestamp)
+            else:
+                yield self.process_frame(item)
+
+    def summarize(self):
+        """Per-dish counts from every confirmed track seen in the session"""
+        dishes = {}
+        for track in self.tracker.confirmed(include_finished=True):
+            dish_name = self.detector.dish_names.get(track.class_id, f"dish_{track.class_id}")
+            entry = dishes.setdefault(dish_name, {"count": 0, "confidence": 0.0, "first_seen": track.first_seen})
+            entry["count"] += 1
+            entry["confidence"] = max(entry["confidence"], round(track.best_confidence, 3))
+            entry["first_seen"] = min(entry["first_seen"], round(track.first_seen, 3))
+
+        elapsed = time.perf_counter() - self.started_at
+        return {
+            "dishes": dishes,
+            "total_dishes": sum(d["count"] for d in dishes.values()),
+            "frames": self.frame_count,
+            "keyframes": self.keyframe_count,
+            "keyframe_ratio": round(self.keyframe_count / max(self.frame_count, 1), 3),
+            "processing_fps": round(self.frame_count / max(elapsed, 1e-9), 1),
+            "inference_time": round(self.inference_seconds, 3)
+        }
+
+    def _is_keyframe(self, scene_change):
+        if self.frames_since_keyframe is None:
+            return True
+        if self.frames_since_keyframe + 1 < self.effective_min_gap:
+            return False
+        if self.frames_since_keyframe + 1 >= self.max_keyframe_gap:
+            return True
+        return scene_change >= self.scene_change_threshold
+
+    def _track_info(self, track):
+        class_id = track.class_id
+        return {
+            "track_id": track.track_id,
+            "dish_name": self.detector.dish_names.get(class_id, f"dish_{class_id}"),
+            "confidence": round(track.best_confidence, 3),
+            "bbox": [round(float(v), 1) for v in track.box]
+        }
+
+
+def draw_tracks(frame, frame_result):
+    """Overlay the current tracks on a BGR frame for live preview"""
+    for track in frame_result["tracks"]:
+        x1, y1, x2, y2 = [int(v) for v in track["bbox"]]
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(frame, f"#{track['track_id']} {track['dish_name']}", (x1, max(y1 - 8, 12)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+    return frame
+
+
+def detect_video(detector, source, **streaming_options):
+    """Run streaming detection over a whole video and return the session summary"""
+    streaming_options.setdefault("fps", video_fps(source))
+    streamer = StreamingFoodDetector(detector, **streaming_options)
+    for _ in streamer.stream(iter_video_frames(source)):
+        pass
+    return streamer.summarize()
+
+# ====================================================================
+# COMMAND LINE
+# ====================================================================
+
+def main():
+    """Stream a video file or camera through the detector and print the menu"""
+    parser = argparse.ArgumentParser(description="StudXchange streaming food detection")
+    parser.add_argument("video", nargs="?", help="Path to a video file")
+    parser.add_argument("--camera", type=int, help="Camera index for live capture")
+    parser.add_argument("--model", default="studxchange_model.pt")
+    parser.add_argument("--conf", type=float, default=0.4)
+    parser.add_argument("--imgsz", type=int, default=416)
+    parser.add_argument("--show", action="store_true", help="Display tracks in a window")
+    args = parser.parse_args()
+
+    if args.video is None and args.camera is None:
+        parser.error("Provide a video path or --camera")
+
+    from food_detector import StudXchangeFoodDetector
+
+    source = args.video if args.video is not None else args.camera
+    detector = StudXchangeFoodDetector(args.model)
+    streamer = StreamingFoodDetector(detector, confidence_threshold=args.conf,
+                                     inference_size=args.imgsz, fps=video_fps(source))
+
+    print(f"🎥 Streaming from: {source}")
+    for frame_index, timestamp, frame in iter_video_frames(source):
+        result = streamer.process_frame(frame, frame_index, timestamp)
+        if args.show:
+            cv2.imshow('StudXchange Streaming Detection', draw_tracks(frame, result))
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+
+    if args.show:
+        cv2.destroyAllWindows()
+
+    summary = streamer.summarize()
+    print(f"\n🍛 Menu from {summary['frames']} frames ({summary['keyframes']} keyframes, "
+          f"{summary['processing_fps']} FPS):")
+    for dish_name, info in sorted(summary["dishes"].items()):
+        print(f"   {dish_name}: x{info['count']} (confidence {info['confidence']:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+# 🗂️ Dish Taxonomy - StudXchange Custom Model
+## One source of truth for dish names, synonyms and categories
+
+"""
+The dish lists used to live in four places (the detector's defaults, its
+category and price maps, LabelingAssistant and DatasetValidator) and had
+drifted: `roti` and `chapati` were separate classes, `tea` was both a
+breakfast item and a beverage, `pakora` only existed for labeling. This
+module owns the taxonomy:
+
+- categories: ordered dish lists per category; the flattened order is the
+  canonical class id order, and each dish belongs to exactly one category
+- synonyms: names that mean the same dish (`chapati` -> `roti`)
+- `remap_table`: compiles any class list (a model's class_names.yaml, a
+  dataset's data.yaml) into an int array, source id -> target id, at dish
+  or category level. Names the taxonomy doesn't know are appended as their
+  own classes rather than dropped
+
+A model trained on an older class list keeps working: the detector compiles
+a table for its own class names at load time and `merge_predictions` folds
+overlapping sibling predictions (roti + chapati on one plate) into a single
+canonical detection. Datasets are moved to the new ids with one vectorized
+pass over all label files (`remap`), so a taxonomy change needs neither a
+relabel nor a retrain. Override the built-in taxonomy with a YAML file of
+the same shape via DISH_TAXONOMY=path.
+
+Usage:
+    python taxonomy.py show class_names.yaml
+    python taxonomy.py remap data/labeled_dataset/data.yaml --dry-run
+    python taxonomy.py remap data.yaml --level category
+"""
+
+import argparse
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from geometry import box_iou
+
+DEFAULT_TAXONOMY = {
+    'categories': {
+        'breakfast': ['aloo_paratha', 'plain_paratha', 'poha', 'upma', 'idli', 'dosa', 'bread_butter'],
+        'main_course': ['dal_tadka', 'dal_fry', 'rajma', 'chole', 'rice', 'roti', 'aloo_sabzi',
+                        'bhindi_sabzi', 'paneer_butter_masala'],
+        'sides': ['curd', 'pickle', 'papad', 'raita', 'salad'],
+        'beverages': ['tea', 'coffee'],
+        'snacks': ['samosa', 'pakora']
+    },
+    'synonyms': {
+        'chapati': 'roti', 'phulka': 'roti',
+        'dahi': 'curd', 'chai': 'tea', 'pakoda': 'pakora', 'bhajia': 'pakora',
+        'chawal': 'rice', 'plain_rice': 'rice', 'steamed_rice': 'rice'
+    }
+}
+
+# Class id order of the models and datasets built before the taxonomy
+# (roboflow_setup_guide.md); used when no class_names.yaml is available
+LEGACY_CLASSES = [
+    'aloo_paratha', 'plain_paratha', 'poha', 'upma', 'idli', 'dosa',
+    'bread_butter', 'tea', 'dal_tadka', 'dal_fry', 'rajma', 'chole',
+    'rice', 'roti', 'chapati', 'aloo_sabzi', 'bhindi_sabzi',
+    'paneer_butter_masala', 'curd', 'pickle', 'coffee', 'samosa',
+    'papad', 'raita', 'salad'
+]
+
+SIBLING_IOU = 0.5
+BACKUP_DIR = ".taxonomy_backup"
+
+# ====================================================================
+# TAXONOMY
+# ====================================================================
+
+def normalize_name(name):
+    return str(name).strip().lower().replace(' ', '_').replace('-', '_')
+
+
+class Taxonomy:
+    """Dish hierarchy and synonyms, compiled into id-remap tables"""
+
+    def __init__(self, categories, synonyms=None):
+        self.categories = list(categories)
+        self.dishes = []
+        self.category_of = {}
+        for category, dishes in categories.items():
+            for dish in map(normalize_name, dishes):
+                if dish in self.category_of:
+                    raise ValueError(f"{dish} is listed under both {self.category_of[dish]} and {category}")
+                self.dishes.append(dish)
+                self.category_of[dish] = category
+        self.synonyms = {normalize_name(k): normalize_name(v) for k, v in (synonyms or {}).items()}
+        unknown = set(self.synonyms.values()) - set(self.dishes)
+        if unknown:
+            raise ValueError(f"Synonyms point at unknown dishes: {sorted(unknown)}")
+
+    def canonical(self, name):
+        """Canonical dish name, or None if the taxonomy doesn't know it"""
+        name = normalize_name(name)
+        name = self.synonyms.get(name, name)
+        return name if name in self.category_of else None
+
+    def category(self, name):
+        dish = self.canonical(name)
+        return self.category_of[dish] if dish else 'other'
+
+    def by_category(self):
+        return {category: [d for d in self.dishes if self.category_of[d] == category]
+                for category in self.categories}
+
+    def names(self, level='dish'):
+        return list(self.dishes) if level == 'dish' else list(self.categories)
+
+    def remap_table(self, source_names, level='dish'):
+        """(int32 table indexed by source id, target names) for a {id: name} or list class list
+
+        Unknown source names are appended to the targets under their own
+        name, so no class is ever silently merged or dropped. Ids missing
+        from a sparse source dict map to -1.
+        """
+        if isinstance(source_names, (list, tuple)):
+            source_names = dict(enumerate(source_names))
+        targets = self.names(level)
+        index = {name: i for i, name in enumerate(targets)}
+        size = max(map(int, source_names), default=-1) + 1
+        table = np.full(size, -1, dtype=np.int32)
+        for class_id, name in source_names.items():
+            dish = self.canonical(name)
+            target = (dish if level == 'dish' else self.category_of[dish]) if dish else normalize_name(name)
+            if target not in index:
+                index[target] = len(targets)
+                targets.append(target)
+            table[int(class_id)] = index[target]
+        return table, targets
+
+
+def load_taxonomy(path=None):
+    """Taxonomy from a YAML override (DISH_TAXONOMY) or the built-in default"""
+    path = path or os.environ.get("DISH_TAXONOMY")
+    if path and os.path.exists(path):
+        with open(path, 'r') as f:
+            config = yaml.safe_load(f)
+        return Taxonomy(config['categories'], config.get('synonyms'))
+    return Taxonomy(DEFAULT_TAXONOMY['categories'], DEFAULT_TAXONOMY['synonyms'])
+
+
+TAXONOMY = load_taxonomy()
+
+# ====================================================================
+# INFERENCE-TIME MERGING
+# ====================================================================
+
+def merge_predictions(boxes, confidences, class_ids, table, iou_threshold=SIBLING_IOU):
+    """(boxes, confidences, target ids) with overlapping sibling predictions merged
+
+    Predictions of different model classes that map to the same target
+    (roti and chapati on one plate) and overlap by iou_threshold become one
+    detection: the most confident box, with the members' confidences
+    combined as a noisy-or. Same-class boxes are left alone; NMS has
+    already decided those.
+    """
+    class_ids = np.asarray(class_ids, dtype=np.int64)
+    targets = table[class_ids]
+    if len(targets) < 2:
+        return boxes, confidences, targets
+
+    siblings = ((targets[:, None] == targets[None, :]) & (class_ids[:, None] != class_ids[None, :])
+                & (box_iou(boxes, boxes) >= iou_threshold))
+    if not siblings.any():
+        return boxes, confidences, targets
+
+    merged = np.zeros(len(targets), dtype=bool)
+    keep, combined = [], []
+    for i in np.argsort(-confidences, kind='stable'):
+        if merged[i]:
+            continue
+        group = siblings[i] & ~merged
+        group[i] = True
+        merged |= group
+        keep.append(i)
+        combined.append(1 - np.prod(1 - confidences[group]))
+    keep = np.array(keep)
+    return boxes[keep], np.array(combined, dtype=confidences.dtype), targets[keep]
+
+# ====================================================================
+# BULK LABEL REMAPPING
+# ====================================================================
+
+def plan_remap(label_files, table, workers=16):
+    """Load and validate label files against a remap table; returns (labels, target ids, changed rows)"""
+    from label_lint import LabelTable
+
+    labels = LabelTable(label_files, workers)
+    source = labels.cls.astype(np.int64)
+    invalid = (labels.cls != source) | (source < 0) | (source >= len(table))
+    invalid[~invalid] = table[source[~invalid]] < 0
+    if invalid.any():
+        raise ValueError(f"{int(invalid.sum())} boxes have class ids outside the source class list "
+                         f"(e.g. {labels.where(invalid, 3)}); run label_lint.py first")
+    target = table[source]
+    return labels, target, np.flatnonzero(target != source)
+
+
+def apply_remap(plan, backup_root, dataset_root=None):
+    """Rewrite the changed rows of a plan_remap() result, backing each file up first; returns files rewritten"""
+    labels, target, changed = plan
+    rows_by_file = {}
+    for row in changed:
+        rows_by_file.setdefault(int(labels.file_id[row]), []).append(row)
+    for file_id, rows in rows_by_file.items():
+        path = labels.files[file_id]
+        backup = Path(backup_root) / os.path.relpath(path, dataset_root)
+        backup.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(path, backup)
+
+        with open(path, 'r') as f:
+            lines = f.read().splitlines()
+        for row in rows:
+            index = labels.line[row] - 1
+            lines[index] = f"{target[row]} {lines[index].split(None, 1)[1]}"
+        with open(path, 'w') as f:
+            f.write(''.join(line + '\n' for line in lines))
+    return len(rows_by_file)
+
+
+def remap_label_files(label_files, table, backup_root=None, dataset_root=None, workers=16):
+    """Rewrite class ids in YOLO label files through a remap table; returns (boxes changed, files rewritten)"""
+    plan = plan_remap(label_files, table, workers)
+    labels, _, changed = plan
+    if backup_root is None:
+        return len(changed), len(np.unique(labels.file_id[changed]))
+    return len(changed), apply_remap(plan, backup_root, dataset_root)
+
+
+def remap_dataset(data_yaml, taxonomy=TAXONOMY, level='dish', dry_run=False, workers=16):
+    """Move a YOLO dataset onto the taxonomy's class ids in place (originals backed up)"""
+    from dataset_layout import label_path, split_images
+
+    with open(data_yaml, 'r') as f:
+        data = yaml.safe_load(f)
+    root = Path(data.get('path') or Path(data_yaml).parent)
+    names = data.get('names', [])
+    table, targets = taxonomy.remap_table(names, level)
+
+    result = {'source_classes': len(table), 'target_classes': len(targets), 'splits': {}}
+    # Validate every split before touching any file, so a bad id in test can't leave train remapped
+    plans = {}
+    for split in ('train', 'val', 'test'):
+        if not data.get(split):
+            continue
+        images, _ = split_images(data_yaml, split)
+        label_files = [p for p in map(label_path, images) if os.path.exists(p)]
+        plans[split] = plan_remap(label_files, table, workers)
+        labels, _, changed = plans[split]
+        result['splits'][split] = {'label_files': len(label_files), 'boxes_changed': len(changed),
+                                   'files_rewritten': len(np.unique(labels.file_id[changed]))}
+
+    if not dry_run:
+        backup = root / BACKUP_DIR / datetime.now().strftime('%Y%m%d_%H%M%S')
+        for split, plan in plans.items():
+            result['splits'][split]['files_rewritten'] = apply_remap(plan, backup, root)
+        backup.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(data_yaml, backup / Path(data_yaml).name)
+        data['names'], data['nc'] = targets, len(targets)
+        with open(data_yaml, 'w') as f:
+            yaml.safe_dump(data, f, sort_keys=False)
+        result['backup'] = str(backup)
+    return result, table, targets
+
+# ====================================================================
+# COMMAND LINE
+# ====================================================================
+
+def _print_table(source_names, table, targets):
+    for class_id, name in sorted(source_names.items()):
+        target = targets[table[int(class_id)]]
+        arrow = "→" if target != normalize_name(name) or table[int(class_id)] != int(class_id) else " "
+        print(f"   {int(class_id):>3} {name:<24} {arrow} {table[int(class_id)]:>3} {target}")
+
+
+def main():
+    """Show or apply the taxonomy's id remapping"""
+    parser = argparse.ArgumentParser(description="StudXchange dish taxonomy")
+    parser.add_argument("command", choices=["show", "remap"])
+    parser.add_argument("data", nargs="?", help="class_names.yaml / data.yaml (show: default legacy class list)")
+    parser.add_argument("--level", choices=["dish", "category"], default="dish")
+    parser.add_argument("--taxonomy", help="YAML override (default $DISH_TAXONOMY or built-in)")
+    parser.add_argument("--dry-run", action="store_true", help="remap: count changes without writing")
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+
+    taxonomy = load_taxonomy(args.taxonomy)
+    names = LEGACY_CLASSES
+    if args.data:
+        with open(args.data, 'r') as f:
+            names = yaml.safe_load(f).get('names', [])
+    source_names = dict(enumerate(names)) if isinstance(names, list) else names
+
+    if args.command == "show":
+        table, targets = taxonomy.remap_table(source_names, args.level)
+        print(f"\n🗂️  {len(source_names)} source classes → {len(targets)} {args.level} classes")
+        _print_table(source_names, table, targets)
+        return
+
+    if not args.data:
+        parser.error("remap needs a data.yaml")
+    result, table, targets = remap_dataset(args.data, taxonomy, args.level, args.dry_run, args.workers)
+    print(f"\n🗂️  {result['source_classes']} → {result['target_classes']} classes ({args.level})")
+    _print_table(source_names, table, targets)
+    for split, info in result['splits'].items():
+        verb = "would change" if args.dry_run else "changed"
+        print(f"   {split}: {verb} {info['boxes_changed']} boxes in {info['files_rewritten']} "
+              f"of {info['label_files']} label files")
+    if not args.dry_run:
+        print(f"✅ data.yaml updated; originals backed up to {result['backup']}")
+
+
+if __name__ == "__main__":
+    main()
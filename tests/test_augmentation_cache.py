@@ -0,0 +1,78 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from augmentation_cache import build_augmentation_cache, cache_key, iter_cache, materialize
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    for split in ('train', 'val'):
+        (tmp_path / 'images' / split).mkdir(parents=True)
+        (tmp_path / 'labels' / split).mkdir(parents=True)
+    rng = np.random.default_rng(0)
+    for i in range(3):
+        cv2.imwrite(str(tmp_path / 'images' / 'train' / f"{i}.jpg"), rng.integers(0, 255, (48, 64, 3), np.uint8))
+        (tmp_path / 'labels' / 'train' / f"{i}.txt").write_text("0 0.5 0.5 0.25 0.25\n")
+    cv2.imwrite(str(tmp_path / 'images' / 'val' / "v.jpg"), np.zeros((48, 64, 3), np.uint8))
+    (tmp_path / 'data.yaml').write_text(f"path: {tmp_path}\ntrain: images/train\nval: images/val\nnames: [roti]\n")
+    return tmp_path
+
+
+def train_paths(root):
+    return sorted(str(p) for p in (root / 'images' / 'train').glob('*.jpg'))
+
+
+def test_cache_key_follows_label_edits(dataset):
+    paths = train_paths(dataset)
+    key, settings = cache_key(paths, 2, 64, {}, 0)
+    assert cache_key(paths, 2, 64, {}, 0)[0] == key
+    assert cache_key(paths, 3, 64, {}, 0)[0] != key
+
+    label = dataset / 'labels' / 'train' / '0.txt'
+    label.write_text("0 0.4 0.4 0.2 0.2\n")
+    os.utime(label, ns=(1, 1))
+    assert cache_key(paths, 2, 64, {}, 0)[0] != key
+
+
+def test_interrupted_build_resumes_missing_shards_only(dataset, tmp_path_factory):
+    cache_dir = tmp_path_factory.mktemp('cache')
+    paths = train_paths(dataset)
+    build_augmentation_cache(paths, cache_dir, variants=2, size=64, workers=1, images_per_shard=1)
+    first = {p.name: p.stat().st_mtime_ns for p in cache_dir.glob('shard-*.bin')}
+    assert len(first) == 3
+
+    # Simulate a crash before shard 1's index was written
+    (cache_dir / 'shard-00001.json').unlink()
+    build_augmentation_cache(paths, cache_dir, variants=2, size=64, workers=1, images_per_shard=1)
+    second = {p.name: p.stat().st_mtime_ns for p in cache_dir.glob('shard-*.bin')}
+    assert second['shard-00000.bin'] == first['shard-00000.bin']
+    assert (cache_dir / 'shard-00001.json').exists()
+
+    samples = list(iter_cache(cache_dir))
+    assert len(samples) == 6
+    assert sorted({item['source'] for item, _ in samples}) == paths
+    with open(cache_dir / 'manifest.json') as f:
+        assert json.load(f)['images'] == 3
+
+
+def test_materialize_replaces_stale_variants(dataset, tmp_path_factory):
+    cache_dir = tmp_path_factory.mktemp('cache')
+    output = tmp_path_factory.mktemp('aug')
+    stale = output / 'images' / 'train' / 'old_a0.jpg'
+    stale.parent.mkdir(parents=True)
+    stale.write_bytes(b'stale')
+
+    build_augmentation_cache(train_paths(dataset), cache_dir, variants=2, size=64, workers=1)
+    data_yaml = materialize(cache_dir, dataset / 'data.yaml', output)
+
+    images = sorted(p.stem for p in (output / 'images' / 'train').glob('*.jpg'))
+    labels = sorted(p.stem for p in (output / 'labels' / 'train').glob('*.txt'))
+    assert not stale.exists()
+    assert len(images) == 6 and images == labels
+    assert (output / 'val.txt').read_text().strip() == str((dataset / 'images' / 'val' / 'v.jpg').resolve())
+    assert os.path.exists(data_yaml)
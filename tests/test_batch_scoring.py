@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from batch_scoring import (JsonlDetectionWriter, ParquetDetectionWriter, error_record, run_batch_scoring,
+                           score_images)
+
+
+class Tensor:
+    def __init__(self, array):
+        self.array = np.asarray(array)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
+class Result:
+    def __init__(self, xyxy, conf, cls):
+        self.boxes = type('Boxes', (), {'xyxy': Tensor(xyxy), 'conf': Tensor(conf), 'cls': Tensor(cls)})
+
+
+class FakeDetector:
+    """Model classes 0 roti, 1 chapati (both the dish 0), 2 dal"""
+    model_path = 'weights/v1.pt'
+    class_names = {0: 'roti', 1: 'chapati', 2: 'dal'}
+    class_map = np.array([0, 0, 1])
+    dish_names = {0: 'plain_roti', 1: 'dal'}
+
+    def __init__(self):
+        self.images = 0
+
+    def inference_options(self):
+        return {}
+
+    def model(self, images, **kwargs):
+        self.images += len(images)
+        return iter(Result([[0, 0, 10, 10], [1, 1, 10, 10]], [0.6, 0.5], [0.0, 1.0]) for _ in images)
+
+
+def record(path, model='v1.pt'):
+    return {**error_record(path, model, None), 'width': 4, 'height': 4}
+
+
+def test_score_images_merged_and_raw():
+    image = np.zeros((20, 30, 3), np.uint8)
+    [merged] = score_images(FakeDetector(), [('a.jpg', image, None)])
+    assert merged['class_ids'] == [0] and merged['dish_names'] == ['Plain Roti']
+    assert merged['confidences'] == [0.8]
+    [raw] = score_images(FakeDetector(), [('a.jpg', image, None)], merged=False)
+    assert raw['class_ids'] == [0, 1] and raw['dish_names'] == ['roti', 'chapati']
+
+
+def test_jsonl_resume_is_per_model(tmp_path):
+    path = tmp_path / 'scores.jsonl'
+    writer = JsonlDetectionWriter(path)
+    writer.write([record('a'), record('b', 'v2.pt')])
+    writer.close()
+    with open(path, 'a') as f:
+        f.write('{"path": "c", "mod')  # crash mid-line
+
+    writer = JsonlDetectionWriter(path)
+    assert writer.done_paths('v1.pt') == {'a'}
+    assert writer.done_paths('v2.pt') == {'b'}
+    writer.close()
+
+
+def test_parquet_parts_are_small_and_resume_per_model(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.dataset as ds
+
+    writer = ParquetDetectionWriter(tmp_path, rows_per_part=2)
+    writer.write([record('a'), record('b')])
+    assert len(list(tmp_path.glob('part-*.parquet'))) == 1  # flushed without waiting for close
+    writer.write([{**record('c', 'v2.pt'), 'class_ids': [1], 'dish_names': ['Dal'], 'confidences': [0.5],
+                   'boxes': [[0.0, 0.0, 1.0, 1.0]], 'num_detections': 1}])
+    writer.close()
+
+    assert ds.dataset(str(tmp_path)).to_table().num_rows == 3  # one schema across parts
+    writer = ParquetDetectionWriter(tmp_path)
+    assert writer.done_paths('v1.pt') == {'a', 'b'}
+    assert writer.done_paths('v2.pt') == {'c'}
+
+
+def test_new_model_rescores_into_the_same_output(tmp_path):
+    paths = []
+    for name in ('x', 'y'):
+        paths.append(str(tmp_path / f"{name}.jpg"))
+        cv2.imwrite(paths[-1], np.zeros((8, 8, 3), np.uint8))
+    output = tmp_path / 'scores.jsonl'
+
+    detector = FakeDetector()
+    run_batch_scoring(detector, paths, JsonlDetectionWriter(output), batch_size=1, workers=1)
+    run_batch_scoring(detector, paths, JsonlDetectionWriter(output), batch_size=1, workers=1)
+    assert detector.images == 2  # second run resumed past both
+
+    detector.model_path = 'weights/v2.pt'
+    run_batch_scoring(detector, paths, JsonlDetectionWriter(output), batch_size=1, workers=1)
+    assert detector.images == 4
+    assert len(output.read_text().splitlines()) == 4
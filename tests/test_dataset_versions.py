@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+from dataset_versions import DatasetStore, diff_versions
+
+
+def write(root, rel, content):
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        path.unlink()  # checked-out images are read-only hardlinks
+    path.write_bytes(content)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DatasetStore(tmp_path / 'store')
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    root = tmp_path / 'dataset'
+    write(root, 'data.yaml', b"train: train/images\nval: valid/images\nnames: [roti, dal]\n")
+    for name, image, label in (('a', b'A', b'0 .5 .5 .1 .1\n'), ('b', b'B', b'1 .5 .5 .1 .1\n'),
+                               ('c', b'C', b'0 .2 .2 .1 .1\n'), ('d', b'D', b'1 .2 .2 .1 .1\n')):
+        write(root, f'train/images/{name}.jpg', image)
+        write(root, f'train/labels/{name}.txt', label)
+    return root
+
+
+def test_diff_classifies_every_kind_of_change(store, dataset):
+    store.commit(dataset, 'v1')
+    write(dataset, 'train/labels/a.txt', b'1 .5 .5 .1 .1\n')              # relabelled
+    write(dataset, 'train/images/b.jpg', b'B2')                          # image changed
+    (dataset / 'valid' / 'images').mkdir(parents=True)
+    (dataset / 'valid' / 'labels').mkdir(parents=True)
+    os.rename(dataset / 'train/images/c.jpg', dataset / 'valid/images/c.jpg')  # moved to val
+    os.rename(dataset / 'train/labels/c.txt', dataset / 'valid/labels/c.txt')
+    (dataset / 'train/images/d.jpg').unlink()                            # removed
+    (dataset / 'train/labels/d.txt').unlink()
+    write(dataset, 'train/images/e.jpg', b'E')                           # added
+    store.commit(dataset, 'v2', parent='v1')
+
+    changes = diff_versions(store, 'v1', 'v2')['changes']
+    assert changes['relabelled'] == ['train/images/a.jpg']
+    assert changes['image_changed'] == ['train/images/b.jpg']
+    assert changes['moved'] == ['train/images/c.jpg -> valid/images/c.jpg']
+    assert changes['removed'] == ['train/images/d.jpg']
+    assert changes['added'] == ['train/images/e.jpg']
+
+
+def test_commit_stores_unchanged_files_once(store, dataset):
+    store.commit(dataset, 'v1')
+    blobs = len(list(store.objects.glob('*/*')))
+    write(dataset, 'train/labels/a.txt', b'1 .9 .9 .1 .1\n')
+    store.commit(dataset, 'v2', parent='v1')
+    assert len(list(store.objects.glob('*/*'))) == blobs + 1
+
+
+def test_checkout_prunes_only_dataset_files(store, dataset, tmp_path):
+    store.commit(dataset, 'v1')
+    target = tmp_path / 'checkout'
+    write(target, 'train/labels/stale.txt', b'0 .5 .5 .1 .1\n')
+    write(target, 'train/images/stale.jpg', b'S')
+    write(target, 'runs/best.pt', b'weights')
+    write(target, 'NOTES.md', b'notes')
+    write(target, '.cache/labels/x.txt', b'hidden')
+
+    store.checkout('v1', target)
+    assert not (target / 'train/labels/stale.txt').exists()
+    assert not (target / 'train/images/stale.jpg').exists()
+    for kept in ('runs/best.pt', 'NOTES.md', '.cache/labels/x.txt'):
+        assert (target / kept).exists()
+    assert (target / 'train/images/a.jpg').read_bytes() == b'A'
+    blob = store.object_path(store.read('v1')['files']['train/images/a.jpg'])
+    assert os.path.samefile(target / 'train/images/a.jpg', blob)
+    assert f"path: {target}" in (target / 'data.yaml').read_text()
+
+
+def test_gc_keeps_referenced_blobs(store, dataset):
+    store.commit(dataset, 'v1')
+    write(dataset, 'train/labels/a.txt', b'1 .9 .9 .1 .1\n')
+    store.commit(dataset, 'v2', parent='v1')
+    assert store.gc() == 0
+
+    (store.versions_dir / 'v1.json').unlink()
+    assert store.gc() == 1  # only v1's label for a.jpg was unique to it
+    with pytest.raises(KeyError):
+        store.checkout('v1', dataset.parent / 'gone')
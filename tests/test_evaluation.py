@@ -0,0 +1,93 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+
+from evaluation import Evaluation, Predictions, _greedy_pairs, average_precision, cache_path
+
+
+def make_predictions(pred, gt, names=None):
+    """Predictions for one 100x100 image from [(cls, conf, box)] and [(cls, box)]"""
+    return Predictions(
+        names or {0: 'roti', 1: 'dal_tadka'},
+        paths=np.array(['a.jpg']), widths=np.array([100], np.int32), heights=np.array([100], np.int32),
+        blur=np.array([500.0], np.float32), brightness=np.array([120.0], np.float32),
+        pred_image=np.zeros(len(pred), np.int32),
+        pred_boxes=np.array([b for _, _, b in pred], np.float32).reshape(-1, 4),
+        pred_cls=np.array([c for c, _, _ in pred], np.int16),
+        pred_conf=np.array([s for _, s, _ in pred], np.float32),
+        gt_image=np.zeros(len(gt), np.int32),
+        gt_boxes=np.array([b for _, b in gt], np.float32).reshape(-1, 4),
+        gt_cls=np.array([c for c, _ in gt], np.int16))
+
+
+def test_average_precision_101_point():
+    # TP, FP, TP against 2 ground truths: precision 1, 1/2, 2/3 at recall 1/2, 1/2, 1
+    tp = np.array([[True], [False], [True]])
+    ap = average_precision(tp, np.array([0.9, 0.8, 0.7]), np.zeros(3, np.int64), np.array([2]))
+    # recall points 0..0.50 (51) at precision 1, 0.51..1.00 (50) at 2/3
+    assert np.isclose(ap[0, 0], (51 + 50 * 2 / 3) / 101)
+
+
+def test_average_precision_perfect_and_missing():
+    tp = np.array([[True], [True]])
+    ap = average_precision(tp, np.array([0.9, 0.8]), np.array([0, 0]), np.array([2, 3]))
+    assert np.isclose(ap[0, 0], 1.0)
+    assert ap[1, 0] == 0.0  # class with ground truth but no predictions
+
+
+def test_greedy_pairs_one_to_one_highest_iou_first():
+    iou = np.array([[0.9, 0.6],
+                    [0.8, 0.3]])
+    g, p = _greedy_pairs(iou, 0.5)
+    # gt 0 takes pred 0 (0.9); gt 1 can't reuse pred 0 and pred 1 is below 0.5 for it
+    assert sorted(zip(g.tolist(), p.tolist())) == [(0, 0)]
+    g, p = _greedy_pairs(iou, 0.25)
+    assert sorted(zip(g.tolist(), p.tolist())) == [(0, 0), (1, 1)]
+
+
+def test_evaluation_matches_same_class_only():
+    box = [10, 10, 50, 50]
+    predictions = make_predictions(
+        pred=[(0, 0.9, box), (1, 0.8, [60, 60, 90, 90])],
+        gt=[(0, box), (1, box)])
+    ap, gt_counts = Evaluation(predictions).per_class_ap()
+    assert gt_counts.tolist() == [1, 1]
+    assert np.allclose(ap[0], 1.0)
+    assert np.allclose(ap[1], 0.0)  # right class, wrong place
+
+
+def test_summary_is_json_serializable():
+    box = [10, 10, 50, 50]
+    evaluation = Evaluation(make_predictions(pred=[(0, 0.9, box)], gt=[(0, box), (1, box)]))
+    report = {'summary': evaluation.summary(), 'iou_sweep': evaluation.iou_sweep(),
+              'slices': evaluation.slice_report()}
+    decoded = json.loads(json.dumps(report))
+    assert {row['class_id'] for row in decoded['summary']['per_class']} == {0, 1}
+    assert decoded['summary']['mAP50'] == 0.5
+
+
+def test_cache_path_follows_labels_and_names(tmp_path):
+    weights = tmp_path / 'model.pt'
+    weights.write_bytes(b'weights')
+    (tmp_path / 'images').mkdir()
+    (tmp_path / 'labels').mkdir()
+    image = str(tmp_path / 'images' / 'a.jpg')
+    label = tmp_path / 'labels' / 'a.txt'
+    label.write_text("0 0.5 0.5 0.2 0.2\n")
+    names = {0: 'roti'}
+
+    def key(**changes):
+        args = {'model_path': str(weights), 'paths': [image], 'split': 'val', 'imgsz': 640,
+                'cache_dir': tmp_path, 'names': names, **changes}
+        return cache_path(**args)
+
+    first = key()
+    assert key() == first
+    assert key(names={0: 'chapati'}) != first
+    label.write_text("1 0.5 0.5 0.2 0.2\n")
+    os.utime(label, ns=(1, 1))
+    assert key() != first
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("PIL")
+
+import food_detector
+from taxonomy import LEGACY_CLASSES
+
+
+class Tensor:
+    def __init__(self, array):
+        self.array = np.asarray(array)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
+class Boxes:
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy, self.conf, self.cls = Tensor(xyxy), Tensor(conf), Tensor(cls)
+
+    def __len__(self):
+        return len(self.cls.array)
+
+
+class FakeYOLO:
+    """A widened model: the 25 legacy classes plus 'jalebi' appended as id 25"""
+    names = {**dict(enumerate(LEGACY_CLASSES)), len(LEGACY_CLASSES): 'jalebi'}
+    outputs = []
+
+    def __init__(self, weights):
+        pass
+
+    def __call__(self, image, **kwargs):
+        return [type('Result', (), {'boxes': Boxes(*FakeYOLO.outputs)})]
+
+
+@pytest.fixture
+def detector(monkeypatch, tmp_path):
+    monkeypatch.setattr(food_detector, 'YOLO', FakeYOLO)
+    monkeypatch.setattr(food_detector, 'serving_settings', lambda: {'device': 'cpu', 'half': False})
+    return lambda names_path=tmp_path / 'missing.yaml': food_detector.StudXchangeFoodDetector('m.pt', str(names_path))
+
+
+def test_every_model_class_gets_a_dish(detector, tmp_path):
+    stale = tmp_path / 'class_names.yaml'
+    stale.write_text("names: [%s]\n" % ", ".join(LEGACY_CLASSES))  # written before jalebi was added
+    for names_path in (stale, tmp_path / 'missing.yaml'):
+        d = detector(names_path)
+        assert len(d.class_names) == len(FakeYOLO.names)
+        assert d.class_names[len(LEGACY_CLASSES)] == 'jalebi'
+        assert (d.class_map >= 0).all()
+
+
+def test_predict_arrays_merges_siblings_and_new_classes(detector):
+    d = detector()
+    roti, chapati = LEGACY_CLASSES.index('roti'), LEGACY_CLASSES.index('chapati')
+    FakeYOLO.outputs = ([[0, 0, 10, 10], [1, 1, 10, 10], [50, 50, 60, 60]], [0.6, 0.5, 0.9],
+                        [roti, chapati, len(LEGACY_CLASSES)])
+    boxes, confidences, dish_ids = d.predict_arrays(np.zeros((64, 64, 3), np.uint8))
+    assert sorted(d.dish_names[i] for i in dish_ids.tolist()) == ['jalebi', 'roti']
+
+    _, _, raw = d.predict_arrays(np.zeros((64, 64, 3), np.uint8), merged=False)
+    assert raw.tolist() == [roti, chapati, len(LEGACY_CLASSES)]
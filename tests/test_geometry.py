@@ -0,0 +1,43 @@
+import numpy as np
+
+from geometry import box_iou, grouped_pairs
+
+
+def pairs(i, j):
+    return sorted(zip(i.tolist(), j.tolist()))
+
+
+def test_grouped_pairs_only_within_equal_keys():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [0, 0, 10, 10], [50, 50, 60, 60]], np.float32)
+    classes = np.array([0, 0, 1, 0])
+    # 0 and 1 overlap (IoU 81/119); 2 overlaps both but has another class; 3 is far away
+    assert pairs(*grouped_pairs((classes,), boxes, 0.5)) == [(0, 1)]
+    assert pairs(*grouped_pairs((classes,), boxes, 0.7)) == []
+
+
+def test_grouped_pairs_multiple_keys_and_long_runs():
+    boxes = np.tile(np.array([[0, 0, 10, 10]], np.float32), (4, 1))
+    photo = np.array([0, 1, 0, 0])
+    classes = np.zeros(4, np.int64)
+    assert pairs(*grouped_pairs((classes, photo), boxes, 0.5)) == [(0, 2), (0, 3), (2, 3)]
+
+
+def test_grouped_pairs_over_smaller_box():
+    # A small box inside a large one: IoU 0.25, but fully covered
+    boxes = np.array([[0, 0, 20, 20], [0, 0, 10, 10]], np.float32)
+    keys = (np.zeros(2, np.int64),)
+    assert pairs(*grouped_pairs(keys, boxes, 0.7)) == []
+    assert pairs(*grouped_pairs(keys, boxes, 0.7, over_smaller=True)) == [(0, 1)]
+
+
+def test_grouped_pairs_empty():
+    i, j = grouped_pairs((np.zeros(0, np.int64),), np.zeros((0, 4), np.float32), 0.5)
+    assert len(i) == len(j) == 0
+
+
+def test_box_iou_matrix():
+    a = np.array([[0, 0, 10, 10], [0, 0, 20, 20]], np.float32)
+    b = np.array([[0, 0, 10, 10], [5, 5, 15, 15], [30, 30, 40, 40]], np.float32)
+    expected = [[1.0, 25 / 175, 0.0], [100 / 400, 100 / 400, 0.0]]
+    assert np.allclose(box_iou(a, b), expected, atol=1e-6)
+    assert box_iou(a, np.zeros((0, 4), np.float32)).shape == (2, 0)
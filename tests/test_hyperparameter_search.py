@@ -0,0 +1,51 @@
+from pathlib import Path
+
+import pytest
+import yaml
+
+from hyperparameter_search import prepare_trial_dataset
+
+
+def write_image(path, label=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'jpeg')
+    if label is not None:
+        label_file = Path(str(path.with_suffix('.txt')).replace('images', 'labels'))
+        label_file.parent.mkdir(parents=True, exist_ok=True)
+        label_file.write_text(label)
+
+
+@pytest.fixture
+def roboflow_export(tmp_path):
+    """Roboflow layout: data.yaml inside the dataset, splits as ../train/images"""
+    root = tmp_path / 'export'
+    write_image(root / 'train' / 'images' / 'a' / 'x.jpg', "0 0.5 0.5 0.1 0.1\n")
+    write_image(root / 'train' / 'images' / 'b' / 'x.jpg', "1 0.5 0.5 0.1 0.1\n")
+    write_image(root / 'valid' / 'images' / 'y.jpg', "0 0.5 0.5 0.1 0.1\n")
+    (root / 'data.yaml').write_text("train: ../train/images\nval: ../valid/images\nnc: 2\nnames: [roti, dal]\n")
+    return root
+
+
+def test_roboflow_paths_and_nested_basenames(roboflow_export, tmp_path):
+    subset_yaml = Path(prepare_trial_dataset(roboflow_export / 'data.yaml', cache_root=tmp_path / 'cache'))
+    subset = subset_yaml.parent
+    images = sorted(str(p.relative_to(subset)) for p in subset.rglob('*.jpg'))
+    assert images == ['images/train/a/x.jpg', 'images/train/b/x.jpg', 'images/val/y.jpg']
+    assert (subset / 'labels' / 'train' / 'b' / 'x.txt').read_text().startswith('1 ')
+    assert yaml.safe_load(subset_yaml.read_text())['names'] == ['roti', 'dal']
+
+
+def test_changed_images_get_a_new_subset(roboflow_export, tmp_path):
+    first = prepare_trial_dataset(roboflow_export / 'data.yaml', cache_root=tmp_path / 'cache')
+    assert prepare_trial_dataset(roboflow_export / 'data.yaml', cache_root=tmp_path / 'cache') == first
+    write_image(roboflow_export / 'train' / 'images' / 'c.jpg')
+    assert prepare_trial_dataset(roboflow_export / 'data.yaml', cache_root=tmp_path / 'cache') != first
+
+
+def test_missing_or_empty_split_is_an_error(roboflow_export, tmp_path):
+    (roboflow_export / 'valid' / 'images' / 'y.jpg').unlink()
+    with pytest.raises(ValueError, match="No images in the val split"):
+        prepare_trial_dataset(roboflow_export / 'data.yaml', cache_root=tmp_path / 'cache')
+    (roboflow_export / 'data.yaml').write_text("train: ../train/images\nval: ../missing/images\nnames: [roti]\n")
+    with pytest.raises(FileNotFoundError):
+        prepare_trial_dataset(roboflow_export / 'data.yaml', cache_root=tmp_path / 'cache')
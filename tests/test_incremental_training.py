@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+
+from incremental_training import merge_classes, sample_replay, write_remapped
+
+
+def make_images(root, labels):
+    """images/train/<i>.jpg with the given label text (None: no label file)"""
+    (root / 'images' / 'train').mkdir(parents=True)
+    (root / 'labels' / 'train').mkdir(parents=True)
+    paths = []
+    for i, text in enumerate(labels):
+        image = root / 'images' / 'train' / f"{i}.jpg"
+        image.write_bytes(b'jpeg')
+        if text is not None:
+            (root / 'labels' / 'train' / f"{i}.txt").write_text(text)
+        paths.append(str(image))
+    return paths
+
+
+def test_merge_classes_keeps_base_ids_and_appends_new_dishes():
+    names, (old, new) = merge_classes(['roti', 'dal_tadka'], ['roti', 'dal_tadka'], ['chapati', 'jalebi', 'Roti'])
+    assert names == ['roti', 'dal_tadka', 'jalebi']
+    assert old.tolist() == [0, 1]
+    assert new.tolist() == [0, 2, 0]  # chapati is a roti synonym
+
+
+def test_merge_classes_prefers_exact_names_over_synonyms():
+    names, (new,) = merge_classes(['roti', 'chapati'], ['chapati', 'roti'])
+    assert names == ['roti', 'chapati']
+    assert new.tolist() == [1, 0]
+
+
+def test_sample_replay_keeps_rare_classes(tmp_path):
+    paths = make_images(tmp_path, ["0 .5 .5 .1 .1\n"] * 9 + ["1 .5 .5 .1 .1\n"])
+    chosen = sample_replay(paths, num_classes=2, budget=3, workers=1)
+    assert len(chosen) == 3 and 9 in chosen.tolist()
+    assert sample_replay(paths, num_classes=2, budget=3, workers=1).tolist() == chosen.tolist()
+    assert sample_replay(paths, num_classes=2, budget=20, workers=1).tolist() == list(range(10))
+
+
+def test_write_remapped_relabels_and_drops_unknown_ids(tmp_path):
+    paths = make_images(tmp_path / 'src', ["0 0.5 0.5 0.1 0.1\n1 0.2 0.2 0.1 0.1\n", "7 0.5 0.5 0.1 0.1\n", None])
+    dropped = write_remapped(paths, np.array([2, 0], np.int32), tmp_path / 'out', 'train', 'old', workers=1)
+    assert dropped == 1  # class 7 is not in the table
+
+    labels = tmp_path / 'out' / 'labels' / 'train'
+    assert (labels / 'old_0.txt').read_text().splitlines() == [
+        "2 0.500000 0.500000 0.100000 0.100000", "0 0.200000 0.200000 0.100000 0.100000"]
+    assert (labels / 'old_1.txt').read_text() == ''
+    assert (labels / 'old_2.txt').read_text() == ''
+    assert sorted(p.name for p in (tmp_path / 'out' / 'images' / 'train').iterdir()) == [
+        'old_0.jpg', 'old_1.jpg', 'old_2.jpg']
@@ -0,0 +1,46 @@
+import pytest
+
+import inference_scheduler
+from inference_scheduler import RateLimited, RateLimiter, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(inference_scheduler.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_token_bucket_spends_and_refills(clock):
+    bucket = TokenBucket(rate=2.0, burst=4.0)
+    assert bucket.take(3) == 0.0
+    assert bucket.take(2) == pytest.approx(0.5)  # 1 token left, 1 missing at 2/s
+    clock[0] += 0.5
+    assert bucket.take(2) == 0.0
+    clock[0] += 100
+    assert bucket.level() == 4.0  # never above burst
+
+
+def test_token_bucket_without_rate_never_refills(clock):
+    bucket = TokenBucket(rate=0.0, burst=1.0)
+    assert bucket.take() == 0.0
+    assert bucket.take() == float('inf')
+
+
+def test_rate_limiter_overrides_and_refund(clock):
+    limiter = RateLimiter(rate=1.0, burst=2.0, overrides={'bulk': {'rate': 10, 'burst': 20}})
+    limiter.check('a', 2)
+    with pytest.raises(RateLimited):
+        limiter.check('a')
+    limiter.refund('a')
+    limiter.check('a')
+    limiter.check('bulk', 20)
+    assert limiter.max_cost('a') == 2.0
+    assert limiter.max_cost('bulk') == 20
+
+
+def test_rate_limiter_table_stays_bounded(clock):
+    limiter = RateLimiter(rate=0.001, burst=1.0, max_keys=8)
+    for i in range(100):
+        limiter.check(f"key{i}")  # every bucket left drained
+    assert len(limiter.buckets) <= 8
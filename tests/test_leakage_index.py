@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+
+from leakage_index import IVFIndex, connected_components, find_leakage, resplit
+
+
+def unit_vectors(n, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def with_duplicates(n=300, copies=((0, 150), (1, 299), (2, 200))):
+    vectors = unit_vectors(n)
+    for source, target in copies:
+        vectors[target] = vectors[source]
+    return vectors
+
+
+def test_near_pairs_with_every_list_probed_is_exact():
+    vectors = unit_vectors(200)
+    vectors[50] = vectors[10]
+    index = IVFIndex(nlist=8, nprobe=8).build(vectors)
+    i, j, s = index.near_pairs(0.6)
+
+    scores = vectors @ vectors.T
+    expected_i, expected_j = np.nonzero(np.triu(scores >= 0.6, k=1))
+    assert sorted(zip(i.tolist(), j.tolist())) == sorted(zip(expected_i.tolist(), expected_j.tolist()))
+    assert np.allclose(s, scores[i, j], atol=1e-5)
+
+
+def test_near_pairs_finds_exact_duplicates_with_few_probes():
+    index = IVFIndex(nprobe=1).build(with_duplicates())
+    i, j, _ = index.near_pairs(0.99)
+    assert sorted(zip(i.tolist(), j.tolist())) == [(0, 150), (1, 299), (2, 200)]
+
+
+def test_save_load_round_trip(tmp_path):
+    vectors = with_duplicates()
+    index = IVFIndex(nprobe=2).build(vectors)
+    index.save(tmp_path / 'index.npz')
+    loaded = IVFIndex.load(tmp_path / 'index.npz')
+    similarities, ids = loaded.search(vectors[3:8], k=1)  # no duplicates among these
+    assert ids[:, 0].tolist() == [3, 4, 5, 6, 7]
+    assert np.allclose(similarities[:, 0], 1.0, atol=1e-2)  # vectors are stored as float16
+
+
+def test_connected_components_chains():
+    labels = connected_components(5, np.array([3, 1]), np.array([4, 3]))
+    assert labels.tolist() == [0, 1, 2, 1, 1]
+
+
+def test_resplit_moves_leaking_clusters_to_their_majority():
+    splits = np.array(['train', 'val', 'val', 'val', 'test', 'train', 'test', 'val'])
+    leaking = {0: [0, 1, 2], 3: [3, 4], 5: [5, 6]}
+    new = resplit(None, splits, leaking)
+    assert new.tolist() == ['val', 'val', 'val', 'val', 'val', 'train', 'train', 'val']
+    assert splits[0] == 'train'  # input left alone
+
+
+def test_find_leakage_reports_cross_split_pairs():
+    vectors = with_duplicates()
+    splits = np.array(['train'] * 150 + ['val'] * 100 + ['test'] * 50)
+    paths = [f"img{k}.jpg" for k in range(300)]
+    report, _, leaking = find_leakage(paths, splits, vectors, threshold=0.99, nprobe=2)
+    assert report['near_duplicate_pairs'] == 3
+    assert report['cross_split_pairs'] == {'train/val': 2, 'train/test': 1}
+    assert report['contaminated_eval_images']['test']['count'] == 1
+    assert len(leaking) == 3
@@ -0,0 +1,51 @@
+import numpy as np
+
+from menu_aggregation import aggregate_menu, cluster_portions, count_portions
+
+
+def test_cluster_portions_is_transitive():
+    # 0 and 1 don't touch, but both sit inside the bowl box 2
+    boxes = np.array([[0, 0, 10, 10], [12, 12, 20, 20], [0, 0, 20, 20], [50, 50, 60, 60]], np.float32)
+    photo = np.zeros(4, np.int32)
+    class_ids = np.zeros(4, np.int32)
+    assert cluster_portions(photo, class_ids, boxes).tolist() == [0, 0, 0, 3]
+
+
+def test_cluster_portions_keeps_dishes_and_photos_apart():
+    boxes = np.tile(np.array([[0, 0, 10, 10]], np.float32), (3, 1))
+    photo = np.array([0, 0, 1], np.int32)
+    class_ids = np.array([0, 1, 0], np.int32)
+    assert cluster_portions(photo, class_ids, boxes).tolist() == [0, 1, 2]
+
+
+def test_count_portions_same_meal_takes_max_over_photos():
+    # Photo 0: three separate rotis; photo 1: two rotis and a dal
+    boxes = np.array([[0, 0, 10, 10], [20, 0, 30, 10], [40, 0, 50, 10],
+                      [0, 0, 10, 10], [20, 0, 30, 10], [0, 20, 30, 50]], np.float32)
+    photo = np.array([0, 0, 0, 1, 1, 1], np.int32)
+    class_ids = np.array([3, 3, 3, 3, 3, 7], np.int32)
+    confidences = np.array([0.5, 0.6, 0.7, 0.9, 0.4, 0.8], np.float32)
+
+    dishes, quantities, confidence, seen = count_portions(photo, class_ids, confidences, boxes)
+    assert dishes.tolist() == [3, 7]
+    assert quantities.tolist() == [3, 1]
+    assert np.allclose(confidence, [0.9, 0.8])
+    assert seen.tolist() == [2, 1]
+
+    _, quantities, _, _ = count_portions(photo, class_ids, confidences, boxes, same_meal=False)
+    assert quantities.tolist() == [5, 1]
+
+
+def test_count_portions_empty():
+    empty = np.zeros(0, np.int32)
+    dishes, quantities, _, _ = count_portions(empty, empty, np.zeros(0, np.float32), np.zeros((0, 4), np.float32))
+    assert len(dishes) == len(quantities) == 0
+
+
+def test_aggregate_menu_bills_a_duplicate_box_once():
+    detection = {'class_id': 1, 'dish_name': 'Dal', 'category': 'dal', 'estimated_price': 20,
+                 'confidence': 0.9, 'bbox': [0, 0, 100, 100]}
+    partial = {**detection, 'confidence': 0.6, 'bbox': [10, 10, 60, 60]}
+    menu = aggregate_menu([{'success': True, 'detections': [detection, partial]}, {'success': False}])
+    assert [(item['name'], item['quantity'], item['total']) for item in menu['items']] == [('Dal', 1, 20)]
+    assert menu['detections'] == 2 and menu['photos'] == 2
@@ -0,0 +1,56 @@
+import csv
+import io
+import json
+
+import pytest
+
+from menu_rendering import COMPACT, CSV, CSV_COLUMNS, PRETTY, export_csv, menu_items, render_menu
+
+
+def item(name, category, quantity, price, confidence):
+    return {'name': name, 'category': category, 'quantity': quantity, 'unit_price': price,
+            'total': price * quantity, 'confidence': confidence}
+
+
+MENU = {'items': [
+    item('Roti', 'main_course', 4, 10, 0.93),
+    item('Dal Tadka', 'main_course', 1, 60, 0.871),
+    item('Masala "Special" Thali, Veg', 'unknown', 2, 120.5, 0.5),
+    item('Café Crème', 'beverages', 1, 25, 0.66),
+]}
+
+
+def test_pretty_matches_json_dumps_indent_2():
+    expected = menu_items(MENU)
+    assert render_menu(MENU, PRETTY) == json.dumps(expected, indent=2)
+    assert render_menu({'items': []}, PRETTY) == json.dumps([], indent=2)
+
+
+def test_compact_parses_to_menu_items():
+    assert json.loads(render_menu(MENU, COMPACT)) == menu_items(MENU)
+    assert render_menu(MENU, COMPACT) == json.dumps(menu_items(MENU), separators=(',', ':'))
+
+
+def test_quantity_templates_render_per_quantity():
+    one = json.loads(render_menu({'items': [item('Roti', 'main_course', 1, 10, 0.9)]}, COMPACT))
+    four = json.loads(render_menu({'items': [item('Roti', 'main_course', 4, 10, 0.9)]}, COMPACT))
+    assert one[0]['description'].startswith('1 ')
+    assert four[0]['description'].startswith('4 ')
+
+
+def test_csv_round_trip(tmp_path):
+    rows = list(csv.DictReader(io.StringIO(render_menu(MENU, CSV))))
+    assert [row['name'] for row in rows] == [i['name'] for i in MENU['items']]
+    assert rows[2]['description'] == menu_items(MENU)[2]['description']
+
+    path = tmp_path / 'menus.csv'
+    assert export_csv({'north, mess': MENU, 'empty': {'items': []}}, str(path)) == 4
+    with open(path, newline='') as f:
+        exported = list(csv.DictReader(f))
+    assert list(exported[0]) == ['mess'] + CSV_COLUMNS
+    assert {row['mess'] for row in exported} == {'north, mess'}
+
+
+def test_unknown_format_rejected():
+    with pytest.raises(ValueError):
+        render_menu(MENU, 'xml')
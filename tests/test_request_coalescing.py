@@ -0,0 +1,128 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("PIL")
+
+from request_coalescing import SingleFlight, content_key
+
+
+class Busy(Exception):
+    pass
+
+
+def run_concurrently(flight, key, fn, callers):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.run(key, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results, errors
+
+
+def test_content_key_covers_image_and_params():
+    image = np.zeros((4, 4, 3), np.uint8)
+    assert content_key(image, 0.25) == content_key(image.copy(), 0.25)
+    assert content_key(image, 0.25) != content_key(image, 0.5)
+    assert content_key(image) != content_key(image.reshape(8, 2, 3))
+    assert content_key(b'abc') != content_key(b'abd')
+    with pytest.raises(TypeError):
+        content_key("image.jpg")
+
+
+def test_followers_share_the_leader_result():
+    flight = SingleFlight(linger=0)
+    calls = []
+    release = threading.Event()
+
+    def detect():
+        calls.append(1)
+        release.wait(5)
+        return {'detections': 3}
+
+    threading.Timer(0.2, release.set).start()
+    results, errors = run_concurrently(flight, 'k', detect, 5)
+    assert not errors
+    assert len(calls) == 1
+    assert results == [{'detections': 3}] * 5
+    assert flight.calls == {}
+
+
+def test_linger_shares_a_just_finished_result():
+    flight = SingleFlight(linger=60, linger_if=lambda result: result['ok'])
+    calls = []
+
+    def detect(ok):
+        calls.append(ok)
+        return {'ok': ok}
+
+    assert flight.run('a', detect, True) == flight.run('a', detect, True)
+    assert len(calls) == 1
+
+    flight.run('b', detect, False)
+    flight.run('b', detect, False)
+    assert len(calls) == 3  # results rejected by linger_if are not kept
+
+
+def test_retry_on_failures_are_not_inherited():
+    flight = SingleFlight(linger=60, retry_on=(Busy,))
+    calls = []
+    lock = threading.Lock()
+    started = threading.Event()
+
+    def detect():
+        with lock:
+            calls.append(1)
+            first = len(calls) == 1
+        if first:
+            started.set()
+            time.sleep(0.2)
+            raise Busy()
+        return 'ok'
+
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.run('k', detect))
+        except Exception as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=call) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    # Only the refused leader sees Busy; the followers elect a new leader between them
+    assert [type(e) for e in errors] == [Busy]
+    assert results == ['ok'] * 3
+    assert len(calls) == 2
+
+
+def test_other_failures_reach_followers_but_are_not_kept():
+    flight = SingleFlight(linger=60)
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise RuntimeError("model crashed")
+
+    threading.Timer(0.2, release.set).start()
+    results, errors = run_concurrently(flight, 'k', fail, 3)
+    assert not results and len(errors) == 3
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert flight.run('k', lambda: 'recovered') == 'recovered'
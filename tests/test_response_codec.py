@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+import response_codec
+from response_codec import COLUMNAR, JSON, MSGPACK, decode_response, encode_response, negotiate, table_id
+
+TABLE = {0: ['Jollof Rice', 'main', 350], 1: ['Fried Plantain', 'side', 150], 2: ['Zobo', 'drink', 100]}
+
+PAYLOAD = {
+    'status': 'success',
+    'model': 'best.pt',
+    'inference_time': 0.042,
+    'detections': [
+        {'class_id': 0, 'confidence': 0.91, 'bbox': [10.2, 20.7, 110.0, 140.4]},
+        {'class_id': 2, 'confidence': 0.5, 'bbox': [200, 30, 260, 120]},
+    ],
+}
+
+
+def binary_types():
+    return [COLUMNAR] + ([MSGPACK] if response_codec.msgpack is not None else [])
+
+
+@pytest.mark.parametrize("media_type", binary_types())
+def test_round_trip_quantizes_columns(media_type):
+    body, content_type = encode_response(PAYLOAD, media_type, TABLE)
+    assert content_type == media_type
+    decoded = decode_response(body, content_type)
+
+    assert decoded['status'] == 'success'
+    assert decoded['model'] == 'best.pt'
+    assert decoded['total_dishes'] == 2
+    assert decoded['table_id'] == table_id(TABLE)
+    first, second = decoded['detections']
+    assert (first['class_id'], first['dish_name'], first['category'], first['estimated_price']) == \
+        (0, 'Jollof Rice', 'main', 350)
+    assert first['bbox'] == [10, 21, 110, 140]
+    assert first['confidence'] == pytest.approx(0.91, abs=1 / 255)
+    assert second['dish_name'] == 'Zobo' and second['bbox'] == [200, 30, 260, 120]
+
+
+@pytest.mark.parametrize("media_type", binary_types())
+def test_table_sent_once_per_client(media_type):
+    known = {}
+    body, content_type = encode_response(PAYLOAD, media_type, TABLE)
+    decode_response(body, content_type, known)
+
+    # The client echoes the table id, so the next response leaves the table out
+    body_without, _ = encode_response(PAYLOAD, media_type, TABLE, client_table_id=table_id(TABLE))
+    assert len(body_without) < len(body)
+    assert decode_response(body_without, content_type, known)['detections'][1]['dish_name'] == 'Zobo'
+    with pytest.raises(KeyError):
+        decode_response(body_without, content_type, {})
+
+
+def test_empty_and_json_responses():
+    body, content_type = encode_response(dict(PAYLOAD, detections=[]), COLUMNAR, TABLE)
+    assert decode_response(body, content_type)['detections'] == []
+
+    body, content_type = encode_response(PAYLOAD, JSON, TABLE)
+    assert content_type == JSON and json.loads(body) == PAYLOAD
+
+
+def test_out_of_table_class_id_rejected():
+    payload = dict(PAYLOAD, detections=[{'class_id': 3, 'confidence': 0.9, 'bbox': [0, 0, 1, 1]}])
+    with pytest.raises(ValueError):
+        encode_response(payload, COLUMNAR, TABLE)
+
+
+def test_negotiate():
+    assert negotiate(None) == JSON
+    assert negotiate('text/html') == JSON
+    assert negotiate(f'{COLUMNAR}') == COLUMNAR
+    assert negotiate(f'{JSON};q=0.9, {COLUMNAR}') == COLUMNAR
+    assert negotiate(f'{JSON}, {COLUMNAR};q=0.5') == JSON
+    assert negotiate(f'{COLUMNAR};q=0, {JSON};q=0.1') == JSON
+    expected = MSGPACK if response_codec.msgpack is not None else JSON
+    assert negotiate('application/msgpack') == expected
@@ -0,0 +1,39 @@
+import numpy as np
+
+from taxonomy import merge_predictions
+
+# Model classes 0 roti, 1 chapati, 2 dal; roti and chapati are one dish
+TABLE = np.array([0, 0, 1], np.int32)
+
+
+def test_overlapping_siblings_merge_with_noisy_or():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 10, 10]], np.float32)
+    conf = np.array([0.6, 0.5], np.float32)
+    merged_boxes, merged_conf, targets = merge_predictions(boxes, conf, np.array([0, 1]), TABLE)
+    assert targets.tolist() == [0]
+    assert np.allclose(merged_boxes, boxes[:1])  # the most confident box
+    assert np.isclose(merged_conf[0], 1 - 0.4 * 0.5)
+
+
+def test_same_class_and_separate_boxes_are_kept():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 10, 10], [50, 50, 60, 60]], np.float32)
+    conf = np.array([0.9, 0.8, 0.7], np.float32)
+    # 0 and 1 are both roti (NMS already kept both); 2 is a chapati elsewhere on the plate
+    _, merged_conf, targets = merge_predictions(boxes, conf, np.array([0, 0, 1]), TABLE)
+    assert targets.tolist() == [0, 0, 0]
+    assert np.allclose(merged_conf, conf)
+
+
+def test_other_dishes_are_remapped_not_merged():
+    boxes = np.array([[0, 0, 10, 10], [0, 0, 10, 10]], np.float32)
+    conf = np.array([0.9, 0.8], np.float32)
+    _, _, targets = merge_predictions(boxes, conf, np.array([1, 2]), TABLE)
+    assert targets.tolist() == [0, 1]
+
+
+def test_remap_table_marks_sparse_ids():
+    from taxonomy import TAXONOMY
+
+    table, targets = TAXONOMY.remap_table({0: 'roti', 2: 'chapati'})
+    assert table.tolist()[1] == -1
+    assert targets[table[0]] == targets[table[2]] == 'roti'
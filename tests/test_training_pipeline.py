@@ -0,0 +1,77 @@
+import pytest
+
+pytest.importorskip("cv2")
+
+import training_pipeline
+
+
+class FakeYOLO:
+    calls = []
+
+    def __init__(self, weights):
+        self.weights = weights
+
+    def train(self, **kwargs):
+        FakeYOLO.calls.append(('train', self.weights, kwargs.get('resume', False), kwargs.get('name')))
+
+    def val(self, data):
+        box = type('Box', (), {'map50': 0.5, 'map': 0.3, 'mp': 0.6, 'mr': 0.4})
+        return type('Results', (), {'box': box})
+
+
+@pytest.fixture
+def finished_run(tmp_path, monkeypatch):
+    FakeYOLO.calls = []
+    monkeypatch.setattr(training_pipeline, 'YOLO', FakeYOLO)
+    monkeypatch.setattr(training_pipeline, 'build_train_args', lambda config, data, **kw: kw)
+    weights = tmp_path / 'runs' / 'run1' / 'weights'
+    weights.mkdir(parents=True)
+    (weights / 'last.pt').write_bytes(b'')
+    return tmp_path / 'runs'
+
+
+def train(project, **kwargs):
+    return training_pipeline.train_model('data.yaml', {'model_size': 'n'}, project, 'run1', **kwargs)
+
+
+def test_unfinished_run_resumes(finished_run, monkeypatch):
+    monkeypatch.setattr(training_pipeline, 'checkpoint_unfinished', lambda weights: True)
+    outputs = train(finished_run)
+    assert FakeYOLO.calls == [('train', str(finished_run / 'run1' / 'weights' / 'last.pt'), True, None)]
+    assert outputs['run_dir'] == str(finished_run / 'run1')
+
+
+def test_finished_run_is_only_revalidated(finished_run, monkeypatch):
+    monkeypatch.setattr(training_pipeline, 'checkpoint_unfinished', lambda weights: False)
+    train(finished_run)
+    assert FakeYOLO.calls == []
+
+
+def test_forced_run_trains_fresh_in_a_new_dir(finished_run, monkeypatch):
+    monkeypatch.setattr(training_pipeline, 'checkpoint_unfinished', lambda weights: True)
+    outputs = train(finished_run, force=True)
+    [(_, weights, resume, name)] = FakeYOLO.calls
+    assert weights == 'yolov8n.pt' and not resume
+    assert name.startswith('run1_') and outputs['run_dir'] == str(finished_run / name)
+
+
+def test_split_fingerprint_follows_listed_images_only(tmp_path):
+    import os
+
+    for split in ('train', 'val'):
+        (tmp_path / 'images' / split).mkdir(parents=True)
+        (tmp_path / 'labels' / split).mkdir(parents=True)
+        (tmp_path / 'images' / split / 'a.jpg').write_bytes(b'jpeg')
+        (tmp_path / 'labels' / split / 'a.txt').write_text("0 .5 .5 .1 .1\n")
+    data_yaml = tmp_path / 'data.yaml'
+    data_yaml.write_text(f"path: {tmp_path}\ntrain: images/train\nval: images/val\nnames: [roti]\n")
+
+    first = training_pipeline.split_fingerprint(data_yaml)
+    (tmp_path / 'runs').mkdir()
+    (tmp_path / 'runs' / 'best.pt').write_bytes(b'weights')  # unrelated files don't count
+    assert training_pipeline.split_fingerprint(data_yaml) == first
+
+    label = tmp_path / 'labels' / 'val' / 'a.txt'
+    label.write_text("0 .4 .4 .1 .1\n")
+    os.utime(label, (1, 1))
+    assert training_pipeline.split_fingerprint(data_yaml) != first
@@ -0,0 +1,149 @@
+# ⚙️ Training Configuration - StudXchange Custom Model
+## Shared hyperparameters for the Colab and Kaggle training setups
+
+"""
+Single home for the hand-tuned training dictionaries so that the training
+scripts, the hyperparameter search and the staged pipeline all read the
+same values. `build_train_args` maps the config keys onto the keyword
+arguments ultralytics' `model.train()` expects.
+"""
+
+# ====================================================================
+# GOOGLE COLAB (FREE TIER)
+# ====================================================================
+
+# Training configuration optimized for Colab free tier
+TRAINING_CONFIG = {
+    # Model settings
+    'model_size': 'n',  # nano for faster training on free tier
+    
+    # Training parameters (optimized for free tier)
+    'epochs': 200,  # Reduced from 300 for free tier limits
+    'batch_size': 'auto',  # Chosen by hardware_profile (was 16)
+    'image_size': 640,
+    'patience': 30,  # Early stopping
+    
+    # Hardware settings ('auto' = measured by hardware_profile before training)
+    'workers': 'auto',  # was 2
+    'device': 'auto',  # was '0', which crashes on CPU-only runtimes
+    'amp': 'auto',
+    'cache': 'auto',  # 'ram' or 'disk' depending on free memory
+    
+    # Optimization
+    'optimizer': 'AdamW',
+    'learning_rate': 0.001,
+    'momentum': 0.937,
+    'weight_decay': 0.0005,
+    'warmup_epochs': 3,  # Reduced for faster start
+    
+    # Loss weights (food-specific)
+    'box_loss': 0.05,
+    'cls_loss': 0.3,
+    'dfl_loss': 1.5,
+    
+    # Augmentation (conservative for food)
+    'hsv_h': 0.01,
+    'hsv_s': 0.5,
+    'hsv_v': 0.3,
+    'degrees': 5,
+    'translate': 0.1,
+    'scale': 0.3,
+    'fliplr': 0.5,
+    'mosaic': 0.8,
+    'mixup': 0.1
+}
+
+# ====================================================================
+# KAGGLE
+# ====================================================================
+
+# Kaggle has more resources, so we can use better settings
+KAGGLE_CONFIG = {
+    # Model (use small instead of nano for better accuracy)
+    'model_size': 's',  # yolov8s for better accuracy on Kaggle
+    
+    # Training parameters (optimized for Kaggle's resources)
+    'epochs': 300,      # Full training on Kaggle
+    'batch_size': 'auto',  # Chosen by hardware_profile (was 32)
+    'image_size': 640,
+    'patience': 50,
+    
+    # Hardware ('auto' = measured by hardware_profile before training)
+    'workers': 'auto',  # was 4
+    'device': 'auto',   # was '0'
+    'amp': 'auto',
+    'cache': 'auto',
+    
+    # Optimization
+    'optimizer': 'AdamW',
+    'learning_rate': 0.001,
+    'momentum': 0.937,
+    'weight_decay': 0.0005,
+    'warmup_epochs': 5,
+    
+    # Loss weights
+    'box_loss': 0.05,
+    'cls_loss': 0.3,
+    'dfl_loss': 1.5,
+    
+    # Enhanced augmentation for better generalization
+    'hsv_h': 0.015,
+    'hsv_s': 0.7,
+    'hsv_v': 0.4,
+    'degrees': 10,
+    'translate': 0.1,
+    'scale': 0.5,
+    'fliplr': 0.5,
+    'mosaic': 1.0,
+    'mixup': 0.2,
+    'copy_paste': 0.1  # Additional augmentation
+}
+
+PLATFORM_CONFIGS = {
+    'colab': TRAINING_CONFIG,
+    'kaggle': KAGGLE_CONFIG
+}
+
+# Config key -> ultralytics train() argument
+TRAIN_ARG_NAMES = {
+    'epochs': 'epochs',
+    'patience': 'patience',
+    'batch_size': 'batch',
+    'image_size': 'imgsz',
+    'device': 'device',
+    'workers': 'workers',
+    'amp': 'amp',
+    'cache': 'cache',
+    'optimizer': 'optimizer',
+    'learning_rate': 'lr0',
+    'momentum': 'momentum',
+    'weight_decay': 'weight_decay',
+    'warmup_epochs': 'warmup_epochs',
+    'box_loss': 'box',
+    'cls_loss': 'cls',
+    'dfl_loss': 'dfl',
+    'hsv_h': 'hsv_h',
+    'hsv_s': 'hsv_s',
+    'hsv_v': 'hsv_v',
+    'degrees': 'degrees',
+    'translate': 'translate',
+    'scale': 'scale',
+    'fliplr': 'fliplr',
+    'mosaic': 'mosaic',
+    'mixup': 'mixup',
+    'copy_paste': 'copy_paste'
+}
+
+
+def build_train_args(config, data_yaml, **overrides):
+    """Translate a training config dict into ultralytics train() keyword arguments
+
+    Keys still set to 'auto' are left out so ultralytics falls back to its own
+    defaults; resolve them with hardware_profile.apply_hardware_profile first.
+    """
+    train_args = {'data': str(data_yaml)}
+    for key, arg_name in TRAIN_ARG_NAMES.items():
+        if key in config and config[key] != 'auto':
+            train_args[arg_name] = config[key]
+    train_args.update(overrides)
+    return train_args
@@ -0,0 +1,684 @@
+# 🏗️ Training Pipeline - StudXchange Custom Model
+## One staged, resumable train → validate → export → benchmark → package flow
+
+"""
+Shared pipeline behind the Colab and Kaggle training entry points.
+
+Every stage is cached under <work_dir>/.pipeline_state by a hash of its
+inputs (config values, upstream stage outputs and file fingerprints). On a
+rerun, stages whose inputs are unchanged and whose outputs still exist are
+skipped, so a session killed mid-export only redoes the export formats that
+had not finished, and a config tweak only reruns the stages it affects.
+
+Stages:
+    fetch_dataset → validate → train → export → benchmark → package
+
+With 'offline_augment': K in the config (or --offline-augment K), an extra
+augment stage pre-computes K augmented variants per train image before
+training (see augmentation_cache.py) and training runs with online
+augmentation off.
+
+With 'incremental_base': best.pt and 'incremental_old_data': data.yaml (or
+--incremental / --old-data), the fetched dataset is treated as new data: an
+incremental stage merges it with a replay buffer of the old train split and
+widens the model's head for new dishes, training fine-tunes from that
+checkpoint on a short schedule with the backbone frozen, and a compare
+stage reports the mAP delta on old and new classes (see
+incremental_training.py).
+
+Usage:
+    python training_pipeline.py --platform colab --source roboflow
+    python training_pipeline.py --platform kaggle --source zip --force export
+    python training_pipeline.py --platform colab --source zip --offline-augment 8
+    python training_pipeline.py --source local --dataset-path new_batch --incremental best.pt --old-data data.yaml
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+import yaml
+
+try:
+    from ultralytics import YOLO
+except ImportError:
+    print("Ultralytics not installed. Please install with: pip install ultralytics")
+    YOLO = None
+
+from dataset_layout import IMAGE_EXTENSIONS, label_path, resolve_split_dir, split_images
+from hardware_profile import apply_hardware_profile, profile_hardware
+from run_logger import LocalRunLogger
+from training_config import PLATFORM_CONFIGS, build_train_args
+
+STAGES = ['fetch_dataset', 'validate', 'train', 'export', 'benchmark', 'package']
+
+# ====================================================================
+# PLATFORM DETECTION
+# ====================================================================
+
+def detect_platform_paths():
+    """Return (platform, input_path, working_path) for Kaggle, Colab or local runs"""
+    if 'KAGGLE_WORKING_DIR' in os.environ or os.path.exists('/kaggle/working'):
+        return 'kaggle', '/kaggle/input', '/kaggle/working'
+    if 'COLAB_GPU' in os.environ or os.path.exists('/content'):
+        return 'colab', '/content', '/content'
+    return 'local', './input', './working'
+
+# ====================================================================
+# STAGE CACHE
+# ====================================================================
+
+def file_fingerprint(path):
+    """Cheap content fingerprint (relative path, size, mtime) of a file or directory tree"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    if path.is_file():
+        stat = path.stat()
+        return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            stat = os.stat(os.path.join(root, name))
+            rel = os.path.relpath(os.path.join(root, name), path)
+            digest.update(f"{rel}:{stat.st_size}:{int(stat.st_mtime)}\n".encode())
+    return digest.hexdigest()
+
+
+def split_fingerprint(data_yaml, splits=('train', 'val')):
+    """Fingerprint of a data.yaml plus every image and label file its splits list"""
+    with open(data_yaml, 'r') as f:
+        data = yaml.safe_load(f)
+    digest = hashlib.sha256(f"{file_fingerprint(data_yaml)}\n".encode())
+    for split in splits:
+        if not data.get(split):
+            continue
+        for image in sorted(split_images(data_yaml, split)[0]):
+            digest.update(f"{image}:{file_fingerprint(image)}:{file_fingerprint(label_path(image))}\n".encode())
+    return digest.hexdigest()
+
+
+def hash_inputs(inputs):
+    """Stable hash of a JSON-serialisable dict of stage inputs"""
+    payload = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _output_paths(outputs):
+    """All filesystem paths mentioned in a stage's outputs"""
+    paths = []
+    for key, value in outputs.items():
+        if isinstance(value, dict):
+            paths.extend(_output_paths(value))
+        elif isinstance(value, str) and key.endswith(('_path', '_dir', 'location', 'weights')):
+            paths.append(value)
+    return paths
+
+
+class StageCache:
+    """Stage outputs on disk, keyed by stage name and input hash"""
+
+    def __init__(self, state_dir):
+        self.state_dir = Path(state_dir)
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+
+    def lookup(self, stage, input_hash):
+        """Cached outputs if inputs match and every output path still exists"""
+        record_path = self.state_dir / f"{stage}.json"
+        if not record_path.exists():
+            return None
+        with open(record_path) as f:
+            record = json.load(f)
+        if record['input_hash'] != input_hash:
+            return None
+        if not all(os.path.exists(p) for p in _output_paths(record['outputs'])):
+            return None
+        return record['outputs']
+
+    def store(self, stage, input_hash, outputs, seconds):
+        record = {
+            'stage': stage,
+            'input_hash': input_hash,
+            'outputs': outputs,
+            'seconds': round(seconds, 2),
+            'completed_at': datetime.now().isoformat()
+        }
+        tmp = self.state_dir / f"{stage}.json.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(record, f, indent=2, default=str)
+        os.replace(tmp, self.state_dir / f"{stage}.json")
+
+    def invalidate(self, stage):
+        record_path = self.state_dir / f"{stage}.json"
+        if record_path.exists():
+            record_path.unlink()
+
+# ====================================================================
+# DATASET STAGES
+# ====================================================================
+
+def fetch_from_roboflow(workspace, project, version, api_key=None):
+    """Download a YOLOv8 export from Roboflow"""
+    import roboflow
+
+    api_key = api_key or os.environ.get('ROBOFLOW_API_KEY', 'your_roboflow_api_key_here')
+    rf = roboflow.Roboflow(api_key=api_key)
+    dataset = rf.workspace(workspace).project(project).version(version).download("yolov8")
+    return dataset.location
+
+
+def fetch_from_zip(input_path, working_path):
+    """Extract the first zip found in the input directory"""
+    zip_files = sorted(f for f in os.listdir(input_path) if f.endswith('.zip'))
+    if not zip_files:
+        raise FileNotFoundError(f"No zip file found in {input_path}")
+
+    extract_path = os.path.join(working_path, 'dataset')
+    print(f"📦 Extracting dataset from: {zip_files[0]}")
+    with zipfile.ZipFile(os.path.join(input_path, zip_files[0]), 'r') as zip_ref:
+        zip_ref.extractall(extract_path)
+    return extract_path
+
+
+def fetch_dataset(source, input_path, working_path):
+    """Resolve a dataset source spec (or a list tried in order) to a local YOLO dataset"""
+    if isinstance(source, list):
+        for candidate in source:
+            try:
+                return fetch_dataset(candidate, input_path, working_path)
+            except Exception as e:
+                print(f"⚠️ {candidate.get('type')} dataset source failed ({e}), trying alternatives...")
+        raise FileNotFoundError("Could not load dataset from any source. Please check your setup.")
+
+    kind = source.get('type', 'local')
+
+    if kind == 'roboflow':
+        location = fetch_from_roboflow(source['workspace'], source['project'], source['version'],
+                                       source.get('api_key'))
+    elif kind == 'kaggle':
+        location = os.path.join(input_path, source.get('name', 'studxchange-indian-food-dataset'))
+    elif kind == 'zip':
+        location = fetch_from_zip(input_path, working_path)
+    elif kind == 'version':
+        from dataset_versions import DATASET_STORE, DatasetStore
+        if not source.get('name'):
+            raise ValueError("Dataset source 'version' needs a version name")
+        location = DatasetStore(source.get('store') or DATASET_STORE).checkout(
+            source['name'], os.path.join(working_path, f"dataset_{source['name']}"))
+    else:
+        location = source['path']
+
+    if not os.path.exists(os.path.join(location, 'data.yaml')):
+        raise FileNotFoundError(f"No data.yaml in dataset: {location}")
+
+    print(f"📁 Dataset location: {location}")
+    return {'dataset_location': os.path.abspath(location)}
+
+
+def validate_dataset(dataset_location):
+    """Validate dataset structure and content"""
+    print("🔍 Validating dataset...")
+
+    yaml_path = os.path.join(dataset_location, 'data.yaml')
+    with open(yaml_path, 'r') as f:
+        data_config = yaml.safe_load(f)
+
+    counts = {}
+    for split in ('train', 'val'):
+        split_dir = resolve_split_dir(dataset_location, data_config, split)
+        if split_dir is None or not split_dir.exists():
+            raise FileNotFoundError(f"Missing {split} images: {split_dir}")
+        counts[split] = len([f for f in os.listdir(split_dir) if not f.startswith('.')])
+        print(f"✅ {split}: {counts[split]} files")
+
+    num_classes = data_config.get('nc', len(data_config.get('names', [])))
+    print(f"✅ Found {num_classes} classes")
+
+    return {
+        'data_yaml': yaml_path,
+        'val_dir': str(resolve_split_dir(dataset_location, data_config, 'val')),
+        'num_classes': num_classes,
+        'image_counts': counts
+    }
+
+# ====================================================================
+# TRAINING, EXPORT AND BENCHMARK STAGES
+# ====================================================================
+
+def checkpoint_unfinished(weights):
+    """True for a mid-training checkpoint; ultralytics sets 'epoch' to -1 once a run completes"""
+    import torch
+
+    checkpoint = torch.load(str(weights), map_location='cpu', weights_only=False)
+    return checkpoint.get('epoch', -1) >= 0
+
+
+def train_model(data_yaml, config, project_dir, run_name, train_overrides=None, init_weights=None,
+                force=False):
+    """Train (or resume an interrupted run of) the detector and validate the best weights"""
+    run_dir = Path(project_dir) / run_name
+    last_weights = run_dir / 'weights' / 'last.pt'
+    if force and last_weights.exists():
+        # A forced retrain must not resume or overwrite the earlier run
+        run_name = f"{run_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        run_dir = Path(project_dir) / run_name
+        last_weights = run_dir / 'weights' / 'last.pt'
+
+    start_time = time.time()
+    if last_weights.exists() and checkpoint_unfinished(last_weights):
+        print(f"♻️  Resuming interrupted training from {last_weights}")
+        YOLO(str(last_weights)).train(resume=True)
+    elif last_weights.exists():
+        print(f"ℹ️  {run_dir} already finished training, only validation was lost")
+    else:
+        model = YOLO(init_weights or f"yolov8{config['model_size']}.pt")
+        train_args = build_train_args(
+            config, data_yaml,
+            val=True, save=True, plots=True,
+            project=str(project_dir), name=run_name, exist_ok=True,
+            save_period=25, **(train_overrides or {})
+        )
+        print("🔥 Training started...")
+        model.train(**train_args)
+    training_time = time.time() - start_time
+
+    best_weights = run_dir / 'weights' / 'best.pt'
+    print("\n🔬 Running final validation...")
+    val_results = YOLO(str(best_weights)).val(data=data_yaml)
+
+    metrics = {
+        'mAP_50': float(val_results.box.map50),
+        'mAP_50_95': float(val_results.box.map),
+        'precision': float(val_results.box.mp),
+        'recall': float(val_results.box.mr),
+        'training_time_hours': training_time / 3600
+    }
+    for metric, value in metrics.items():
+        print(f"   {metric}: {value:.4f}")
+
+    return {'run_dir': str(run_dir), 'best_weights': str(best_weights), 'metrics': metrics}
+
+
+EXPORT_FORMATS = {
+    'onnx': {'args': {'format': 'onnx', 'optimize': True, 'simplify': True}, 'filename': 'studxchange_model.onnx'},
+    'tflite': {'args': {'format': 'tflite', 'int8': True}, 'filename': 'studxchange_model.tflite'},
+    'torchscript': {'args': {'format': 'torchscript'}, 'filename': 'studxchange_model.torchscript'}
+}
+
+
+def export_format(best_weights, format_name, export_dir):
+    """Export the best weights to one deployment format"""
+    spec = EXPORT_FORMATS[format_name]
+    exported = YOLO(best_weights).export(**spec['args'])
+    os.makedirs(export_dir, exist_ok=True)
+    target = os.path.join(export_dir, spec['filename'])
+    if os.path.isdir(exported):
+        shutil.copytree(exported, target, dirs_exist_ok=True)
+    else:
+        shutil.copy2(exported, target)
+    print(f"✅ {format_name} export successful")
+    return {'export_path': target}
+
+
+def benchmark_models(best_weights, exported_models, sample_dir, runs=10):
+    """Benchmark inference speed of the PyTorch model and its exports"""
+    print("\n⚡ Benchmarking model performance...")
+    images = sorted(f for f in os.listdir(sample_dir) if f.endswith(('.jpg', '.jpeg', '.png')))
+    if not images:
+        return {}
+    sample_image = os.path.join(sample_dir, images[0])
+
+    candidates = {'pytorch': best_weights}
+    if 'onnx' in exported_models:
+        candidates['onnx'] = exported_models['onnx']
+
+    benchmark_results = {}
+    for name, weights in candidates.items():
+        try:
+            model = YOLO(weights)
+            model(sample_image, verbose=False)  # warmup
+            start_time = time.perf_counter()
+            for _ in range(runs):
+                model(sample_image, verbose=False)
+            avg_time = (time.perf_counter() - start_time) / runs
+            benchmark_results[name] = {'avg_time': avg_time, 'fps': 1 / avg_time}
+            print(f"⚡ {name}: {avg_time:.3f}s ({1/avg_time:.1f} FPS)")
+        except Exception as e:
+            print(f"❌ {name} benchmark failed: {e}")
+
+    if 'pytorch' in benchmark_results and 'onnx' in benchmark_results:
+        benchmark_results['onnx']['speedup'] = benchmark_results['pytorch']['avg_time'] / benchmark_results['onnx']['avg_time']
+    return benchmark_results
+
+
+def package_deployment(best_weights, data_yaml, run_dir, exported_models, metrics,
+                       benchmark_results, deployment_dir, platform, model_size, run_metadata):
+    """Assemble the deployment folder, deployment_info.json and a zip"""
+    print("\n📦 Creating deployment package...")
+    os.makedirs(deployment_dir, exist_ok=True)
+
+    shutil.copy2(best_weights, os.path.join(deployment_dir, 'studxchange_model.pt'))
+    shutil.copy2(data_yaml, os.path.join(deployment_dir, 'class_names.yaml'))
+    for path in exported_models.values():
+        target = os.path.join(deployment_dir, os.path.basename(path))
+        if os.path.isdir(path):
+            shutil.copytree(path, target, dirs_exist_ok=True)
+        else:
+            shutil.copy2(path, target)
+    if os.path.exists(os.path.join(run_dir, 'results.png')):
+        shutil.copy2(os.path.join(run_dir, 'results.png'), os.path.join(deployment_dir, 'training_curves.png'))
+
+    deployment_info = {
+        "model_info": {
+            "name": "StudXchange Indian Food Detection Model",
+            "version": f"v1.0_{platform}_{datetime.now().strftime('%Y%m%d_%H%M')}",
+            "architecture": f"YOLOv8{model_size}",
+            "training_platform": platform,
+            "training_date": datetime.now().isoformat()
+        },
+        "performance_metrics": metrics,
+        "benchmark_results": benchmark_results,
+        "model_files": {
+            "pytorch": "studxchange_model.pt",
+            "class_names": "class_names.yaml",
+            **{name: os.path.basename(path) for name, path in exported_models.items()}
+        },
+        "run_metadata": run_metadata,
+        "usage_examples": {
+            "python_inference": {
+                "load": "model = YOLO('studxchange_model.pt')",
+                "predict": "results = model('food_image.jpg')"
+            },
+            "api_integration": {
+                "endpoint": "/api/ai/custom-detect",
+                "method": "POST",
+                "format": "multipart/form-data with image file"
+            }
+        }
+    }
+    with open(os.path.join(deployment_dir, 'deployment_info.json'), 'w') as f:
+        json.dump(deployment_info, f, indent=2)
+
+    zip_path = f"{deployment_dir}_{datetime.now().strftime('%Y%m%d_%H%M')}.zip"
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for root, dirs, files in os.walk(deployment_dir):
+            for file in files:
+                file_path = os.path.join(root, file)
+                zipf.write(file_path, os.path.relpath(file_path, deployment_dir))
+
+    print(f"✅ Deployment package created: {zip_path}")
+    return {'deployment_dir': deployment_dir, 'zip_path': zip_path}
+
+# ====================================================================
+# PIPELINE
+# ====================================================================
+
+class TrainingPipeline:
+    """Staged, input-hash cached training pipeline"""
+
+    def __init__(self, platform='colab', dataset_source=None, config_overrides=None,
+                 export_formats=('onnx', 'tflite', 'torchscript'), work_dir=None,
+                 use_wandb=False, force=()):
+        detected, input_path, working_path = detect_platform_paths()
+        self.platform = platform
+        self.input_path = input_path
+        self.work_dir = Path(work_dir or working_path)
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.dataset_source = dataset_source or {'type': 'zip'}
+        self.config = {**PLATFORM_CONFIGS[platform], **(config_overrides or {})}
+        self.export_formats = list(export_formats)
+        self.cache = StageCache(self.work_dir / '.pipeline_state')
+        self.force = set(force)
+        self.outputs = {}
+        self.run_metadata = {'platform': platform, 'detected_environment': detected, 'stage_hashes': {}}
+        self.logger = LocalRunLogger(
+            f"studxchange-indian-food-{platform}",
+            f"{platform}_training_{datetime.now().strftime('%Y%m%d_%H%M')}",
+            self.config, root=str(self.work_dir / 'runs'), use_wandb=use_wandb
+        )
+
+    def stage(self, name, inputs, fn):
+        """Run a stage unless an up-to-date cached result exists"""
+        input_hash = hash_inputs({'stage': name, **inputs})
+        self.run_metadata['stage_hashes'][name] = input_hash[:12]
+
+        cached = None if name in self.force else self.cache.lookup(name, input_hash)
+        if cached is not None:
+            print(f"⏭️  {name}: up to date ({input_hash[:12]})")
+            self.outputs[name] = cached
+            return cached
+
+        print(f"\n▶️  {name}")
+        start_time = time.time()
+        outputs = fn()
+        self.cache.store(name, input_hash, outputs, time.time() - start_time)
+        self.outputs[name] = outputs
+        return outputs
+
+    def resolve_hardware(self, data_yaml):
+        """Profile the machine and fill the config's 'auto' hardware settings"""
+        profile = profile_hardware(data_yaml, self.config['model_size'], self.config['image_size'])
+        self.run_metadata['hardware'] = profile
+        self.logger.log({f"hardware/{k}": v for k, v in profile['chosen'].items()})
+        self.logger.log({'hardware/decode_images_per_sec': profile['decode_images_per_sec'],
+                         'hardware/train_images_per_sec': profile.get('train_images_per_sec', 0.0)})
+        return apply_hardware_profile(self.config, profile)
+
+    def _augment(self, dataset_location, variants):
+        """Pre-augment the train split (config 'offline_augment': K variants per image)"""
+        from augmentation_cache import build_augmentation_cache, materialize
+
+        with open(os.path.join(dataset_location, 'data.yaml'), 'r') as f:
+            data_config = yaml.safe_load(f)
+        train_dir = resolve_split_dir(dataset_location, data_config, 'train')
+        paths = sorted(str(p) for p in train_dir.rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS)
+        cache_dir = build_augmentation_cache(paths, self.work_dir / '.aug_cache', variants, self.config,
+                                             self.config['image_size'])
+        return {'data_yaml': materialize(cache_dir, os.path.join(dataset_location, 'data.yaml'),
+                                         self.work_dir / 'aug_dataset')}
+
+    def _incremental(self, data_yaml):
+        """Merge new data with an old-data replay buffer and widen the base model's head"""
+        from incremental_training import build_incremental_dataset, checkpoint_names, expand_head
+
+        base = self.config['incremental_base']
+        summary = build_incremental_dataset(checkpoint_names(base), self.config['incremental_old_data'],
+                                            data_yaml, self.work_dir / 'incremental_dataset',
+                                            self.config.get('replay_ratio', 1.0))
+        with open(summary['data_yaml'], 'r') as f:
+            names = yaml.safe_load(f)['names']
+        summary['init_weights'] = expand_head(base, names, str(self.work_dir / 'incremental_init.pt'))
+        return summary
+
+    def _train(self, data_yaml, run_name, train_overrides=None, init_weights=None):
+        config = self.resolve_hardware(data_yaml)
+        outputs = train_model(data_yaml, config, self.work_dir / 'runs' / 'train', run_name, train_overrides,
+                              init_weights, force='train' in self.force)
+        outputs['hardware'] = self.run_metadata['hardware']
+        return outputs
+
+    def run(self, until=None):
+        """Run the pipeline up to and including `until` (default: all stages)"""
+        last = STAGES.index(until) if until else len(STAGES) - 1
+        try:
+            self._run_stages(last)
+        finally:
+            self.logger.finish()
+
+        if 'package' in self.outputs:
+            self.print_summary()
+        else:
+            print(f"\n⏸️  Pipeline stopped after: {STAGES[last]}")
+        return self.outputs
+
+    def _run_stages(self, last):
+        dataset = self.stage('fetch_dataset', {'source': self.dataset_source}, lambda: fetch_dataset(
+            self.dataset_source, self.input_path, str(self.work_dir)))
+        if last < 1:
+            return
+
+        dataset_fingerprint = file_fingerprint(dataset['dataset_location'])
+        validation = self.stage('validate', {'dataset': dataset, 'fingerprint': dataset_fingerprint},
+                                lambda: validate_dataset(dataset['dataset_location']))
+        if last < 2:
+            return
+
+        # Hash the unresolved config: a different GPU next session must not invalidate training
+        train_inputs = {'data': validation, 'fingerprint': dataset_fingerprint, 'config': self.config}
+        train_data, train_overrides, init_weights = validation['data_yaml'], None, None
+        variants = self.config.get('offline_augment', 0)
+        base = self.config.get('incremental_base')
+        if base:
+            if variants:
+                print("ℹ️  offline_augment is ignored in incremental mode")
+            incremental_inputs = {
+                'fingerprint': dataset_fingerprint, 'base': file_fingerprint(base),
+                'old_data': split_fingerprint(self.config['incremental_old_data']),
+                'config': self.config
+            }
+            incremental = self.stage('incremental', incremental_inputs,
+                                     lambda: self._incremental(validation['data_yaml']))
+            train_data, init_weights = incremental['data_yaml'], incremental['init_weights']
+            from incremental_training import incremental_overrides
+            train_overrides = incremental_overrides(self.config)
+            train_inputs['incremental'] = {'inputs': incremental_inputs, 'outputs': incremental}
+        elif variants:
+            # CPU augmentation happens once up front instead of in the dataloader every epoch
+            from augmentation_cache import cached_train_overrides
+            augment_inputs = {'fingerprint': dataset_fingerprint, 'config': self.config}
+            augmented = self.stage('augment', augment_inputs,
+                                   lambda: self._augment(dataset['dataset_location'], variants))
+            train_data, train_overrides = augmented['data_yaml'], cached_train_overrides(self.config, variants)
+            train_inputs['augment'] = {'inputs': augment_inputs, 'outputs': augmented}
+        # Named after everything training sees, so a new base model or replay set gets its own run
+        run_name = f"studxchange_{self.platform}_{hash_inputs(train_inputs)[:10]}"
+        training = self.stage('train', train_inputs, lambda: self._train(train_data, run_name, train_overrides,
+                                                                        init_weights))
+        self.run_metadata['hardware'] = training.get('hardware')
+        self.logger.log(training['metrics'])
+        if base:
+            from incremental_training import compare_models, print_comparison
+
+            # Both models on the same old + new val images: old-class delta is forgetting
+            comparison = self.stage('compare', {'base': file_fingerprint(base),
+                                                'weights': file_fingerprint(training['best_weights']),
+                                                'data': incremental},
+                                    lambda: compare_models(base, training['best_weights'], train_data,
+                                                           incremental['base_classes']))
+            print("\n📉 Incremental fine-tuning vs. base model:")
+            print_comparison(comparison)
+            self.run_metadata['incremental'] = {**incremental, 'comparison': comparison}
+            self.logger.log({f"incremental/{group}_delta": row['delta']
+                             for group, row in comparison.items() if row['delta'] is not None})
+        if last < 3:
+            return
+
+        # One cache entry per format, so a crash mid-export keeps finished formats
+        weights_fingerprint = file_fingerprint(training['best_weights'])
+        exported_models = {}
+        for format_name in self.export_formats:
+            try:
+                exported = self.stage(f"export_{format_name}", {'weights': weights_fingerprint, 'format': format_name},
+                                      lambda f=format_name: export_format(training['best_weights'], f,
+                                                                         str(self.work_dir / 'exported_models')))
+                exported_models[format_name] = exported['export_path']
+            except Exception as e:
+                print(f"❌ {format_name} export failed: {e}")
+        self.outputs['export'] = exported_models
+        if last < 4:
+            return
+
+        benchmark = self.stage('benchmark', {'weights': weights_fingerprint, 'exports': exported_models},
+                               lambda: {'results': benchmark_models(training['best_weights'], exported_models,
+                                                                     validation['val_dir'])})
+        self.logger.log({f"{name}_fps": r['fps'] for name, r in benchmark['results'].items()})
+        if last < 5:
+            return
+
+        self.stage('package', {'training': training, 'exports': exported_models, 'benchmark': benchmark},
+                   lambda: package_deployment(
+                       training['best_weights'], train_data, training['run_dir'],
+                       exported_models, training['metrics'], benchmark['results'],
+                       str(self.work_dir / 'studxchange_deployment'), self.platform,
+                       self.config['model_size'], self.run_metadata))
+
+    def print_summary(self):
+        metrics = self.outputs.get('train', {}).get('metrics', {})
+        print("\n" + "=" * 70)
+        print(f"🎉 STUDXCHANGE {self.platform.upper()} TRAINING COMPLETED!")
+        print("=" * 70)
+        print(f"   🏆 Best mAP@0.5: {metrics['mAP_50']:.3f}")
+        print(f"   🎯 Best mAP@0.5:0.95: {metrics['mAP_50_95']:.3f}")
+        print(f"   📦 Deployment package: {self.outputs['package']['zip_path']}")
+        print("=" * 70)
+
+# ====================================================================
+# COMMAND LINE
+# ====================================================================
+
+def main():
+    """Run the training pipeline from the command line"""
+    parser = argparse.ArgumentParser(description="StudXchange staged training pipeline")
+    parser.add_argument("--platform", choices=sorted(PLATFORM_CONFIGS), default="colab")
+    parser.add_argument("--source", choices=["roboflow", "kaggle", "zip", "local", "version"], default="roboflow")
+    parser.add_argument("--dataset-path", help="Dataset directory for --source local")
+    parser.add_argument("--dataset-version", help="dataset_versions.py version for --source version")
+    parser.add_argument("--dataset-store", help="Dataset version store directory (default $DATASET_STORE or datasets)")
+    parser.add_argument("--workspace", default="studxchange-ai")
+    parser.add_argument("--project", default="indian-mess-food-detection")
+    parser.add_argument("--version", type=int, default=1)
+    parser.add_argument("--work-dir", help="Defaults to the platform working directory")
+    parser.add_argument("--until", choices=STAGES, help="Stop after this stage")
+    parser.add_argument("--force", nargs="*", default=[], help="Stages to rerun even if cached")
+    parser.add_argument("--config", help="JSON file with config overrides (e.g. best_config.json)")
+    parser.add_argument("--offline-augment", type=int, default=0,
+                        help="Pre-augment K variants per train image instead of augmenting online")
+    parser.add_argument("--incremental", metavar="BEST_PT",
+                        help="Fine-tune these weights on the fetched dataset instead of training from scratch")
+    parser.add_argument("--old-data", help="data.yaml the --incremental weights were trained on (replay source)")
+    parser.add_argument("--replay-ratio", type=float, default=1.0, help="Old images replayed per new image")
+    parser.add_argument("--wandb", action="store_true")
+    args = parser.parse_args()
+
+    source = {'type': args.source}
+    if args.source == 'roboflow':
+        source.update(workspace=args.workspace, project=args.project, version=args.version)
+    elif args.source == 'local':
+        source['path'] = args.dataset_path
+    elif args.source == 'version':
+        if not args.dataset_version:
+            parser.error("--source version needs --dataset-version")
+        source.update(name=args.dataset_version, store=args.dataset_store)
+
+    overrides = None
+    if args.config:
+        with open(args.config) as f:
+            overrides = json.load(f)
+    if args.offline_augment:
+        overrides = {**(overrides or {}), 'offline_augment': args.offline_augment}
+    if args.incremental:
+        if not args.old_data:
+            parser.error("--incremental needs --old-data")
+        overrides = {**(overrides or {}), 'incremental_base': str(Path(args.incremental).resolve()),
+                     'incremental_old_data': str(Path(args.old_data).resolve()),
+                     'replay_ratio': args.replay_ratio}
+
+    force = [f"export_{name}" if name in EXPORT_FORMATS else name for name in args.force]
+    if 'export' in args.force:
+        force += [f"export_{name}" for name in EXPORT_FORMATS]
+
+    pipeline = TrainingPipeline(args.platform, source, overrides, work_dir=args.work_dir,
+                                use_wandb=args.wandb, force=force)
+    pipeline.run(until=args.until)
+
+
+if __name__ == "__main__":
+    main()